@@ -0,0 +1,17 @@
+# The memfabric loader's stdlib-only helpers for the scripts in this
+# directory, which run without vLLM installed: imported from
+# vllm/model_executor/model_loader, so the scripts probe the config store and
+# window writes exactly like the loader does.
+
+import os
+import sys
+
+LOADER_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "vllm", "model_executor", "model_loader"
+)
+if LOADER_DIR not in sys.path:
+    sys.path.insert(0, LOADER_DIR)
+
+from memfabric_transfer import TransferExecutor, TransferOp, wait_for_store
+
+__all__ = ["LOADER_DIR", "TransferExecutor", "TransferOp", "wait_for_store"]
@@ -7,7 +7,14 @@ import time
 
 import torch
 import torch_npu  # noqa: F401
-from memfabric_hybrid import TransferEngine, create_config_store, set_log_level, set_conf_store_tls
+from memfabric_hybrid import (
+    TransferEngine,
+    create_config_store,
+    set_conf_store_tls,
+    set_log_level,
+)
+
+from memfabric_common import wait_for_store
 
 
 def parse_args():
@@ -22,6 +29,9 @@ def parse_args():
     p.add_argument("--b-notify-port", type=int, default=9001)
     p.add_argument("--bytes", type=int, default=1 << 30)
     p.add_argument("--log-level", type=int, default=1, choices=[0, 1, 2, 3])
+    p.add_argument(
+        "--ready-timeout-s", type=float, default=120, help="max wait for the store / peer"
+    )
     return p.parse_args()
 
 
@@ -35,7 +45,7 @@ def main():
     set_log_level(args.log_level)
     set_conf_store_tls(False, "")
     create_config_store(args.store_url)
-    time.sleep(2)
+    wait_for_store(args.store_url, args.ready_timeout_s)
 
     engine = TransferEngine()
     # TransferEngine expects role "Prefill" or "Decode"
@@ -7,7 +7,9 @@ import time
 
 import torch
 import torch_npu  # noqa: F401
-from memfabric_hybrid import TransferEngine, set_log_level, set_conf_store_tls
+from memfabric_hybrid import TransferEngine, set_conf_store_tls, set_log_level
+
+from memfabric_common import wait_for_store
 
 
 def parse_args():
@@ -21,6 +23,9 @@ def parse_args():
     p.add_argument("--listen-ip", default="0.0.0.0")
     p.add_argument("--listen-port", type=int, default=9001)
     p.add_argument("--log-level", type=int, default=1, choices=[0, 1, 2, 3])
+    p.add_argument(
+        "--ready-timeout-s", type=float, default=120, help="max wait for the store / peer"
+    )
     return p.parse_args()
 
 
@@ -33,6 +38,8 @@ def main():
 
     set_log_level(args.log_level)
     set_conf_store_tls(False, "")
+    # A creates the store; B may start first
+    wait_for_store(args.store_url, args.ready_timeout_s)
 
     engine = TransferEngine()
     # TransferEngine expects role "Prefill" or "Decode"
@@ -54,8 +61,20 @@ def main():
     print(f"[B] tensor shape={shape} bytes={total_bytes}")
     print(f"[B] dev_addr={hex(tensor.data_ptr())}")
 
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.connect((args.notify_ip, args.notify_port))
+    # A's control server comes up after its engine and tensor; retry until
+    # it listens rather than failing when B is faster
+    deadline = time.monotonic() + args.ready_timeout_s
+    delay = 0.005
+    while True:
+        try:
+            s = socket.create_connection((args.notify_ip, args.notify_port), timeout=5)
+            break
+        except OSError:
+            if time.monotonic() + delay > deadline:
+                raise
+            time.sleep(delay)
+            delay = min(delay * 2, 0.2)
+    with s:
         s.sendall(f"REG {hex(tensor.data_ptr())}\n".encode("utf-8"))
         _ = s.recv(128)
 
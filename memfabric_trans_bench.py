@@ -2,11 +2,19 @@
 # coding=utf-8
 
 import argparse
+import socket
 import time
 
 import torch
 import torch_npu  # noqa: F401
-from memfabric_hybrid import TransferEngine, create_config_store, set_log_level, set_conf_store_tls
+from memfabric_hybrid import (
+    TransferEngine,
+    create_config_store,
+    set_conf_store_tls,
+    set_log_level,
+)
+
+from memfabric_common import TransferExecutor, TransferOp, wait_for_store
 
 
 def parse_args():
@@ -20,9 +28,71 @@ def parse_args():
     parser.add_argument("--warmup", type=int, default=1)
     parser.add_argument("--iters", type=int, default=5)
     parser.add_argument("--log-level", type=int, default=1, choices=[0, 1, 2, 3])
+    parser.add_argument("--chunk-bytes", type=int, default=0, help="split each write, 0 = one write")
+    parser.add_argument("--max-inflight", type=int, default=1, help="outstanding chunk writes")
+    parser.add_argument(
+        "--handshake-port",
+        type=int,
+        default=9100,
+        help="sender listens here; the receiver connects to the host of --peer-id",
+    )
+    parser.add_argument(
+        "--ready-timeout-s", type=float, default=120, help="max wait for the store / peer"
+    )
+    parser.add_argument(
+        "--done-timeout-s",
+        type=float,
+        default=600,
+        help="receiver: max wait for the sender to finish all iterations",
+    )
     return parser.parse_args()
 
 
+def connect_retry(host, port, timeout_s):
+    """Connect to the peer's handshake port, retrying until it listens."""
+    deadline = time.monotonic() + timeout_s
+    delay = 0.005
+    while True:
+        try:
+            return socket.create_connection((host, port), timeout=timeout_s)
+        except OSError as e:
+            if time.monotonic() + delay > deadline:
+                raise TimeoutError(f"peer {host}:{port} not reachable: {e}") from e
+            time.sleep(delay)
+            delay = min(delay * 2, 0.2)
+
+
+def recv_line(sock):
+    buf = b""
+    while not buf.endswith(b"\n"):
+        data = sock.recv(256)
+        if not data:
+            raise ConnectionError(f"peer closed the handshake after {buf!r}")
+        buf += data
+    return buf.decode("utf-8").strip()
+
+
+def make_ops(src_addr, dst_addr, total_bytes, chunk_bytes):
+    if chunk_bytes <= 0:
+        chunk_bytes = total_bytes
+    return [
+        TransferOp(
+            src_addr + off, dst_addr + off, min(chunk_bytes, total_bytes - off), f"offset={off}"
+        )
+        for off in range(0, total_bytes, chunk_bytes)
+    ]
+
+
+def write_ops(executor, peer_id, ops):
+    """Write all ops keeping up to max_inflight outstanding; raise on any failure."""
+    errors = executor.write(peer_id, ops)
+    if errors:
+        first = errors[0]
+        raise RuntimeError(
+            f"transfer failed ret={first.ret} {first.op.name} failed_writes={len(errors)}"
+        )
+
+
 def verify_head_tail(tensor, k=8):
     head = tensor.view(-1)[:k].cpu()
     tail = tensor.view(-1)[-k:].cpu()
@@ -45,10 +115,15 @@ def main():
     print(f"shape={shape} bytes={args.bytes}")
 
     engine = TransferEngine()
+    t_start = time.time()
 
+    listener = None
     if args.role == "Sender":
         create_config_store(args.store_url)
-        time.sleep(2)
+        # listen before the slow engine/NPU setup so an early receiver queues
+        listener = socket.create_server(("0.0.0.0", args.handshake_port))
+    wait_for_store(args.store_url, args.ready_timeout_s)
+    print(f"config store ready ms={(time.time() - t_start) * 1000.0:.1f}")
 
     ret = engine.initialize(args.store_url, args.my_id, args.role, args.npu_id)
     if ret != 0:
@@ -60,31 +135,67 @@ def main():
         engine.register_memory(tensor.data_ptr(), total_bytes)
         print(f"receiver registered addr={hex(tensor.data_ptr())} bytes={total_bytes}")
 
-        # wait for sender to finish transfer
-        time.sleep(5)
+        # tell the sender where to write once the buffer is registered, then
+        # block until it has finished all iterations
+        peer_host = args.peer_id.rsplit(":", 1)[0]
+        with connect_retry(peer_host, args.handshake_port, args.ready_timeout_s) as s:
+            s.sendall(f"READY {hex(tensor.data_ptr())} {total_bytes}\n".encode())
+            s.settimeout(args.done_timeout_s)
+            try:
+                msg = recv_line(s)
+            except TimeoutError:
+                raise SystemExit(
+                    f"sender did not finish within --done-timeout-s={args.done_timeout_s:g}"
+                ) from None
+        if msg != "DONE":
+            raise RuntimeError(f"sender failed: {msg}")
         torch.npu.synchronize()
         verify_head_tail(tensor)
-        while True:
-            time.sleep(10)
 
     else:
         tensor = torch.arange(1, shape[0] * shape[1] + 1, dtype=torch.float32, device="npu").reshape(shape)
         total_bytes = tensor.element_size() * tensor.numel()
         engine.register_memory(tensor.data_ptr(), total_bytes)
         print(f"sender registered addr={hex(tensor.data_ptr())} bytes={total_bytes}")
-        time.sleep(5)
 
-        for _ in range(args.warmup):
-            engine.transfer_sync_write(args.peer_id, tensor.data_ptr(), tensor.data_ptr(), total_bytes)
-        torch.npu.synchronize()
-
-        total_ms = 0.0
-        for _ in range(args.iters):
-            t0 = time.time()
-            engine.transfer_sync_write(args.peer_id, tensor.data_ptr(), tensor.data_ptr(), total_bytes)
+        listener.settimeout(args.ready_timeout_s)
+        conn, _ = listener.accept()
+        listener.close()
+        conn.settimeout(args.ready_timeout_s)
+        msg = recv_line(conn).split()
+        if len(msg) != 3 or msg[0] != "READY" or int(msg[2]) != total_bytes:
+            conn.sendall(b"ERR bad handshake\n")
+            raise RuntimeError(f"bad handshake from receiver: {msg}")
+        dst_addr = int(msg[1], 16)
+        print(
+            f"receiver ready dst_addr={hex(dst_addr)} "
+            f"startup_ms={(time.time() - t_start) * 1000.0:.1f}"
+        )
+
+        ops = make_ops(tensor.data_ptr(), dst_addr, total_bytes, args.chunk_bytes)
+        executor = TransferExecutor(engine, args.max_inflight)
+        print(f"chunks={len(ops)} max_inflight={args.max_inflight}")
+
+        try:
+            for _ in range(args.warmup):
+                write_ops(executor, args.peer_id, ops)
             torch.npu.synchronize()
-            t1 = time.time()
-            total_ms += (t1 - t0) * 1000.0
+
+            total_ms = 0.0
+            for _ in range(args.iters):
+                t0 = time.time()
+                write_ops(executor, args.peer_id, ops)
+                torch.npu.synchronize()
+                t1 = time.time()
+                total_ms += (t1 - t0) * 1000.0
+        except Exception as e:
+            conn.sendall(f"ERR {e}\n".encode())
+            raise
+        finally:
+            executor.close()
+        # the receiver verifies and exits as soon as this arrives
+        conn.sendall(b"DONE\n")
+        conn.close()
 
         avg_ms = total_ms / args.iters
         gib = total_bytes / (1024.0 * 1024.0 * 1024.0)
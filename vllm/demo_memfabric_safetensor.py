@@ -2,29 +2,97 @@
 # Minimal memfabric demo: disk safetensor -> NPU -> D2D to another NPU
 
 import argparse
+import http.client
 import json
 import os
 import socket
 import time
-import urllib.request
+import urllib.parse
 from typing import Any
 
 import torch
 import torch_npu  # noqa: F401
 
+# the loader's stdlib-only helpers, imported through this directory without
+# vLLM installed: the store probe and the trace writer are shared with the
+# loader, so merge_traces.py reads both alike
+from model_executor.model_loader.memfabric_trace import TRACE, enable_from_config
+from model_executor.model_loader.memfabric_transfer import wait_for_store
 
-def http_post_json(url: str, payload: dict[str, Any], timeout_s: int = 5) -> dict:
+# one keep-alive connection per coordinator (host, port); the demo is single threaded
+_CONNS: dict[tuple[str, int | None], http.client.HTTPConnection] = {}
+
+
+def http_post_json(
+    url: str,
+    payload: dict[str, Any],
+    timeout_s: int = 5,
+    span_name: str | None = None,
+    span_cat: str = "control",
+) -> dict:
+    with TRACE.span(span_name or url.rsplit("/", 1)[-1], span_cat):
+        return _http_post_json(url, payload, timeout_s)
+
+
+def _http_post_json(url: str, payload: dict[str, Any], timeout_s: int) -> dict:
     data = json.dumps(payload).encode("utf-8")
-    req = urllib.request.Request(
-        url, data=data, headers={"Content-Type": "application/json"}, method="POST"
-    )
-    with urllib.request.urlopen(req, timeout=timeout_s) as resp:
-        body = resp.read().decode("utf-8")
+    parts = urllib.parse.urlsplit(url)
+    key = (parts.hostname or "", parts.port)
+    for attempt in range(2):
+        conn = _CONNS.get(key)
+        reused = conn is not None
+        if conn is None:
+            conn = _CONNS[key] = http.client.HTTPConnection(*key, timeout=timeout_s)
+        conn.timeout = timeout_s
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout_s)
+        try:
+            conn.request(
+                "POST", parts.path, body=data, headers={"Content-Type": "application/json"}
+            )
+            resp = conn.getresponse()
+            body = resp.read().decode("utf-8")
+        except (http.client.HTTPException, ConnectionError):
+            conn.close()
+            del _CONNS[key]
+            # stale keep-alive connection: retry once on a fresh one
+            if reused and attempt == 0:
+                continue
+            raise
+        except BaseException:
+            conn.close()
+            del _CONNS[key]
+            raise
+        break
+    if resp.status >= 400:
+        raise RuntimeError(f"POST {url} failed: {resp.status} {body}")
     if not body:
         return {}
     return json.loads(body)
 
 
+def coord_batch(
+    coordinator_url: str, shared: dict[str, Any], ops: list[dict[str, Any]], timeout_s: int = 5
+) -> list[dict]:
+    # one /v1/registry/batch round trip; shared fields apply to every op
+    # long-polls are time spent waiting, not control-plane latency
+    long_poll = any(op.get("timeout_ms") for op in ops if op["op"] in ("poll", "wait"))
+    resp = http_post_json(
+        f"{coordinator_url}/v1/registry/batch",
+        dict(shared, ops=ops),
+        timeout_s=timeout_s,
+        span_name="batch:" + "+".join(op["op"] for op in ops),
+        span_cat="wait" if long_poll else "control",
+    )
+    results = resp.get("results", [])
+    for op, result in zip(ops, results):
+        if result["code"] >= 400:
+            raise RuntimeError(f"{op['op']} failed: {result['code']} {result['result']}")
+    if len(results) != len(ops):
+        raise RuntimeError(f"batch answered {len(results)} of {len(ops)} ops")
+    return [r["result"] for r in results]
+
+
 def resolve_node_ip(explicit: str | None) -> str:
     if explicit:
         return explicit
@@ -57,6 +125,7 @@ def init_engine(
     npu_id: int,
     log_level: int,
     create_store: bool,
+    ready_timeout_s: float = 60,
 ):
     from memfabric_hybrid import (
         TransferEngine,
@@ -68,12 +137,15 @@ def init_engine(
     set_log_level(log_level)
     set_conf_store_tls(False, "")
     if create_store:
-        create_config_store(store_url)
-        time.sleep(1)
+        with TRACE.span("create_config_store", "engine"):
+            create_config_store(store_url)
+    with TRACE.span("wait_for_store", "engine"):
+        wait_for_store(store_url, ready_timeout_s)
     engine = TransferEngine()
-    ret = engine.initialize(
-        store_url, my_id, role, npu_id, TransferEngine.TransDataOpType.DEVICE_RDMA
-    )
+    with TRACE.span("engine.initialize", "engine"):
+        ret = engine.initialize(
+            store_url, my_id, role, npu_id, TransferEngine.TransDataOpType.DEVICE_RDMA
+        )
     if ret != 0:
         raise RuntimeError(f"TransferEngine initialize failed ret={ret}")
     return engine
@@ -97,20 +169,38 @@ def main():
     p.add_argument("--safetensor-path", default="/tmp/demo_tensor.safetensors")
     p.add_argument("--log-level", type=int, default=1)
     p.add_argument("--poll-interval-s", type=float, default=2)
+    p.add_argument(
+        "--long-poll-ms",
+        type=int,
+        default=30000,
+        help="block /poll and /wait on the coordinator; 0 falls back to interval polling",
+    )
     p.add_argument("--poll-timeout-s", type=int, default=1800)
+    p.add_argument("--store-ready-timeout-s", type=float, default=60)
     p.add_argument("--transfer-wait-s", type=float, default=0.0)
     p.add_argument("--transfer-retries", type=int, default=5)
     p.add_argument("--my-id", default=None)
+    p.add_argument("--rack", default=os.environ.get("VLLM_NODE_RACK"))
+    p.add_argument("--switch", default=os.environ.get("VLLM_NODE_SWITCH"))
+    p.add_argument(
+        "--trace-dir",
+        default=None,
+        help="write a Chrome trace of this run there (see memfabric_coord/merge_traces.py)",
+    )
     args = p.parse_args()
 
     node_ip = resolve_node_ip(args.node_ip)
     rank = get_rank()
+    long_poll_http_timeout = max(args.long_poll_ms, 0) // 1000 + 10
     if args.my_id:
         my_id = args.my_id
     else:
         my_id = f"{node_ip}:{args.base_port + rank}"
     shape = (args.rows, args.cols)
     dtype = getattr(torch, args.dtype)
+    # rack/switch labels for the coordinator's topology-aware pairing
+    topology = {"rack": args.rack, "switch": args.switch}
+    topology = {k: v for k, v in topology.items() if v}
 
     model_key = {
         "name": "demo_safetensor_4096x65536",
@@ -124,6 +214,8 @@ def main():
     role = str(assign.get("role", "source")).lower()
     if role not in ("source", "receiver"):
         role = "source"
+    # written at exit, also when the demo fails half way
+    enable_from_config({"trace_dir": args.trace_dir}, my_id, role, rank)
 
     engine_role = "Prefill" if role == "source" else "Decode"
     engine = init_engine(
@@ -133,6 +225,7 @@ def main():
         args.npu_id,
         args.log_level,
         create_store=(role == "source"),
+        ready_timeout_s=args.store_ready_timeout_s,
     )
 
     if role == "source":
@@ -147,10 +240,11 @@ def main():
             )
 
         t0 = time.perf_counter()
-        loaded = load_file(args.safetensor_path, device="cpu")
-        cpu_tensor = loaded["demo"]
-        npu_tensor = cpu_tensor.to("npu")
-        torch.npu.synchronize()
+        with TRACE.span("disk_to_npu", "disk"):
+            loaded = load_file(args.safetensor_path, device="cpu")
+            cpu_tensor = loaded["demo"]
+            npu_tensor = cpu_tensor.to("npu")
+            torch.npu.synchronize()
         t1 = time.perf_counter()
         load_ms = (t1 - t0) * 1000.0
         bytes_size = npu_tensor.numel() * npu_tensor.element_size()
@@ -162,14 +256,19 @@ def main():
         expect = expected_last_row_tail(args.rows, args.cols)
         print(f"[source] last_row_tail={tail} expected={expect} ok={tail == expect}")
 
-        engine.register_memory(npu_tensor.data_ptr(), bytes_size)
+        with TRACE.span("register_memory", "register", bytes=bytes_size):
+            engine.register_memory(npu_tensor.data_ptr(), bytes_size)
 
-        payload = {
+        shared = {
             "role": "source",
             "model_key": model_key,
             "my_id": my_id,
-            "node_ip": node_ip,
             "rank_info": {"rank": rank},
+        }
+        register = {
+            "op": "register",
+            "node_ip": node_ip,
+            "topology": topology,
             "params": [
                 {
                     "name": "demo",
@@ -182,25 +281,30 @@ def main():
             ],
             "metrics": {"disk_to_npu_ms": load_ms, "disk_to_npu_gibps": gibps},
         }
-        http_post_json(f"{args.coordinator_url}/v1/registry/register", payload)
-        http_post_json(
-            f"{args.coordinator_url}/v1/registry/ready",
-            {"model_key": model_key, "my_id": my_id, "role": "source", "rank_info": {"rank": rank}},
-        )
+        coord_batch(args.coordinator_url, shared, [register, {"op": "ready"}])
 
         print("[source] waiting for receiver tasks...")
         start = time.time()
+        completed: list[str] = []
         while True:
-            tasks = http_post_json(
-                f"{args.coordinator_url}/v1/registry/poll",
-                {"model_key": model_key, "my_id": my_id, "rank_info": {"rank": rank}},
-            ).get("tasks", [])
+            # completions of the previous round ride along with the next poll
+            ops = [{"op": "complete", "transfer_ids": completed}] if completed else []
+            ops.append({"op": "poll", "timeout_ms": args.long_poll_ms})
+            tasks = coord_batch(
+                args.coordinator_url, shared, ops, timeout_s=long_poll_http_timeout
+            )[-1].get("tasks", [])
+            completed = []
             for task in tasks:
                 peer_id = task.get("peer_id")
                 dst_params = task.get("dst_params", {})
                 if "demo" not in dst_params:
                     continue
-                dst_addr = int(dst_params["demo"]["addr"])
+                dst = dst_params["demo"]
+                # a striped task only covers [offset, offset + bytes) of the tensor
+                offset = int(dst.get("offset", 0))
+                size = int(dst["bytes"]) if "offset" in dst else bytes_size
+                dst_addr = int(dst["addr"]) + offset
+                src_addr = npu_tensor.data_ptr() + offset
                 t2 = time.perf_counter()
                 last_ret = 0
                 attempts = 0
@@ -208,12 +312,14 @@ def main():
                 for attempt in range(args.transfer_retries + 1):
                     attempts = attempt + 1
                     if args.transfer_wait_s > 0:
-                        time.sleep(args.transfer_wait_s)
+                        with TRACE.span("transfer_wait", "wait"):
+                            time.sleep(args.transfer_wait_s)
                     t2 = time.perf_counter()
-                    ret = engine.transfer_sync_write(
-                        peer_id, npu_tensor.data_ptr(), dst_addr, bytes_size
-                    )
-                    torch.npu.synchronize()
+                    span = TRACE.span("transfer_sync_write", "transfer", peer=peer_id, bytes=size)
+                    with span as span_args:
+                        ret = engine.transfer_sync_write(peer_id, src_addr, dst_addr, size)
+                        torch.npu.synchronize()
+                        span_args["ret"] = ret
                     t3 = time.perf_counter()
                     if ret == 0:
                         last_ret = 0
@@ -227,31 +333,40 @@ def main():
                     raise RuntimeError(f"transfer failed ret={last_ret}")
                 if xfer_ms is None:
                     xfer_ms = 0.0
-                gibps = gib / ((xfer_ms / 1000.0) if xfer_ms > 0 else 1e-6)
+                gibps = (size / (1024.0 * 1024.0 * 1024.0)) / ((xfer_ms / 1000.0) if xfer_ms > 0 else 1e-6)
                 wait_ms = args.transfer_wait_s * attempts * 1000.0
                 print(
                     f"[source] transfer ms={xfer_ms:.3f} wait_ms={wait_ms:.1f} throughput={gibps:.2f} GiB/s"
                 )
                 if task.get("transfer_id"):
-                    http_post_json(
-                        f"{args.coordinator_url}/v1/registry/complete",
-                        {"transfer_id": task["transfer_id"]},
-                    )
+                    completed.append(task["transfer_id"])
             if time.time() - start > args.poll_timeout_s:
+                if completed:
+                    coord_batch(
+                        args.coordinator_url,
+                        shared,
+                        [{"op": "complete", "transfer_ids": completed}],
+                    )
                 break
-            time.sleep(args.poll_interval_s)
+            if args.long_poll_ms <= 0:
+                time.sleep(args.poll_interval_s)
 
     else:
         npu_tensor = torch.empty(shape, dtype=dtype, device="npu")
         bytes_size = npu_tensor.numel() * npu_tensor.element_size()
-        engine.register_memory(npu_tensor.data_ptr(), bytes_size)
+        with TRACE.span("register_memory", "register", bytes=bytes_size):
+            engine.register_memory(npu_tensor.data_ptr(), bytes_size)
 
-        payload = {
+        shared = {
             "role": "receiver",
             "model_key": model_key,
             "my_id": my_id,
-            "node_ip": node_ip,
             "rank_info": {"rank": rank},
+        }
+        register = {
+            "op": "register",
+            "node_ip": node_ip,
+            "topology": topology,
             "params": [
                 {
                     "name": "demo",
@@ -263,24 +378,23 @@ def main():
                 }
             ],
         }
-        http_post_json(f"{args.coordinator_url}/v1/registry/register", payload)
-        http_post_json(
-            f"{args.coordinator_url}/v1/registry/ready",
-            {"model_key": model_key, "my_id": my_id, "role": "receiver", "rank_info": {"rank": rank}},
-        )
 
         print("[receiver] waiting for transfer...")
         start = time.perf_counter()
+        # register, ready and the first wait share one round trip
+        ops = [register, {"op": "ready"}]
         while True:
-            resp = http_post_json(
-                f"{args.coordinator_url}/v1/registry/wait",
-                {"model_key": model_key, "my_id": my_id, "rank_info": {"rank": rank}},
-            )
+            ops.append({"op": "wait", "timeout_ms": args.long_poll_ms})
+            resp = coord_batch(
+                args.coordinator_url, shared, ops, timeout_s=long_poll_http_timeout
+            )[-1]
+            ops = []
             if resp.get("status") == "done":
                 break
             if (time.perf_counter() - start) > args.poll_timeout_s:
                 raise TimeoutError("wait timeout")
-            time.sleep(args.poll_interval_s)
+            if args.long_poll_ms <= 0:
+                time.sleep(args.poll_interval_s)
 
         torch.npu.synchronize()
         end = time.perf_counter()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# Load generator: coordinator requests/sec and latency, threading vs asyncio server
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+COORDINATOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "coordinator.py")
+
+
+def start_server(server: str, port: int) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, COORDINATOR, "--host", "127.0.0.1", "--port", str(port), "--server", server],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError(f"{server} coordinator did not start on port {port}")
+
+
+class Client:
+    """Minimal HTTP/1.1 client; reconnects when the server closes the connection."""
+
+    def __init__(self, port: int, keep_alive: bool):
+        self.port = port
+        self.keep_alive = keep_alive
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+
+    async def post(self, path: str, payload: dict) -> dict:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        body = json.dumps(payload).encode("utf-8")
+        head = (
+            f"POST {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if self.keep_alive else 'close'}\r\n\r\n"
+        )
+        self.writer.write(head.encode("latin-1") + body)
+        raw = await self.reader.readuntil(b"\r\n\r\n")
+        lines = raw.decode("latin-1").split("\r\n")
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", "0"))
+        data = await self.reader.readexactly(length)
+        closed = (
+            not self.keep_alive
+            or lines[0].startswith("HTTP/1.0")
+            or headers.get("connection", "").lower() == "close"
+        )
+        if closed:
+            self.writer.close()
+            self.reader = self.writer = None
+        return json.loads(data) if data else {}
+
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def _client(
+    i: int, port: int, requests: int, keep_alive: bool, lat: list[float], errors: list[int]
+):
+    client = Client(port, keep_alive)
+    base = {"model_key": {"model": "bench-http"}, "my_id": f"c{i}", "rank_info": {"dp_rank": i}}
+    reqs = [
+        (
+            "/v1/registry/register",
+            dict(base, role="source", params=[{"name": "w", "addr": 0, "bytes": 4}]),
+        )
+    ]
+    # non-blocking /poll is the steady-state request of an idle source
+    reqs += [("/v1/registry/poll", dict(base, timeout_ms=0))] * requests
+    for path, payload in reqs:
+        t0 = time.perf_counter()
+        try:
+            await client.post(path, payload)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # e.g. connection resets once the listen backlog overflows
+            errors[0] += 1
+            client.close()
+            continue
+        lat.append(time.perf_counter() - t0)
+    client.close()
+
+
+async def _run(port: int, clients: int, requests: int, keep_alive: bool) -> dict[str, float]:
+    lat: list[float] = []
+    errors = [0]
+    t0 = time.perf_counter()
+    await asyncio.gather(
+        *(_client(i, port, requests, keep_alive, lat, errors) for i in range(clients))
+    )
+    elapsed = time.perf_counter() - t0
+    lat.sort()
+    return {
+        "errors": errors[0],
+        "rps": len(lat) / elapsed,
+        "p50_ms": lat[len(lat) // 2] * 1000.0,
+        "p99_ms": lat[min(len(lat) - 1, int(len(lat) * 0.99))] * 1000.0,
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="Coordinator HTTP load generator")
+    p.add_argument("--servers", nargs="+", default=["threading", "asyncio"])
+    p.add_argument("--clients", type=int, nargs="+", default=[16, 256])
+    p.add_argument("--requests", type=int, default=200, help="per client")
+    p.add_argument("--no-keep-alive", action="store_true")
+    p.add_argument("--port", type=int, default=18080)
+    args = p.parse_args()
+
+    keep_alive = not args.no_keep_alive
+    print(
+        f"{'server':>10} {'clients':>8} {'rps':>10} {'p50_ms':>8} {'p99_ms':>8} {'errors':>7}"
+    )
+    for i, server in enumerate(args.servers):
+        port = args.port + i
+        proc = start_server(server, port)
+        try:
+            for clients in args.clients:
+                r = asyncio.run(_run(port, clients, args.requests, keep_alive))
+                print(
+                    f"{server:>10} {clients:>8} {r['rps']:>10.0f} "
+                    f"{r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['errors']:>7}"
+                )
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
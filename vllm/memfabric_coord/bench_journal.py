@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# Benchmark: journal append cost per fsync policy and replay time on startup
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import coordinator as coord
+
+
+def reset_state():
+    coord.STATE["models"].clear()
+    coord.STATE["transfer_models"].clear()
+    coord.STATE["layouts"].clear()
+
+
+def _fingerprint() -> tuple:
+    """Enough of STATE to tell whether a replay reproduced it."""
+    out = [len(coord.STATE["layouts"])]
+    for key, state in sorted(coord.STATE["models"].items()):
+        out.append(key)
+        out.append(state["next_transfer_id"])
+        out.append(sorted(state["transfer_status"].items()))
+        out.append(sorted((k, len(v)) for k, v in state["pending"].items()))
+        out.append(sorted(state["assignments"].items()))
+    return tuple(map(str, out))
+
+
+def generate(events: int, params: int, receivers: int) -> None:
+    """Drive the coordinator until the journal holds `events` events.
+
+    Each rank_key gets a source and `receivers` receivers registering a
+    shared layout; about half of the transfers are left in flight.
+    """
+    key = coord._model_key_str({"name": "bench-journal"})
+    names = [f"model.layers.{i}.weight" for i in range(params)]
+    state = coord._get_model_state(key)
+    rank = 0
+    while coord.JOURNAL.seq < events:
+        rank_key = coord._rank_key({"dp_rank": rank})
+        ids = [f"s{rank}"] + [f"r{rank}.{j}" for j in range(receivers)]
+        for n, my_id in enumerate(ids):
+            base = (rank << 32) + (n << 24)
+            params_map = {
+                name: {"addr": base + (i << 20), "bytes": 1 << 20}
+                for i, name in enumerate(names)
+            }
+            with coord.LOCK:
+                table = coord._store_layout("bench-layout", params_map)
+            with state["lock"]:
+                role = coord._assign(key, rank_key, my_id)
+                coord._register(key, rank_key, my_id, role, {"dp_rank": rank}, table, {})
+                coord._mark_ready(key, rank_key, my_id, role)
+        with state["lock"]:
+            tasks = state["pending"].get(ids[0], [])
+            state["pending"][ids[0]] = []
+            coord._journal({"op": "poll", "key": key, "my_id": ids[0], "count": len(tasks)})
+            for task in tasks:
+                coord._layer_progress(task["transfer_id"], [0])
+                if rank % 2 == 0:
+                    coord._complete_transfer(task["transfer_id"])
+        coord._maybe_snapshot()
+        rank += 1
+
+
+def run(args, fsync: str, snapshot_every: int) -> dict[str, float]:
+    state_dir = tempfile.mkdtemp(prefix="bench_journal_")
+    try:
+        reset_state()
+        journal = coord.Journal(state_dir, fsync, args.fsync_interval_ms, snapshot_every)
+        journal.load()
+        coord.JOURNAL = journal
+        t0 = time.perf_counter()
+        generate(args.events, args.params, args.receivers)
+        write_s = time.perf_counter() - t0
+        coord.JOURNAL = None
+        journal.close()
+        total = journal.seq
+        expected = _fingerprint()
+        log_mb = os.path.getsize(journal.log_path) / 1e6
+        snap_mb = (
+            os.path.getsize(journal.snapshot_path) / 1e6
+            if os.path.exists(journal.snapshot_path)
+            else 0.0
+        )
+
+        reset_state()
+        restored = coord.Journal(state_dir, "never", snapshot_every=snapshot_every)
+        t0 = time.perf_counter()
+        replayed = restored.load()
+        replay_s = time.perf_counter() - t0
+        restored.close()
+        if _fingerprint() != expected or restored.seq != total:
+            raise RuntimeError("replayed state differs from the original")
+        return {
+            "events": total,
+            "append_us": write_s / total * 1e6,
+            "log_mb": log_mb,
+            "snap_mb": snap_mb,
+            "replayed": replayed,
+            "load_s": replay_s,
+        }
+    finally:
+        coord.JOURNAL = None
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Coordinator journal benchmark")
+    p.add_argument("--events", type=int, default=100000)
+    p.add_argument("--params", type=int, default=16, help="params per registration")
+    p.add_argument("--receivers", type=int, default=7, help="receivers per rank_key")
+    p.add_argument("--fsync", nargs="+", default=["never", "interval", "always"])
+    p.add_argument("--fsync-interval-ms", type=float, default=100)
+    p.add_argument(
+        "--snapshot-every",
+        type=int,
+        nargs="+",
+        default=[0, 10000],
+        help="0 replays the whole log",
+    )
+    args = p.parse_args()
+
+    print(
+        f"{'fsync':>9} {'snap_every':>10} {'events':>8} {'append_us':>10} "
+        f"{'log_MB':>7} {'snap_MB':>8} {'replayed':>9} {'load_s':>7}"
+    )
+    for fsync in args.fsync:
+        for snapshot_every in args.snapshot_every:
+            r = run(args, fsync, snapshot_every)
+            print(
+                f"{fsync:>9} {snapshot_every:>10} {r['events']:>8} "
+                f"{r['append_us']:>10.2f} {r['log_mb']:>7.1f} {r['snap_mb']:>8.1f} "
+                f"{r['replayed']:>9} {r['load_s']:>7.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# Benchmark: registration throughput and lock wait of several models scaling
+# out at once, per-model locks vs one lock shared by every model (the old
+# global LOCK)
+
+import argparse
+import json
+import threading
+import time
+import timeit
+
+import coordinator as coord
+
+
+def lock_wait_s() -> tuple[float, int]:
+    """Seconds waited and contended acquires of the "bench" TimedLocks."""
+    hist = coord.HISTOGRAMS.get("lock_wait_seconds", {}).get(("bench",))
+    if hist is None:
+        return 0.0, 0
+    snap = hist.snapshot()
+    return snap["sum"], sum(snap["counts"])
+
+
+def hold_critical_sections(hold_s: float):
+    """Stretch every critical section that touches a participant by hold_s,
+    sleeping with the GIL released like a blocking write (say, an fsynced
+    journal append) would; returns the original _touch to restore."""
+    touch = coord._touch
+
+    def _touch(model_state: dict, my_id: str) -> None:
+        touch(model_state, my_id)
+        time.sleep(hold_s)
+
+    if hold_s > 0:
+        coord._touch = _touch
+    return touch
+
+
+def reset_state():
+    coord.STATE["models"].clear()
+    coord.STATE["transfer_models"].clear()
+    coord.STATE["layouts"].clear()
+
+
+def _post(path: str, req: dict) -> tuple[int, dict]:
+    out = coord._dispatch_post(path, "application/json", json.dumps(req).encode("utf-8"))
+    if isinstance(out, coord.LongPoll):
+        out = coord._long_poll_blocking(out)
+    return out
+
+
+def _receivers(model_key: dict, worker: int, count: int, params: list[dict]) -> None:
+    for i in range(count):
+        code, resp = _post(
+            "/v1/registry/batch",
+            {
+                "model_key": model_key,
+                "my_id": f"w{worker}r{i}",
+                "role": "receiver",
+                "ops": [{"op": "register", "params": params}, {"op": "ready"}],
+            },
+        )
+        if code != 200:
+            raise RuntimeError(f"register failed: {code} {resp}")
+
+
+def _source(model_key: dict, expected: int) -> None:
+    completed: list[str] = []
+    served = 0
+    shared = {"model_key": model_key, "my_id": "src", "role": "source"}
+    while served < expected:
+        ops = [{"op": "complete", "transfer_ids": completed}] if completed else []
+        ops.append({"op": "poll", "timeout_ms": 1000})
+        code, resp = _post("/v1/registry/batch", dict(shared, ops=ops))
+        if code != 200:
+            raise RuntimeError(f"poll failed: {code} {resp}")
+        tasks = resp["results"][-1]["result"]["tasks"]
+        completed = [t["transfer_id"] for t in tasks]
+        served += len(tasks)
+    if completed:
+        _post("/v1/registry/complete", {"transfer_ids": completed})
+
+
+def run(
+    models: int, workers: int, receivers: int, params: int, shared_lock: bool, hold_s: float
+) -> dict[str, float]:
+    """Registrations per second across all models, and lock wait per
+    registration and as a share of the threads' time."""
+    reset_state()
+    coord.HISTOGRAMS.get("lock_wait_seconds", {}).pop(("bench",), None)
+    table = [
+        {"name": f"model.layers.{i}.weight", "addr": i << 20, "bytes": 1 << 20}
+        for i in range(params)
+    ]
+    keys = [{"model": f"bench-models-{m}", "tp": 1} for m in range(models)]
+    shared = coord.TimedLock("bench")
+    for model_key in keys:
+        state = coord._get_model_state(coord._model_key_str(model_key))
+        state["lock"] = shared if shared_lock else coord.TimedLock("bench")
+        state["cond"] = threading.Condition(state["lock"])
+    threads = []
+    for model_key in keys:
+        _post(
+            "/v1/registry/batch",
+            {
+                "model_key": model_key,
+                "my_id": "src",
+                "role": "source",
+                "ops": [{"op": "register", "params": table}, {"op": "ready"}],
+            },
+        )
+        threads.append(
+            threading.Thread(target=_source, args=(model_key, workers * receivers))
+        )
+        threads += [
+            threading.Thread(target=_receivers, args=(model_key, w, receivers, table))
+            for w in range(workers)
+        ]
+    touch = hold_critical_sections(hold_s)
+    t0 = time.perf_counter()
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        coord._touch = touch
+    elapsed = time.perf_counter() - t0
+    registrations = models * workers * receivers
+    wait_s, _ = lock_wait_s()
+    return {
+        "rps": registrations / elapsed,
+        "wait_us": wait_s / registrations * 1e6,
+        "wait_pct": 100.0 * wait_s / (elapsed * len(threads)),
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="Multi-model coordinator contention benchmark")
+    p.add_argument("--models", type=int, nargs="+", default=[1, 4, 16])
+    p.add_argument("--workers", type=int, default=4, help="registering threads per model")
+    p.add_argument("--receivers", type=int, default=50, help="registrations per worker")
+    p.add_argument("--params", type=int, default=500, help="params per registration")
+    p.add_argument(
+        "--hold-us",
+        type=float,
+        nargs="+",
+        default=[0, 1000],
+        help="extra time each participant-touching critical section holds the "
+        "model lock, sleeping with the GIL released (0: as is)",
+    )
+    args = p.parse_args()
+
+    model_key = {"model": "/models/bench", "tp": 8, "pp": 1, "dtype": "bfloat16"}
+    dumps = lambda: json.dumps(model_key, sort_keys=True, separators=(",", ":"))
+    n = 100000
+    print(
+        f"model key: json.dumps {timeit.timeit(dumps, number=n) / n * 1e6:.2f}us, "
+        f"cached {timeit.timeit(lambda: coord._model_key_str(model_key), number=n) / n * 1e6:.2f}us"
+    )
+    # wait_us: lock wait per registration; wait%: share of the threads' time
+    # spent waiting for a lock
+    print(
+        f"{'hold_us':>7} {'models':>7} {'shared_rps':>11} {'model_rps':>10} "
+        f"{'shared_wait_us':>15} {'model_wait_us':>14} {'shared_wait%':>13} {'model_wait%':>12}"
+    )
+    for hold_us in args.hold_us:
+        for models in args.models:
+            shared = run(
+                models, args.workers, args.receivers, args.params, True, hold_us / 1e6
+            )
+            sharded = run(
+                models, args.workers, args.receivers, args.params, False, hold_us / 1e6
+            )
+            print(
+                f"{hold_us:>7g} {models:>7} {shared['rps']:>11.0f} {sharded['rps']:>10.0f} "
+                f"{shared['wait_us']:>15.0f} {sharded['wait_us']:>14.0f} "
+                f"{shared['wait_pct']:>13.1f} {sharded['wait_pct']:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
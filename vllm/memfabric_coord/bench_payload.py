@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# Benchmark: JSON vs compact registration payload size and (de)serialization time
+
+import argparse
+import json
+import time
+
+import coordinator as coord
+
+# the encoder the loader actually sends with; importing coordinator put the
+# loader's helper directory on sys.path
+from memfabric_transfer import encode_params_compact
+
+
+def make_params(n: int) -> list[dict]:
+    # mirrors _params_metadata output of the loader
+    out = []
+    addr = 0x12C000000000
+    for i in range(n):
+        size = 8192 * 8192 * 2 if i % 4 else 8192 * 2
+        out.append(
+            {
+                "name": f"model.layers.{i // 8}.self_attn.proj_{i % 8}.weight",
+                "dtype": "torch.bfloat16",
+                "shape": [8192, 8192] if i % 4 else [8192],
+                "numel": size // 2,
+                "bytes": size,
+                "addr": addr,
+                "device": "npu:0",
+            }
+        )
+        addr += size
+    return out
+
+
+def timed(fn, repeat: int) -> tuple[float, object]:
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0, result
+
+
+def run(n: int, repeat: int) -> dict[str, float]:
+    params = make_params(n)
+    req = {
+        "role": "receiver",
+        "model_key": {"model": "bench", "tp": 8},
+        "my_id": "10.0.0.1:10000",
+        "rank_info": {"tp_rank": 0},
+    }
+    json_enc_ms, json_body = timed(
+        lambda: json.dumps({**req, "params": params}).encode("utf-8"), repeat
+    )
+    json_dec_ms, json_map = timed(
+        lambda: coord._params_to_map(json.loads(json_body)["params"]), repeat
+    )
+    compact_enc_ms, compact_body = timed(
+        lambda: encode_params_compact(req, params), repeat
+    )
+    compact_dec_ms, (_, table) = timed(
+        lambda: coord._decode_compact_register(compact_body), repeat
+    )
+    # /poll response carrying the receiver's params to its source
+    json_task = json.dumps({"dst_params": json_map})
+    compact_task = json.dumps({"dst_params": table}, default=coord._json_default)
+    return {
+        "json_bytes": len(json_body),
+        "compact_bytes": len(compact_body),
+        "json_enc_ms": json_enc_ms,
+        "compact_enc_ms": compact_enc_ms,
+        "json_dec_ms": json_dec_ms,
+        "compact_dec_ms": compact_dec_ms,
+        "json_task_bytes": len(json_task),
+        "compact_task_bytes": len(compact_task),
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="Registration payload benchmark")
+    p.add_argument("--params", type=int, nargs="+", default=[1000, 10000, 100000])
+    p.add_argument("--repeat", type=int, default=5)
+    args = p.parse_args()
+
+    print(
+        f"{'params':>8} {'json_KiB':>9} {'compact_KiB':>12} {'json_enc_ms':>12} "
+        f"{'compact_enc_ms':>15} {'json_dec_ms':>12} {'compact_dec_ms':>15} "
+        f"{'json_task_KiB':>14} {'compact_task_KiB':>17}"
+    )
+    for n in args.params:
+        r = run(n, args.repeat)
+        print(
+            f"{n:>8} {r['json_bytes'] / 1024:>9.1f} {r['compact_bytes'] / 1024:>12.1f} "
+            f"{r['json_enc_ms']:>12.2f} {r['compact_enc_ms']:>15.2f} "
+            f"{r['json_dec_ms']:>12.2f} {r['compact_dec_ms']:>15.2f} "
+            f"{r['json_task_bytes'] / 1024:>14.1f} {r['compact_task_bytes'] / 1024:>17.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
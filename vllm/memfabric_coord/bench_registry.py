@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# Microbenchmark: coordinator register/ready/complete/heartbeat latency vs rank count
+
+import argparse
+import time
+
+import coordinator as coord
+
+
+def reset_state():
+    coord.STATE["models"].clear()
+    coord.STATE["transfer_models"].clear()
+
+
+def run(ranks: int) -> dict[str, float]:
+    reset_state()
+    model_key = {"name": "bench", "ranks": ranks}
+    key = coord._model_key_str(model_key)
+    params_map = {"w": {"addr": 0, "bytes": 4}}
+    totals = {"register": 0.0, "ready": 0.0, "complete": 0.0, "heartbeat": 0.0}
+    transfer_ids = []
+    state = coord._get_model_state(key)
+    with state["lock"]:
+        for i in range(ranks):
+            rank_key = coord._rank_key({"dp_rank": i})
+            for role, my_id in (("source", f"s{i}"), ("receiver", f"r{i}")):
+                t0 = time.perf_counter()
+                coord._register(key, rank_key, my_id, role, {}, params_map, {})
+                t1 = time.perf_counter()
+                coord._mark_ready(key, rank_key, my_id, role)
+                t2 = time.perf_counter()
+                totals["register"] += t1 - t0
+                totals["ready"] += t2 - t1
+        for tasks in state["pending"].values():
+            transfer_ids.extend(t["transfer_id"] for t in tasks)
+        for tid in transfer_ids:
+            t0 = time.perf_counter()
+            coord._complete_transfer(tid)
+            totals["complete"] += time.perf_counter() - t0
+    if len(transfer_ids) != ranks:
+        raise RuntimeError(f"expected {ranks} transfers, got {len(transfer_ids)}")
+    # through the route, which takes the model lock itself
+    for i in range(ranks):
+        for my_id in (f"s{i}", f"r{i}"):
+            t0 = time.perf_counter()
+            _, resp = coord._route_heartbeat({"my_id": my_id, "model_key": model_key})
+            totals["heartbeat"] += time.perf_counter() - t0
+            if not resp["known"]:
+                raise RuntimeError(f"heartbeat of {my_id} not known")
+    ops = {"register": 2 * ranks, "ready": 2 * ranks, "complete": ranks, "heartbeat": 2 * ranks}
+    return {name: totals[name] / ops[name] * 1e6 for name in totals}
+
+
+def main():
+    p = argparse.ArgumentParser(description="Coordinator registry microbenchmark")
+    p.add_argument("--ranks", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    args = p.parse_args()
+
+    print(
+        f"{'ranks':>8} {'register_us':>12} {'ready_us':>10} {'complete_us':>12} "
+        f"{'heartbeat_us':>13}"
+    )
+    for ranks in args.ranks:
+        r = run(ranks)
+        print(
+            f"{ranks:>8} {r['register']:>12.2f} {r['ready']:>10.2f} {r['complete']:>12.2f} "
+            f"{r['heartbeat']:>13.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
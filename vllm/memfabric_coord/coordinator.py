@@ -2,21 +2,183 @@
 # Minimal HTTP control plane for memfabric weight transfer
 
 import argparse
+import asyncio
+import contextlib
+import hashlib
 import json
+import os
+import pickle
+import re
+import struct
+import sys
 import threading
 import time
+import traceback
+from array import array
+from collections import deque
+from collections.abc import Awaitable, Callable, Iterator, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
-from typing import Any
+from typing import Any, NamedTuple
 
+# memfabric_metrics is stdlib only and shared with the loader's /metrics
+# exporter, so both use the same buckets and label escaping. It sits in
+# ../model_executor/model_loader in the source tree; the image copies it
+# next to this file (see Dockerfile).
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "model_executor", "model_loader")
+)
+from memfabric_metrics import (
+    BYTES_BUCKETS,
+    LATENCY_BUCKETS,
+    TRANSFER_SECONDS_BUCKETS,
+    Histogram,
+    format_labels,
+    render_histogram,
+)
+from memfabric_metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+
+# Prometheus histograms for /metrics, see _render_metrics
+LOCK_WAIT_BUCKETS = (1e-6, 1e-5, 1e-4, 0.001, 0.01, 0.1, 1.0)
+
+
+# name -> label values tuple -> Histogram
+HISTOGRAMS: dict[str, dict[tuple, Histogram]] = {}
+_HISTOGRAMS_LOCK = threading.Lock()
+
+
+def _histogram(name: str, labels: tuple, buckets: tuple[float, ...]) -> Histogram:
+    family = HISTOGRAMS.get(name)
+    hist = family.get(labels) if family is not None else None
+    if hist is None:
+        with _HISTOGRAMS_LOCK:
+            hist = HISTOGRAMS.setdefault(name, {}).setdefault(labels, Histogram(buckets))
+    return hist
+
+
+class TimedLock:
+    """threading.Lock that records how long contended acquires wait in the
+    memfabric_coord_lock_wait_seconds histogram; uncontended ones cost one
+    extra non-blocking try."""
+
+    __slots__ = ("_lock", "_wait")
+
+    def __init__(self, kind: str):
+        self._lock = threading.Lock()
+        self._wait = _histogram("lock_wait_seconds", (kind,), LOCK_WAIT_BUCKETS)
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if self._lock.acquire(False):
+            return True
+        if not blocking:
+            return False
+        t0 = time.perf_counter()
+        ok = self._lock.acquire(True, timeout)
+        if ok:
+            self._wait.observe(time.perf_counter() - t0)
+        return ok
+
+    def release(self) -> None:
+        self._lock.release()
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc) -> None:
+        self._lock.release()
+
+
+# Locking: each model state has its own "lock", held by routes while they
+# read or change that model, so models never wait on each other. LOCK only
+# guards the tables shared across models (STATE["models"] membership,
+# transfer_models, layouts) and is held briefly. A model lock may be held
+# while taking LOCK, never the other way round, and never two model locks.
 STATE: dict[str, Any] = {
     "models": {},
-    "next_transfer_id": 1,
+    # transfer_id -> model key, so /complete does not scan every model
+    "transfer_models": {},
+    # layout_hash -> {"names", "sizes", "index"}, shared by every registrant
+    # with that layout so later ones only send addresses
+    "layouts": {},
+    # cross-model release order when max_active_transfers is set, see
+    # _schedule: released-and-uncompleted transfers of all models, virtual
+    # time, per-model finish tags, and model key -> (priority, weight,
+    # bytes of its next releasable task)
+    "sched": {"active": 0, "vtime": 0.0, "finish": {}, "waiting": {}},
+}
+LOCK = TimedLock("global")
+CONFIG: dict[str, Any] = {
+    # "single": every receiver of a rank_key pulls from the registered source.
+    # "broadcast": finished receivers that registered with can_serve become
+    # extra sources, so replication fans out as a binomial tree.
+    "scheduler": "single",
+    # concurrent tasks per source in broadcast mode
+    "broadcast_fanout": 1,
+    # split each receiver across up to this many sources of its rank_key
+    "stripe_sources": 1,
+    # per model, at most this many transfers in flight between different
+    # racks (see _tier); 0 means no cap
+    "max_cross_rack": 0,
+    # admission control, see _source_limit: at most this many released
+    # transfers per source (0: no cap), and no more than the source's
+    # estimated egress divided by min_stream_gibps (0: off)
+    "source_max_active": 0,
+    "min_stream_gibps": 0.0,
+    # at most this many released transfers across all models (0: no cap);
+    # queued tasks are then released by model priority and weighted fair
+    # share of bytes, see _schedule
+    "max_active_transfers": 0,
+    # garbage collection, see _gc: evict participants not heard from in
+    # participant_ttl_s, and fold the transfers of receivers finished for
+    # done_ttl_s into one summary per receiver; 0 disables either
+    "participant_ttl_s": 0.0,
+    "done_ttl_s": 0.0,
 }
-LOCK = threading.Lock()
+# stripe sizes are rounded up to a multiple of this many bytes
+STRIPE_ALIGN = 1 << 20
+GIB = float(1 << 30)
+# weight of a new sample in the per-source egress estimate
+EGRESS_EWMA = 0.3
+# a transfer without a byte report for this long counts as stalled (no rate)
+PROGRESS_STALE_S = 30.0
+# topology labels a registration may carry besides node_ip, innermost first
+TOPOLOGY_LABELS = ("rack", "switch")
+# _tier values from this one up cross rack boundaries
+TIER_CROSS_RACK = 2
+# layer group of a parameter; must match memfabric_transfer.layer_group
+LAYER_RE = re.compile(r"(?:^|\.)layers\.(\d+)\.")
+# compact registration body, see _decode_compact_register
+COMPACT_CONTENT_TYPE = "application/x-memfabric-params"
+COMPACT_MAGIC = b"MFP1"
+COMPACT_HEADER = struct.Struct("<4sII")
+# upper bound for long-poll timeout_ms on /poll and /wait
+MAX_LONG_POLL_MS = 60000
+# set by --state-dir, see Journal
+JOURNAL: "Journal | None" = None
+
+
+# canonical key string per model_key, see _model_key_str
+_MODEL_KEYS: dict[tuple, str] = {}
+_MAX_MODEL_KEYS = 4096
 
 
 def _model_key_str(model_key: dict) -> str:
-    return json.dumps(model_key, sort_keys=True, separators=(",", ":"))
+    # every request carries model_key; cache the sorted JSON dump by its
+    # items (with value types, so 1 and True stay different keys)
+    try:
+        cache_key = tuple([(k, v.__class__, v) for k, v in model_key.items()])
+        key = _MODEL_KEYS.get(cache_key)
+    except TypeError:
+        # unhashable values (lists, nested dicts)
+        return json.dumps(model_key, sort_keys=True, separators=(",", ":"))
+    if key is None:
+        key = json.dumps(model_key, sort_keys=True, separators=(",", ":"))
+        if len(_MODEL_KEYS) < _MAX_MODEL_KEYS:
+            _MODEL_KEYS[cache_key] = key
+    return key
 
 
 def _rank_key(rank_info: dict) -> str:
@@ -27,9 +189,21 @@ def _rank_key(rank_info: dict) -> str:
 
 
 def _get_model_state(key: str) -> dict[str, Any]:
-    models = STATE["models"]
-    if key not in models:
+    state = STATE["models"].get(key)
+    if state is not None:
+        return state
+    with LOCK:
+        models = STATE["models"]
+        if key in models:
+            return models[key]
+        lock = TimedLock("model")
         models[key] = {
+            "key": key,
+            "lock": lock,
+            # transfer ids are t<n>.<tag>: numbered per model so replaying
+            # the journal reproduces them whatever the models' interleaving
+            "tag": hashlib.sha1(key.encode("utf-8")).hexdigest()[:10],
+            "next_transfer_id": 1,
             "sources": {},
             "receivers": {},
             "pending": {},
@@ -37,16 +211,173 @@ def _get_model_state(key: str) -> dict[str, Any]:
             "source_assignments": {},
             "transfer_status": {},
             "receiver_transfers": {},
-            "ready_sources": set(),
-            "ready_receivers": set(),
+            # rank_key -> {my_id} of participants that reported ready
+            "ready_sources": {},
+            "ready_receivers": {},
+            # rank_key -> {my_id: None} of receivers without a transfer yet
+            "unassigned_receivers": {},
+            # rank_key -> {my_id: None} of receivers promoted to sources
+            "serving_sources": {},
+            # source my_id -> transfers assigned and not yet completed
+            "source_load": {},
+            # transfer_id -> (rank_key, source my_id, receiver my_id)
+            "transfer_peers": {},
+            # transfer_id -> {"total": {layer group}, "done": {layer group}}
+            "transfer_layers": {},
+            # transfer_id -> [bytes done, wall time of that report, GiB/s]
+            # of unfinished transfers whose sender reported bytes
+            "transfer_sent": {},
+            # transfer_ids in flight between different racks
+            "cross_rack": set(),
+            # source my_id -> deque of (owner, task) not yet released to
+            # pending, see _release
+            "source_queue": {},
+            # source my_id -> released transfers not yet completed
+            "source_active": {},
+            # transfer_id -> bytes, and wall time it was released
+            "transfer_bytes": {},
+            "transfer_started": {},
+            # source my_id -> estimated aggregate egress GiB/s (observed)
+            "source_gibps": {},
+            # higher priority models are released first; within a priority
+            # models share the max_active_transfers budget by weight
+            "priority": 0,
+            "weight": 1.0,
+            # my_id -> wall time of its last request or heartbeat, of every
+            # assigned or registered participant; see _touch and _refresh
+            "last_seen": {},
+            # transfer_id -> wall time it completed
+            "transfer_done_at": {},
+            # my_id -> (layers_ready, layers_total, bytes_total) of receivers whose
+            # finished transfers were collected, see _compact_receiver
+            "finished_receivers": {},
+            # my_id -> memfabric_metrics snapshot pushed with heartbeats
+            "loader_metrics": {},
+            # signalled whenever pending tasks or transfer status change,
+            # see _notify
+            "cond": threading.Condition(lock),
+            # futures of asyncio long-polls waiting on this model
+            "waiters": set(),
         }
     return models[key]
 
 
-def _new_transfer_id() -> str:
-    tid = STATE["next_transfer_id"]
-    STATE["next_transfer_id"] += 1
-    return f"t{tid}"
+def _wake(fut: asyncio.Future) -> None:
+    if not fut.done():
+        fut.set_result(None)
+
+
+def _notify(model_state: dict) -> None:
+    """Wake long-polls of both server implementations; caller holds the
+    model lock."""
+    model_state["cond"].notify_all()
+    waiters = model_state["waiters"]
+    for fut in waiters:
+        fut.get_loop().call_soon_threadsafe(_wake, fut)
+    waiters.clear()
+
+
+def _timeout_s(req: dict) -> float:
+    timeout_ms = float(req.get("timeout_ms", 0) or 0)
+    return min(max(timeout_ms, 0.0), MAX_LONG_POLL_MS) / 1000.0
+
+
+def _new_transfer_id(model_state: dict, key: str) -> str:
+    n = model_state["next_transfer_id"]
+    model_state["next_transfer_id"] += 1
+    transfer_id = f"t{n}.{model_state['tag']}"
+    with LOCK:
+        STATE["transfer_models"][transfer_id] = key
+    return transfer_id
+
+
+def _transfer_model_state(transfer_id: str) -> dict[str, Any] | None:
+    key = STATE["transfer_models"].get(transfer_id)
+    return STATE["models"].get(key) if key is not None else None
+
+
+class ParamTable(Mapping):
+    """Columnar params_map from a compact or layout-hash registration.
+
+    Only the name table and packed addr/size arrays are stored; the
+    {"addr", "bytes"} entries are built on access. Tables of the same
+    layout share names, sizes and the name index.
+    """
+
+    __slots__ = ("_index", "addrs", "layout_hash", "names", "sizes")
+
+    def __init__(
+        self,
+        names: list[str],
+        addrs: array,
+        sizes: array,
+        layout_hash: str | None = None,
+        index: dict[str, int] | None = None,
+    ):
+        self.names = names
+        self.addrs = addrs
+        self.sizes = sizes
+        self.layout_hash = layout_hash
+        self._index = index
+
+    def __getitem__(self, name: str) -> dict[str, int]:
+        if self._index is None:
+            self._index = {n: i for i, n in enumerate(self.names)}
+        i = self._index[name]
+        return {"addr": self.addrs[i], "bytes": self.sizes[i]}
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def to_wire(self, with_names: bool = True) -> dict[str, Any]:
+        columns: dict[str, Any] = {"addrs": self.addrs.tolist()}
+        if self.layout_hash:
+            columns["layout_hash"] = self.layout_hash
+        if with_names or not self.layout_hash:
+            columns["names"] = self.names
+            columns["sizes"] = self.sizes.tolist()
+        return {"__columns__": columns}
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, ParamTable):
+        return obj.to_wire()
+    if isinstance(obj, _WireParams):
+        return obj.table.to_wire(obj.with_names)
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def _decode_compact_register(body: bytes) -> tuple[dict, ParamTable]:
+    """Inverse of the loader's memfabric_transfer.encode_params_compact.
+
+    Layout: COMPACT_HEADER(magic, header_len, count), JSON header (the request
+    without "params"), u32 names_len, "\n"-joined names, count little-endian
+    u64 addrs, count little-endian u64 sizes.
+    """
+    magic, header_len, count = COMPACT_HEADER.unpack_from(body, 0)
+    if magic != COMPACT_MAGIC:
+        raise ValueError("bad compact params magic")
+    off = COMPACT_HEADER.size
+    req = json.loads(body[off : off + header_len].decode("utf-8"))
+    off += header_len
+    (names_len,) = struct.unpack_from("<I", body, off)
+    off += 4
+    names = body[off : off + names_len].decode("utf-8").split("\n") if count else []
+    off += names_len
+    columns = []
+    for _ in range(2):
+        col = array("Q")
+        col.frombytes(body[off : off + 8 * count])
+        if sys.byteorder == "big":
+            col.byteswap()
+        columns.append(col)
+        off += 8 * count
+    if len(names) != count or len(columns[1]) != count:
+        raise ValueError("truncated compact params body")
+    return req, ParamTable(names, columns[0], columns[1])
 
 
 def _params_to_map(params: list[dict]) -> dict[str, dict[str, Any]]:
@@ -62,240 +393,2129 @@ def _params_to_map(params: list[dict]) -> dict[str, dict[str, Any]]:
     return out
 
 
-def _maybe_create_tasks(model_state: dict, rank_key: str):
-    # only dispatch when both sides are ready
-    source_ready = any(
-        key.startswith(f"{rank_key}|") for key in model_state.get("ready_sources", set())
+def _put_layout(layout_hash: str, names: list[str], sizes: array) -> dict[str, Any]:
+    layout = {"names": names, "sizes": sizes, "index": {n: i for i, n in enumerate(names)}}
+    STATE["layouts"][layout_hash] = layout
+    return layout
+
+
+def _store_layout(layout_hash: str, params_map: Mapping) -> ParamTable:
+    """Remember the name table of layout_hash and return params_map as a
+    ParamTable sharing it. Caller holds LOCK."""
+    layout = STATE["layouts"].get(layout_hash)
+    if layout is None or list(layout["names"]) != list(params_map):
+        names = list(params_map)
+        sizes = array("Q", (int(params_map[n]["bytes"]) for n in names))
+        layout = _put_layout(layout_hash, names, sizes)
+        _journal({"op": "layout", "hash": layout_hash, "names": names, "sizes": sizes.tolist()})
+    addrs = array("Q", (int(params_map[n]["addr"]) for n in layout["names"]))
+    return ParamTable(
+        layout["names"], addrs, layout["sizes"], layout_hash, layout["index"]
     )
-    receiver_ready = any(
-        key.startswith(f"{rank_key}|")
-        for key in model_state.get("ready_receivers", set())
+
+
+def _layout_params(layout_hash: str, addrs: list[int]) -> ParamTable | None:
+    """ParamTable for an address-only registration, None if the layout is
+    unknown. Caller holds LOCK."""
+    layout = STATE["layouts"].get(layout_hash)
+    if layout is None:
+        return None
+    if len(addrs) != len(layout["names"]):
+        raise ValueError(
+            f"layout {layout_hash} has {len(layout['names'])} params, got {len(addrs)} addrs"
+        )
+    return ParamTable(
+        layout["names"],
+        array("Q", addrs),
+        layout["sizes"],
+        layout_hash,
+        layout["index"],
     )
-    if not (source_ready and receiver_ready):
-        return
+
+
+class _WireParams:
+    # serialized by _json_default, i.e. outside the model lock
+    __slots__ = ("table", "with_names")
+
+    def __init__(self, table: ParamTable, with_names: bool):
+        self.table = table
+        self.with_names = with_names
+
+
+def _task_to_wire(task: dict[str, Any], layouts_known: set[str]) -> dict[str, Any]:
+    """Send only dst addresses when the source already has the layout."""
+    dst = task.get("dst_params")
+    if not isinstance(dst, ParamTable) or not dst.layout_hash:
+        return task
+    known = dst.layout_hash in layouts_known
+    return dict(task, dst_params=_WireParams(dst, not known))
+
+
+def _layer_group(name: str) -> int:
+    # decoder layer index, -1 for embeddings, final norm, lm_head, ...
+    m = LAYER_RE.search(name)
+    return int(m.group(1)) if m else -1
+
+
+def _rank_ready(model_state: dict, rank_key: str) -> bool:
+    return bool(model_state["ready_sources"].get(rank_key)) and bool(
+        model_state["ready_receivers"].get(rank_key)
+    )
+
+
+def _stripe_params(
+    params_map: dict[str, dict[str, Any]], n: int
+) -> list[dict[str, dict[str, Any]]]:
+    """Split params_map into up to n byte-balanced stripes.
+
+    Stripes are contiguous in receiver address order so the source can still
+    coalesce them; a parameter crossing a stripe boundary is split into
+    entries carrying an "offset" into the parameter.
+    """
+    items = sorted(params_map.items(), key=lambda kv: kv[1]["addr"])
+    total = sum(meta["bytes"] for _, meta in items)
+    if n <= 1 or total <= 0:
+        return [params_map]
+    target = -(-total // n)
+    target += -target % STRIPE_ALIGN
+    stripes: list[dict[str, dict[str, Any]]] = [{}]
+    filled = 0
+    for name, meta in items:
+        size = meta["bytes"]
+        offset = 0
+        while True:
+            if filled >= target and len(stripes) < n:
+                stripes.append({})
+                filled = 0
+            take = size - offset
+            if len(stripes) < n:
+                take = min(take, target - filled)
+            if offset == 0 and take == size:
+                stripes[-1][name] = meta
+            else:
+                stripes[-1][name] = {"addr": meta["addr"], "bytes": take, "offset": offset}
+            filled += take
+            offset += take
+            if offset >= size:
+                break
+    return stripes
+
+
+def _rank_sources(model_state: dict, rank_key: str) -> list[str]:
     source = model_state["sources"].get(rank_key)
-    if not source:
-        return
-    receivers = model_state["receivers"].get(rank_key, {})
-    for rid, recv in receivers.items():
-        if recv.get("transfer_id"):
+    ids = [source["my_id"]] if source else []
+    ids.extend(model_state["serving_sources"].get(rank_key, {}))
+    return ids
+
+
+def _participant(model_state: dict, rank_key: str, my_id: str) -> dict[str, Any]:
+    source = model_state["sources"].get(rank_key)
+    if source and source["my_id"] == my_id:
+        return source
+    return model_state["receivers"][rank_key][my_id]
+
+
+def _source_params_map(
+    model_state: dict, rank_key: str, source_id: str
+) -> dict[str, dict[str, Any]]:
+    return _participant(model_state, rank_key, source_id)["params_map"]
+
+
+def _tier(a: dict[str, Any], b: dict[str, Any]) -> int:
+    """Distance of two registrations: 0 same node, 1 same rack, 2 same
+    switch, 3 across the spine (or unknown)."""
+    ta, tb = a.get("topology", {}), b.get("topology", {})
+    for tier, label in enumerate(("node_ip",) + TOPOLOGY_LABELS):
+        if ta.get(label) and ta.get(label) == tb.get(label):
+            return tier
+    return len(TOPOLOGY_LABELS) + 1
+
+
+def _cross_rack_room(model_state: dict) -> int:
+    cap = int(CONFIG["max_cross_rack"])
+    if cap <= 0:
+        return 1 << 30
+    return max(0, cap - len(model_state["cross_rack"]))
+
+
+def _src_view(
+    src_map: dict[str, dict[str, Any]], dst_params: dict[str, dict[str, Any]]
+) -> dict[str, dict[str, Any]]:
+    # source addresses for the (possibly striped) entries of dst_params
+    out = {}
+    for name, dst in dst_params.items():
+        src = src_map.get(name)
+        if src is None:
             continue
-        transfer_id = _new_transfer_id()
+        if "offset" in dst:
+            out[name] = {"addr": src["addr"], "bytes": dst["bytes"], "offset": dst["offset"]}
+        else:
+            out[name] = src
+    return out
+
+
+def _create_task(
+    model_state: dict,
+    key: str,
+    rank_key: str,
+    source_id: str,
+    rid: str,
+    dst_params: dict[str, dict[str, Any]],
+) -> str:
+    transfer_id = _new_transfer_id(model_state, key)
+    if model_state["receivers"][rank_key][rid].get("mode") == "pull":
+        # pull: the receiver reads from the source, which stays passive
+        src_map = _source_params_map(model_state, rank_key, source_id)
+        task = {
+            "transfer_id": transfer_id,
+            "op": "read",
+            "peer_id": source_id,
+            "src_params": _src_view(src_map, dst_params),
+        }
+        owner = rid
+    else:
         task = {
             "transfer_id": transfer_id,
-            "peer_id": recv["my_id"],
-            "dst_params": recv["params_map"],
+            "peer_id": rid,
+            "dst_params": dst_params,
         }
-        model_state.setdefault("pending", {}).setdefault(source["my_id"], []).append(
-            task
+        owner = source_id
+    model_state["source_queue"].setdefault(source_id, deque()).append((owner, task))
+    model_state["transfer_status"][transfer_id] = "pending"
+    model_state["transfer_bytes"][transfer_id] = _params_bytes(dst_params)
+    model_state.setdefault("receiver_transfers", {}).setdefault(rid, []).append(
+        transfer_id
+    )
+    model_state["transfer_peers"][transfer_id] = (rank_key, source_id, rid)
+    model_state["transfer_layers"][transfer_id] = {
+        "total": {_layer_group(name) for name in dst_params},
+        "done": set(),
+    }
+    load = model_state["source_load"]
+    load[source_id] = load.get(source_id, 0) + 1
+    tier = _tier(
+        _participant(model_state, rank_key, source_id),
+        model_state["receivers"][rank_key][rid],
+    )
+    if tier >= TIER_CROSS_RACK:
+        model_state["cross_rack"].add(transfer_id)
+    _release(model_state, rank_key, source_id)
+    return transfer_id
+
+
+def _params_bytes(params: Mapping) -> int:
+    if isinstance(params, ParamTable):
+        return sum(params.sizes)
+    return sum(int(meta["bytes"]) for meta in params.values())
+
+
+def _source_gibps(model_state: dict, rank_key: str, source_id: str) -> float | None:
+    """Estimated egress of source_id: observed if any transfer finished,
+    else what it reported in metrics."""
+    observed = model_state["source_gibps"].get(source_id)
+    if observed:
+        return observed
+    metrics = _participant(model_state, rank_key, source_id).get("metrics") or {}
+    for name in ("egress_gibps", "disk_to_npu_gibps"):
+        if metrics.get(name):
+            return float(metrics[name])
+    return None
+
+
+def _source_limit(model_state: dict, rank_key: str, source_id: str) -> int:
+    limit = int(CONFIG["source_max_active"]) or 1 << 30
+    min_stream = float(CONFIG["min_stream_gibps"])
+    if min_stream > 0:
+        gibps = _source_gibps(model_state, rank_key, source_id)
+        if gibps:
+            limit = min(limit, max(1, int(gibps / min_stream)))
+    return limit
+
+
+def _release(model_state: dict, rank_key: str, source_id: str):
+    """Hand queued tasks of source_id to their owners, oldest first, while the
+    source is under its limit. With a global budget only _schedule releases;
+    this just refreshes the model's place in line."""
+    if int(CONFIG["max_active_transfers"]) > 0:
+        _update_waiting(model_state)
+        return
+    queue = model_state["source_queue"].get(source_id)
+    if not queue:
+        return
+    active = model_state["source_active"]
+    limit = _source_limit(model_state, rank_key, source_id)
+    while queue and active.get(source_id, 0) < limit:
+        _release_task(model_state, source_id)
+
+
+def _release_task(model_state: dict, source_id: str, reserved: bool = False) -> str:
+    """Move the oldest queued task of source_id to pending; reserved means
+    _schedule already counted it against the global budget."""
+    queues = model_state["source_queue"]
+    owner, task = queues[source_id].popleft()
+    if not queues[source_id]:
+        del queues[source_id]
+    transfer_id = task["transfer_id"]
+    model_state["pending"].setdefault(owner, []).append(task)
+    active = model_state["source_active"]
+    active[source_id] = active.get(source_id, 0) + 1
+    model_state["transfer_started"][transfer_id] = time.time()
+    if not reserved:
+        with LOCK:
+            STATE["sched"]["active"] += 1
+    if int(CONFIG["max_active_transfers"]) > 0:
+        # cross-model order is not reproducible from the other events
+        _journal({"op": "release", "key": model_state["key"], "transfer_id": transfer_id})
+    return transfer_id
+
+
+def _next_releasable(model_state: dict) -> str | None:
+    """Source whose queue head may be released now, oldest queue first."""
+    active = model_state["source_active"]
+    for source_id, queue in model_state["source_queue"].items():
+        rank_key = model_state["transfer_peers"][queue[0][1]["transfer_id"]][0]
+        if active.get(source_id, 0) < _source_limit(model_state, rank_key, source_id):
+            return source_id
+    return None
+
+
+def _update_waiting(model_state: dict) -> None:
+    """Publish the model's next releasable task to _schedule; caller holds
+    the model lock."""
+    source_id = _next_releasable(model_state)
+    waiting = STATE["sched"]["waiting"]
+    with LOCK:
+        if source_id is None:
+            waiting.pop(model_state["key"], None)
+            return
+        tid = model_state["source_queue"][source_id][0][1]["transfer_id"]
+        waiting[model_state["key"]] = (
+            model_state["priority"],
+            model_state["weight"],
+            model_state["transfer_bytes"].get(tid, 0),
         )
-        model_state["transfer_status"][transfer_id] = "pending"
-        model_state.setdefault("receiver_transfers", {}).setdefault(recv["my_id"], []).append(
-            transfer_id
+
+
+def _set_policy(model_state: dict, priority: int | None, weight: float | None) -> None:
+    """Change the model's release priority and/or weight; caller holds the
+    model lock."""
+    if priority is not None:
+        model_state["priority"] = int(priority)
+    if weight is not None:
+        model_state["weight"] = float(weight)
+    if model_state["key"] in STATE["sched"]["waiting"]:
+        _update_waiting(model_state)
+    _journal(
+        {
+            "op": "policy",
+            "key": model_state["key"],
+            "priority": model_state["priority"],
+            "weight": model_state["weight"],
+        }
+    )
+
+
+def _pick_model(sched: dict[str, Any]) -> str:
+    """Highest priority, then smallest weighted-fair finish tag (start-time
+    fair queueing over task bytes); charges the winner. Caller holds LOCK."""
+    top = max(prio for prio, _, _ in sched["waiting"].values())
+    best = None
+    for key, (prio, weight, nbytes) in sched["waiting"].items():
+        if prio != top:
+            continue
+        start = max(sched["vtime"], sched["finish"].get(key, 0.0))
+        finish = start + nbytes / GIB / max(weight, 1e-6)
+        if best is None or finish < best[0]:
+            best = (finish, start, key)
+    finish, start, key = best
+    sched["vtime"] = start
+    sched["finish"][key] = finish
+    return key
+
+
+def _schedule() -> None:
+    """Release queued tasks of all models while fewer than
+    max_active_transfers are in flight; caller holds no lock."""
+    budget = int(CONFIG["max_active_transfers"])
+    sched = STATE["sched"]
+    while budget > 0:
+        with LOCK:
+            if sched["active"] >= budget or not sched["waiting"]:
+                return
+            key = _pick_model(sched)
+            # reserve the slot before dropping LOCK
+            sched["active"] += 1
+        state = STATE["models"][key]
+        with state["lock"]:
+            source_id = _next_releasable(state)
+            if source_id is None:
+                with LOCK:
+                    sched["active"] -= 1
+            else:
+                _release_task(state, source_id, reserved=True)
+                _notify(state)
+            _update_waiting(state)
+
+
+def _assign_receiver(
+    model_state: dict, key: str, rank_key: str, source_ids: list[str], rid: str
+):
+    recv = model_state["receivers"][rank_key][rid]
+    stripes = _stripe_params(recv["params_map"], len(source_ids))
+    recv["transfer_ids"] = [
+        _create_task(model_state, key, rank_key, source_id, rid, stripe)
+        for source_id, stripe in zip(source_ids, stripes)
+    ]
+    recv["transfer_id"] = recv["transfer_ids"][0]
+
+
+def _pick_sources(
+    model_state: dict, rank_key: str, sources: list[str], rid: str, limit: int
+) -> list[str]:
+    """Up to limit sources for receiver rid: nearest first (see _tier), then
+    least loaded. Cross-rack sources beyond the max_cross_rack room are left
+    out, so the result may be empty."""
+    load = model_state["source_load"]
+    recv = model_state["receivers"][rank_key][rid]
+    ranked = sorted(
+        (_tier(_participant(model_state, rank_key, s), recv), load.get(s, 0), s)
+        for s in sources
+    )
+    room = _cross_rack_room(model_state)
+    picked = []
+    for tier, _, source_id in ranked:
+        if len(picked) >= max(1, limit):
+            break
+        if tier >= TIER_CROSS_RACK:
+            if room <= 0:
+                break
+            room -= 1
+        picked.append(source_id)
+    return picked
+
+
+def _assign_broadcast(model_state: dict, key: str, rank_key: str, unassigned: dict):
+    # each source (original or promoted) serves up to broadcast_fanout receivers
+    # at a time; finished receivers join the pool, doubling it every round
+    fanout = max(1, int(CONFIG["broadcast_fanout"]))
+    sources = _rank_sources(model_state, rank_key)
+    receivers = model_state["receivers"][rank_key]
+    load = model_state["source_load"]
+    while unassigned:
+        free = [s for s in sources if load.get(s, 0) < fanout]
+        if not free:
+            break
+        # serve the receiver closest to any free source first, so each rack
+        # is seeded once and then replicates within itself
+        free_entries = [_participant(model_state, rank_key, s) for s in free]
+        rid = min(
+            unassigned,
+            key=lambda r: min(_tier(src, receivers[r]) for src in free_entries),
+        )
+        picked = _pick_sources(model_state, rank_key, free, rid, CONFIG["stripe_sources"])
+        if not picked:
+            # only cross-rack sources left and the cap is reached
+            break
+        del unassigned[rid]
+        _assign_receiver(model_state, key, rank_key, picked, rid)
+
+
+def _maybe_create_tasks(model_state: dict, key: str, rank_key: str):
+    # only dispatch when both sides are ready
+    if not _rank_ready(model_state, rank_key):
+        return
+    source = model_state["sources"].get(rank_key)
+    if not source:
+        return
+    unassigned = model_state["unassigned_receivers"].get(rank_key)
+    if not unassigned:
+        return
+    if CONFIG["scheduler"] == "broadcast":
+        _assign_broadcast(model_state, key, rank_key, unassigned)
+    else:
+        sources = _rank_sources(model_state, rank_key)
+        for rid in list(unassigned):
+            picked = _pick_sources(
+                model_state, rank_key, sources, rid, CONFIG["stripe_sources"]
+            )
+            if not picked:
+                # waits for a cross-rack transfer to finish
+                continue
+            del unassigned[rid]
+            _assign_receiver(model_state, key, rank_key, picked, rid)
+    _notify(model_state)
+
+
+def _assign(key: str, rank_key: str, my_id: str) -> str:
+    """Role of my_id; the first participant of a rank_key becomes its source.
+    Caller holds the model lock."""
+    state = _get_model_state(key)
+    role = state["assignments"].get(my_id)
+    if role is None:
+        assigned = state.get("source_assignments", {}).get(rank_key)
+        if assigned and assigned != my_id:
+            role = "receiver"
+        else:
+            role = "source"
+            state.setdefault("source_assignments", {})[rank_key] = my_id
+        state["assignments"][my_id] = role
+        _journal({"op": "assign", "key": key, "rank_key": rank_key, "my_id": my_id})
+    _touch(state, my_id)
+    return role
+
+
+def _register(
+    key: str,
+    rank_key: str,
+    my_id: str,
+    role: str | None,
+    rank_info: dict,
+    params_map: dict[str, dict[str, Any]],
+    metrics: dict,
+    can_serve: bool = False,
+    mode: str = "push",
+    topology: dict[str, str] | None = None,
+) -> str:
+    """Record a source/receiver registration; caller holds the model lock.
+
+    topology holds node_ip and the TOPOLOGY_LABELS the participant sent.
+    """
+    state = _get_model_state(key)
+    if role is None:
+        role = state["assignments"].get(my_id, "source")
+    entry = {
+        "my_id": my_id,
+        "rank_info": rank_info,
+        "params_map": params_map,
+        "metrics": metrics,
+        "can_serve": can_serve,
+        "mode": mode,
+        "topology": topology or {},
+        "ts": time.time(),
+    }
+    if role == "source":
+        state.setdefault("source_assignments", {})[rank_key] = my_id
+        state["sources"][rank_key] = entry
+    else:
+        state["receivers"].setdefault(rank_key, {})[my_id] = entry
+        state["unassigned_receivers"].setdefault(rank_key, {})[my_id] = None
+        state["finished_receivers"].pop(my_id, None)
+    _touch(state, my_id)
+    _maybe_create_tasks(state, key, rank_key)
+    if JOURNAL is not None:
+        _journal(
+            {
+                "op": "register",
+                "key": key,
+                "rank_key": rank_key,
+                "my_id": my_id,
+                "role": role,
+                "rank_info": rank_info,
+                "params": _params_event(params_map),
+                "metrics": metrics,
+                "can_serve": can_serve,
+                "mode": mode,
+                "topology": topology or {},
+            }
+        )
+    return role
+
+
+def _mark_ready(key: str, rank_key: str, my_id: str, role: str | None):
+    """Record readiness and dispatch once both sides are ready; caller holds
+    the model lock."""
+    state = _get_model_state(key)
+    if role is None:
+        role = state["assignments"].get(my_id)
+    if role == "source":
+        state["ready_sources"].setdefault(rank_key, set()).add(my_id)
+    else:
+        state["ready_receivers"].setdefault(rank_key, set()).add(my_id)
+    _touch(state, my_id)
+    # only create tasks if both sides are ready
+    if role in ("source", "receiver"):
+        _maybe_create_tasks(state, key, rank_key)
+    _journal({"op": "ready", "key": key, "rank_key": rank_key, "my_id": my_id, "role": role})
+
+
+def _complete_transfer(transfer_id: str, elapsed_s: float | None = None) -> bool:
+    """Mark transfer_id done; caller holds the lock of its model.
+
+    elapsed_s (since release) defaults to the wall time; journal replay
+    passes the logged value so the egress estimates come out the same.
+    """
+    key = STATE["transfer_models"].get(transfer_id)
+    state = STATE["models"].get(key) if key is not None else None
+    if state is None:
+        return False
+    if state["transfer_status"].get(transfer_id) == "done":
+        return True
+    state["transfer_status"][transfer_id] = "done"
+    state["transfer_done_at"][transfer_id] = time.time()
+    state["transfer_sent"].pop(transfer_id, None)
+    layers = state["transfer_layers"].get(transfer_id)
+    if layers is not None:
+        layers["done"] = set(layers["total"])
+    peers = state["transfer_peers"].get(transfer_id)
+    if peers is not None:
+        rank_key, source_id, rid = peers
+        state["source_load"][source_id] -= 1
+        state["cross_rack"].discard(transfer_id)
+        elapsed_s = _observe_egress(state, source_id, transfer_id, elapsed_s)
+        if elapsed_s is not None:
+            nbytes = state["transfer_bytes"].get(transfer_id, 0)
+            _histogram("transfer_seconds", (), TRANSFER_SECONDS_BUCKETS).observe(elapsed_s)
+            _histogram("transfer_bytes", (), BYTES_BUCKETS).observe(nbytes)
+        _release(state, rank_key, source_id)
+        recv = state["receivers"].get(rank_key, {}).get(rid)
+        if (
+            CONFIG["scheduler"] == "broadcast"
+            and recv is not None
+            and recv.get("can_serve")
+            and _receiver_done(state, rid)
+        ):
+            state["serving_sources"].setdefault(rank_key, {})[rid] = None
+        _maybe_create_tasks(state, key, rank_key)
+    _notify(state)
+    _journal({"op": "complete", "transfer_id": transfer_id, "elapsed_s": elapsed_s})
+    return True
+
+
+def _observe_egress(
+    model_state: dict, source_id: str, transfer_id: str, elapsed_s: float | None
+) -> float | None:
+    """Retire a finished transfer from the source's active set and fold its
+    rate into the egress estimate; returns the elapsed time used."""
+    started = model_state["transfer_started"].pop(transfer_id, None)
+    if started is None:
+        # completed before it was released
+        queue = model_state["source_queue"].get(source_id, ())
+        for item in queue:
+            if item[1]["transfer_id"] == transfer_id:
+                queue.remove(item)
+                break
+        if not queue:
+            model_state["source_queue"].pop(source_id, None)
+        return elapsed_s
+    active = model_state["source_active"]
+    streams = active.get(source_id, 1)
+    active[source_id] = streams - 1
+    with LOCK:
+        STATE["sched"]["active"] -= 1
+    if elapsed_s is None:
+        elapsed_s = time.time() - started
+    nbytes = model_state["transfer_bytes"].get(transfer_id, 0)
+    if elapsed_s > 0 and nbytes:
+        # aggregate egress: this stream's rate times the streams sharing it
+        sample = nbytes / elapsed_s / GIB * streams
+        prev = model_state["source_gibps"].get(source_id)
+        model_state["source_gibps"][source_id] = (
+            sample if prev is None else prev + EGRESS_EWMA * (sample - prev)
         )
-        recv["transfer_id"] = transfer_id
+    return elapsed_s
+
+
+def _layer_progress(
+    transfer_id: str, layers: list[int], bytes_done: int | None = None
+) -> bool:
+    """Record finished layer groups and/or the bytes sent so far of
+    transfer_id; caller holds the lock of its model."""
+    state = _transfer_model_state(transfer_id)
+    if state is None or transfer_id not in state["transfer_layers"]:
+        return False
+    entry = state["transfer_layers"][transfer_id]
+    done = [int(g) for g in layers if int(g) in entry["total"]]
+    entry["done"].update(done)
+    event = {"op": "progress", "transfer_id": transfer_id, "layers": done}
+    if bytes_done is not None and state["transfer_status"].get(transfer_id) != "done":
+        _byte_progress(state, transfer_id, int(bytes_done))
+        event["bytes"] = int(bytes_done)
+    _notify(state)
+    _journal(event)
+    return True
+
+
+def _byte_progress(model_state: dict, transfer_id: str, bytes_done: int) -> None:
+    """Fold a cumulative byte count into the transfer's rate estimate."""
+    now = time.time()
+    bytes_done = min(bytes_done, model_state["transfer_bytes"].get(transfer_id, bytes_done))
+    prev = model_state["transfer_sent"].get(transfer_id)
+    if prev is None:
+        # first report: average since release
+        since, sent, gibps = model_state["transfer_started"].get(transfer_id), 0, None
+    else:
+        sent, since, gibps = prev
+    if since is not None and now > since and bytes_done >= sent:
+        sample = (bytes_done - sent) / (now - since) / GIB
+        gibps = sample if gibps is None else gibps + EGRESS_EWMA * (sample - gibps)
+    model_state["transfer_sent"][transfer_id] = [bytes_done, now, gibps]
+
+
+def _receiver_bytes(model_state: dict, my_id: str) -> dict[str, Any]:
+    """Bytes done/total over the receiver's transfers, their summed current
+    rate and the ETA at that rate (None while unknown or stalled)."""
+    finished = model_state["finished_receivers"].get(my_id)
+    if finished is not None:
+        return {"bytes_done": finished[2], "bytes_total": finished[2], "gibps": None, "eta_s": 0.0}
+    now = time.time()
+    status = model_state["transfer_status"]
+    done = total = 0
+    gibps = 0.0
+    for tid in model_state["receiver_transfers"].get(my_id, []):
+        nbytes = model_state["transfer_bytes"].get(tid, 0)
+        total += nbytes
+        if status.get(tid) == "done":
+            done += nbytes
+            continue
+        sent = model_state["transfer_sent"].get(tid)
+        if sent is None:
+            continue
+        done += sent[0]
+        if sent[2] and now - sent[1] < PROGRESS_STALE_S:
+            gibps += sent[2]
+    if total and done >= total:
+        eta = 0.0
+    elif gibps > 0:
+        eta = round((total - done) / GIB / gibps, 1)
+    else:
+        eta = None
+    return {
+        "bytes_done": done,
+        "bytes_total": total,
+        "gibps": round(gibps, 3) if gibps else None,
+        "eta_s": eta,
+    }
+
+
+def _receiver_layers(model_state: dict, my_id: str) -> tuple[list[int], int]:
+    """Layer groups fully landed on my_id (across all stripes) and group count."""
+    finished = model_state["finished_receivers"].get(my_id)
+    if finished is not None:
+        return list(finished[0]), finished[1]
+    entries = [
+        model_state["transfer_layers"][tid]
+        for tid in model_state["receiver_transfers"].get(my_id, [])
+        if tid in model_state["transfer_layers"]
+    ]
+    total: set[int] = set()
+    for e in entries:
+        total |= e["total"]
+    ready = [
+        g for g in total if all(g in e["done"] for e in entries if g in e["total"])
+    ]
+    return sorted(ready), len(total)
+
+
+def _receiver_done(model_state: dict, my_id: str) -> bool:
+    if my_id in model_state["finished_receivers"]:
+        return True
+    transfers = model_state.get("receiver_transfers", {}).get(my_id, [])
+    if not transfers:
+        return False
+    status = model_state.get("transfer_status", {})
+    return all(status.get(tid) == "done" for tid in transfers)
+
+
+def _touch(model_state: dict, my_id: str) -> None:
+    """my_id is alive; caller holds the model lock."""
+    model_state["last_seen"][my_id] = time.time()
+
+
+def _refresh(model_state: dict, my_id: str) -> None:
+    """_touch for requests that do not register my_id: last_seen then holds
+    exactly the assigned or registered ids until _evict drops them, and
+    heartbeats look ranks up there. Caller holds the model lock."""
+    last_seen = model_state["last_seen"]
+    if my_id in last_seen:
+        last_seen[my_id] = time.time()
+
+
+def _drop_transfer(model_state: dict, transfer_id: str) -> None:
+    """Forget every record of transfer_id; caller holds the model lock."""
+    for name in (
+        "transfer_status",
+        "transfer_peers",
+        "transfer_layers",
+        "transfer_bytes",
+        "transfer_started",
+        "transfer_done_at",
+        "transfer_sent",
+    ):
+        model_state[name].pop(transfer_id, None)
+    model_state["cross_rack"].discard(transfer_id)
+    with LOCK:
+        STATE["transfer_models"].pop(transfer_id, None)
+
+
+def _cancel_transfer(model_state: dict, transfer_id: str) -> None:
+    """Undo an unfinished transfer whose source or receiver went away: give
+    back its source slot and drop its task wherever it is queued."""
+    _, source_id, rid = model_state["transfer_peers"][transfer_id]
+    model_state["source_load"][source_id] -= 1
+    if model_state["transfer_started"].get(transfer_id) is not None:
+        model_state["source_active"][source_id] -= 1
+        with LOCK:
+            STATE["sched"]["active"] -= 1
+    else:
+        queue = model_state["source_queue"].get(source_id, ())
+        for item in queue:
+            if item[1]["transfer_id"] == transfer_id:
+                queue.remove(item)
+                break
+        if not queue:
+            model_state["source_queue"].pop(source_id, None)
+    pending = model_state["pending"]
+    for owner in (source_id, rid):
+        if owner in pending:
+            pending[owner] = [t for t in pending[owner] if t["transfer_id"] != transfer_id]
+    _drop_transfer(model_state, transfer_id)
+
+
+def _evict(model_state: dict, my_id: str) -> bool:
+    """Remove participant my_id and whatever only it needed; caller holds the
+    model lock. Its unfinished transfers are cancelled, and receivers it was
+    sending to go back to unassigned to be served by another source."""
+    key = model_state["key"]
+    rank_keys = {rk for rk, src in model_state["sources"].items() if src["my_id"] == my_id}
+    rank_keys.update(rk for rk, recv in model_state["receivers"].items() if my_id in recv)
+    rank_keys.update(
+        rk for rk, sid in model_state["source_assignments"].items() if sid == my_id
+    )
+    if not rank_keys and my_id not in model_state["assignments"]:
+        return False
+    orphaned: dict[str, str] = {}
+    sources: set[tuple[str, str]] = set()
+    for tid, (rank_key, source_id, rid) in list(model_state["transfer_peers"].items()):
+        if my_id not in (source_id, rid):
+            continue
+        if model_state["transfer_status"].get(tid) == "done":
+            if rid == my_id:
+                _drop_transfer(model_state, tid)
+            continue
+        _cancel_transfer(model_state, tid)
+        if rid == my_id:
+            sources.add((rank_key, source_id))
+        else:
+            orphaned[rid] = rank_key
+    # a receiver that lost a stripe is assigned afresh, all stripes
+    for rid, rank_key in orphaned.items():
+        for tid in model_state["receiver_transfers"].pop(rid, []):
+            if tid not in model_state["transfer_peers"]:
+                continue
+            if model_state["transfer_status"].get(tid) == "done":
+                _drop_transfer(model_state, tid)
+            else:
+                sources.add((rank_key, model_state["transfer_peers"][tid][1]))
+                _cancel_transfer(model_state, tid)
+        model_state["unassigned_receivers"].setdefault(rank_key, {})[rid] = None
+    for rank_key in rank_keys:
+        source = model_state["sources"].get(rank_key)
+        if source is not None and source["my_id"] == my_id:
+            del model_state["sources"][rank_key]
+        if model_state["source_assignments"].get(rank_key) == my_id:
+            del model_state["source_assignments"][rank_key]
+        for name in ("receivers", "unassigned_receivers", "serving_sources"):
+            group = model_state[name].get(rank_key)
+            if group is not None:
+                group.pop(my_id, None)
+                if not group:
+                    del model_state[name][rank_key]
+        for name in ("ready_sources", "ready_receivers"):
+            ready = model_state[name].get(rank_key)
+            if ready is not None:
+                ready.discard(my_id)
+                if not ready:
+                    del model_state[name][rank_key]
+    model_state["receiver_transfers"].pop(my_id, None)
+    for name in (
+        "assignments",
+        "pending",
+        "source_queue",
+        "source_active",
+        "source_load",
+        "source_gibps",
+        "last_seen",
+        "finished_receivers",
+        "loader_metrics",
+    ):
+        model_state[name].pop(my_id, None)
+    for rank_key, source_id in sources:
+        if source_id != my_id:
+            _release(model_state, rank_key, source_id)
+    for rank_key in set(orphaned.values()):
+        _maybe_create_tasks(model_state, key, rank_key)
+    if int(CONFIG["max_active_transfers"]) > 0:
+        _update_waiting(model_state)
+    _notify(model_state)
+    _journal({"op": "evict", "key": key, "my_id": my_id})
+    return True
+
+
+def _compact_receiver(model_state: dict, my_id: str) -> None:
+    """Replace the finished transfers of receiver my_id by its layer summary;
+    caller holds the model lock."""
+    layers = _receiver_layers(model_state, my_id)
+    nbytes = _receiver_bytes(model_state, my_id)["bytes_total"]
+    for tid in model_state["receiver_transfers"].pop(my_id, []):
+        _drop_transfer(model_state, tid)
+    model_state["finished_receivers"][my_id] = (*layers, nbytes)
+    _journal({"op": "compact", "key": model_state["key"], "my_id": my_id})
+
+
+def _gc_model(model_state: dict, now: float) -> tuple[int, int]:
+    """Evict expired participants and compact long-finished receivers of one
+    model; caller holds its lock. Returns (evicted, compacted)."""
+    evicted = compacted = 0
+    ttl = float(CONFIG["participant_ttl_s"])
+    if ttl > 0:
+        ids = set(model_state["assignments"])
+        ids.update(src["my_id"] for src in model_state["sources"].values())
+        for recv in model_state["receivers"].values():
+            ids.update(recv)
+        last_seen = model_state["last_seen"]
+        for my_id in sorted(ids):
+            # ids restored from an old snapshot count as seen on restore
+            if now - last_seen.setdefault(my_id, now) > ttl:
+                evicted += _evict(model_state, my_id)
+    done_ttl = float(CONFIG["done_ttl_s"])
+    if done_ttl > 0:
+        done_at = model_state["transfer_done_at"]
+        for my_id, tids in list(model_state["receiver_transfers"].items()):
+            if not tids or not _receiver_done(model_state, my_id):
+                continue
+            if now - max(done_at.get(tid, now) for tid in tids) > done_ttl:
+                _compact_receiver(model_state, my_id)
+                compacted += 1
+    return evicted, compacted
+
+
+def _gc() -> tuple[int, int]:
+    """One collection pass over every model; caller holds no lock."""
+    with LOCK:
+        states = list(STATE["models"].values())
+    now = time.time()
+    evicted = compacted = 0
+    for state in states:
+        with state["lock"]:
+            e, c = _gc_model(state, now)
+        evicted += e
+        compacted += c
+    if evicted:
+        # cancelled transfers freed global budget
+        _schedule()
+        _maybe_snapshot()
+    return evicted, compacted
+
+
+def _gc_loop(interval_s: float) -> None:
+    while True:
+        time.sleep(interval_s)
+        try:
+            evicted, compacted = _gc()
+        except Exception:  # noqa: BLE001 - keep collecting after a bug
+            traceback.print_exc()
+            continue
+        if evicted or compacted:
+            print(f"gc: evicted {evicted} participants, compacted {compacted} receivers")
+
+
+def _approx_bytes(obj: Any, seen: set[int] | None = None) -> int:
+    """Rough deep size of obj; ParamTables sharing a layout do not count its
+    name table, which STATE["layouts"] holds once.
+
+    Needs no lock: each container is listed in one C-level call, so routes
+    changing it meanwhile only make the figure approximate.
+    """
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        if isinstance(o, ParamTable):
+            total += sys.getsizeof(o) + sys.getsizeof(o.addrs)
+            if not o.layout_hash:
+                total += sys.getsizeof(o.sizes) + sys.getsizeof(o.names)
+                total += sum(sys.getsizeof(n) for n in o.names)
+            continue
+        total += sys.getsizeof(o)
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset, deque)):
+            stack.extend(o)
+    return total
+
+
+def _journal(event: dict[str, Any]) -> None:
+    """Record a mutation after applying it; caller holds the lock (model lock
+    or LOCK) of what it changed."""
+    if JOURNAL is not None:
+        JOURNAL.append(event)
+
+
+def _params_event(params_map: Mapping) -> dict[str, Any]:
+    if isinstance(params_map, ParamTable):
+        if params_map.layout_hash:
+            # the layout's names and sizes are in an earlier "layout" event
+            return {"layout_hash": params_map.layout_hash, "addrs": params_map.addrs.tolist()}
+        return {"columns": params_map.to_wire()["__columns__"]}
+    return {"map": params_map}
+
+
+def _params_from_event(params: dict[str, Any]) -> Mapping:
+    if "layout_hash" in params:
+        return _layout_params(params["layout_hash"], params["addrs"])
+    if "columns" in params:
+        columns = params["columns"]
+        return ParamTable(
+            columns["names"], array("Q", columns["addrs"]), array("Q", columns["sizes"])
+        )
+    return params["map"]
+
+
+def _apply_event(event: dict[str, Any]) -> None:
+    """Replay one journal event through the function that logged it."""
+    op = event["op"]
+    if op == "layout":
+        with LOCK:
+            _put_layout(event["hash"], event["names"], array("Q", event["sizes"]))
+        return
+    if op in ("complete", "progress"):
+        state = _transfer_model_state(event["transfer_id"])
+        if state is None:
+            return
+    else:
+        state = _get_model_state(event["key"])
+    params_map = None
+    if op == "register":
+        with LOCK:
+            params_map = _params_from_event(event["params"])
+    with state["lock"]:
+        if op == "assign":
+            _assign(event["key"], event["rank_key"], event["my_id"])
+        elif op == "register":
+            _register(
+                event["key"],
+                event["rank_key"],
+                event["my_id"],
+                event["role"],
+                event["rank_info"],
+                params_map,
+                event["metrics"],
+                event["can_serve"],
+                event["mode"],
+                event.get("topology"),
+            )
+        elif op == "ready":
+            _mark_ready(event["key"], event["rank_key"], event["my_id"], event["role"])
+        elif op == "poll":
+            pending = state["pending"]
+            pending[event["my_id"]] = pending.get(event["my_id"], [])[event["count"] :]
+        elif op == "complete":
+            _complete_transfer(event["transfer_id"], event.get("elapsed_s"))
+        elif op == "progress":
+            _layer_progress(event["transfer_id"], event["layers"], event.get("bytes"))
+        elif op == "evict":
+            _evict(state, event["my_id"])
+        elif op == "compact":
+            _compact_receiver(state, event["my_id"])
+        elif op == "policy":
+            _set_policy(state, event["priority"], event["weight"])
+        elif op == "release":
+            # fair-share tags are not logged: shares since the last snapshot
+            # are forgotten, which only matters while models compete
+            source_id = state["transfer_peers"][event["transfer_id"]][1]
+            queue = state["source_queue"].get(source_id)
+            if queue and queue[0][1]["transfer_id"] == event["transfer_id"]:
+                _release_task(state, source_id)
+                _update_waiting(state)
+        else:
+            raise ValueError(f"unknown journal op {op!r}")
+
+
+def _snapshot_state() -> dict[str, Any]:
+    # locks, long-poll waiters and pushed metrics belong to this process
+    models = {
+        key: {
+            k: v
+            for k, v in state.items()
+            if k not in ("lock", "cond", "waiters", "loader_metrics")
+        }
+        for key, state in STATE["models"].items()
+    }
+    return dict(STATE, models=models)
+
+
+def _restore_state(snapshot: dict[str, Any]) -> None:
+    STATE.clear()
+    STATE.update(snapshot)
+    for state in STATE["models"].values():
+        state["lock"] = TimedLock("model")
+        state["cond"] = threading.Condition(state["lock"])
+        state["waiters"] = set()
+        state["loader_metrics"] = {}
+        # liveness and done times restart with this process; ids of
+        # snapshots older than last_seen count as seen on restore
+        now = time.time()
+        ids = set(state["last_seen"]) | set(state["assignments"])
+        ids.update(src["my_id"] for src in state["sources"].values())
+        for group in state["receivers"].values():
+            ids.update(group)
+        state["last_seen"] = dict.fromkeys(ids, now)
+        state["transfer_done_at"] = dict.fromkeys(state["transfer_done_at"], now)
+
+
+def _lock_all() -> list[TimedLock]:
+    """Acquire every model lock and then LOCK, i.e. wait until no mutation is
+    in progress; returns the locks to release."""
+    while True:
+        with LOCK:
+            locks = [STATE["models"][key]["lock"] for key in sorted(STATE["models"])]
+        for lock in locks:
+            lock.acquire()
+        LOCK.acquire()
+        locks.append(LOCK)
+        if len(locks) == len(STATE["models"]) + 1:
+            return locks
+        # a model was added meanwhile
+        for lock in reversed(locks):
+            lock.release()
+
+
+def _maybe_snapshot() -> None:
+    """Take a due journal snapshot; caller holds no lock."""
+    journal = JOURNAL
+    if journal is None or not journal.snapshot_due():
+        return
+    locks = _lock_all()
+    try:
+        if journal.snapshot_due():
+            journal.snapshot()
+    finally:
+        for lock in reversed(locks):
+            lock.release()
+
+
+class Journal:
+    """Append-only log of state mutations plus periodic snapshots.
+
+    Each assign/layout/register/ready/poll/complete/progress mutation is
+    appended to state_dir/events.log as one JSON line with a sequence number.
+    After snapshot_every events the next request pickles STATE to
+    state_dir/snapshot.pkl (temp file + rename) and truncates the log, see
+    _maybe_snapshot. Events of one model are in order; different models
+    interleave freely since nothing is shared between them but layouts
+    (logged under LOCK). load() restores the
+    snapshot and replays the events after it through the same functions, so
+    pending and in-flight transfers survive a coordinator restart.
+
+    Lines are flushed to the OS on every append, so a crash of the
+    coordinator alone loses nothing. fsync bounds what a host crash can lose:
+    "always" syncs every append, "interval" syncs from a background thread
+    every fsync_interval_ms, "never" leaves it to the OS.
+    """
+
+    FSYNC_POLICIES = ("always", "interval", "never")
+
+    def __init__(
+        self,
+        state_dir: str,
+        fsync: str = "interval",
+        fsync_interval_ms: float = 100,
+        snapshot_every: int = 10000,
+    ):
+        if fsync not in self.FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {self.FSYNC_POLICIES}, got {fsync!r}")
+        os.makedirs(state_dir, exist_ok=True)
+        self.state_dir = state_dir
+        self.log_path = os.path.join(state_dir, "events.log")
+        self.snapshot_path = os.path.join(state_dir, "snapshot.pkl")
+        self.fsync = fsync
+        self.fsync_interval_s = fsync_interval_ms / 1000.0
+        self.snapshot_every = snapshot_every
+        self.seq = 0
+        self._since_snapshot = 0
+        self._file = None
+        # owns _file from load() until close()
+        self._files = contextlib.ExitStack()
+        # guards seq and _file between appends of different models and the
+        # fsync thread
+        self._file_lock = threading.Lock()
+        self._dirty = False
+        self._closed = threading.Event()
+
+    def load(self) -> int:
+        """Restore STATE from disk and open the log; returns events replayed.
+        Call before serving."""
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "rb") as f:
+                snapshot = pickle.load(f)
+            self.seq = snapshot["seq"]
+            _restore_state(snapshot["state"])
+        replayed = 0
+        good_bytes = 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # torn write from a crash
+                    event = json.loads(line)
+                    good_bytes += len(line)
+                    # events up to the snapshot's seq are already in it
+                    if event["seq"] <= self.seq:
+                        continue
+                    _apply_event(event)
+                    self.seq = event["seq"]
+                    replayed += 1
+        with contextlib.ExitStack() as stack:
+            self._file = stack.enter_context(open(self.log_path, "ab"))
+            self._file.truncate(good_bytes)
+            self._files = stack.pop_all()
+        self._since_snapshot = replayed
+        if self.fsync == "interval":
+            threading.Thread(target=self._sync_loop, daemon=True).start()
+        return replayed
+
+    def append(self, event: dict[str, Any]) -> None:
+        """Log a mutation that has been fully applied, see _journal."""
+        with self._file_lock:
+            self.seq += 1
+            line = json.dumps({"seq": self.seq, **event}, separators=(",", ":"))
+            self._file.write(line.encode("utf-8") + b"\n")
+            self._file.flush()
+            if self.fsync == "always":
+                os.fsync(self._file.fileno())
+            else:
+                self._dirty = True
+            self._since_snapshot += 1
+
+    def snapshot_due(self) -> bool:
+        return bool(self.snapshot_every) and self._since_snapshot >= self.snapshot_every
+
+    def snapshot(self) -> None:
+        """Write STATE as of seq and truncate the log; caller holds every lock,
+        see _maybe_snapshot."""
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(
+                {"seq": self.seq, "state": _snapshot_state()},
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+            f.flush()
+            if self.fsync != "never":
+                os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+        if self.fsync != "never":
+            dir_fd = os.open(self.state_dir, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        # a crash before the truncation only leaves events load() skips
+        with self._file_lock:
+            self._file.truncate(0)
+            self._dirty = False
+        self._since_snapshot = 0
+
+    def close(self) -> None:
+        self._closed.set()
+        with self._file_lock:
+            if self._file is not None:
+                self._file.flush()
+                if self.fsync != "never":
+                    os.fsync(self._file.fileno())
+                self._files.close()
+                self._file = None
+
+    def _sync_loop(self) -> None:
+        while not self._closed.wait(self.fsync_interval_s):
+            with self._file_lock:
+                if self._dirty and self._file is not None:
+                    os.fsync(self._file.fileno())
+                    self._dirty = False
+
+
+class LongPoll(NamedTuple):
+    """Route result that waits for a state change of model_state.
+
+    check(expired) runs under model_state["lock"] and returns the response, or None to keep
+    waiting; once expired it must return a response.
+    """
+
+    model_state: dict
+    deadline: float
+    check: Callable[[bool], tuple[int, dict] | None]
+
+
+def _route_assign(req: dict) -> tuple[int, dict]:
+    model_key = req.get("model_key", {})
+    my_id = req.get("my_id")
+    rank_info = req.get("rank_info", {})
+    if not my_id:
+        return 400, {"error": "missing my_id"}
+
+    key = _model_key_str(model_key)
+    rank_key = _rank_key(rank_info)
+    state = _get_model_state(key)
+    with state["lock"]:
+        role = _assign(key, rank_key, my_id)
+    return 200, {"role": role}
+
+
+def _route_register(content_type: str, body: bytes) -> tuple[int, dict]:
+    if not content_type.startswith(COMPACT_CONTENT_TYPE):
+        return _route_register_json(json.loads(body.decode("utf-8")) if body else {})
+    try:
+        req, params_map = _decode_compact_register(body)
+    except (ValueError, struct.error) as e:
+        return 400, {"error": f"bad compact body: {e}"}
+    return _register_req(req, params_map)
+
+
+def _route_register_json(req: dict) -> tuple[int, dict]:
+    params_map = None if "addrs" in req else _params_to_map(req.get("params", []))
+    return _register_req(req, params_map)
+
+
+def _topology(req: dict) -> dict[str, str]:
+    labels = req.get("topology") or {}
+    topology = {"node_ip": str(req["node_ip"])} if req.get("node_ip") else {}
+    topology.update(
+        (label, str(labels[label])) for label in TOPOLOGY_LABELS if labels.get(label)
+    )
+    return topology
+
+
+def _register_req(req: dict, params_map: Mapping | None) -> tuple[int, dict]:
+    # params_map is None for an address-only registration of a known layout
+    layout_hash = req.get("layout_hash")
+    if params_map is None and not layout_hash:
+        return 400, {"error": "addrs without layout_hash"}
+    model_key = req.get("model_key", {})
+    my_id = req.get("my_id")
+    role = req.get("role")
+    rank_info = req.get("rank_info", {})
+    if not my_id:
+        return 400, {"error": "missing my_id"}
+
+    key = _model_key_str(model_key)
+    rank_key = _rank_key(rank_info)
+    metrics = req.get("metrics", {})
+    can_serve = bool(req.get("can_serve", False))
+    mode = "pull" if req.get("mode") == "pull" else "push"
+    topology = _topology(req)
+    if req.get("weight") is not None and float(req["weight"]) <= 0:
+        return 400, {"error": "weight must be positive"}
+    if params_map is None:
+        try:
+            with LOCK:
+                params_map = _layout_params(layout_hash, req["addrs"])
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        if params_map is None:
+            # client resends the full params table
+            return 409, {"error": f"unknown layout {layout_hash}"}
+    elif layout_hash:
+        with LOCK:
+            params_map = _store_layout(layout_hash, params_map)
+    state = _get_model_state(key)
+    with state["lock"]:
+        role = _register(
+            key,
+            rank_key,
+            my_id,
+            role,
+            rank_info,
+            params_map,
+            metrics,
+            can_serve,
+            mode,
+            topology,
+        )
+        if req.get("priority") is not None or req.get("weight") is not None:
+            _set_policy(state, req.get("priority"), req.get("weight"))
+    return 200, {"status": "ok", "role": role}
+
+
+def _route_heartbeat(req: dict) -> tuple[int, dict]:
+    my_id = req.get("my_id")
+    if not my_id:
+        return 400, {"error": "missing my_id"}
+    state = _get_model_state(_model_key_str(req.get("model_key", {})))
+    with state["lock"]:
+        # false once evicted: the participant must register again
+        known = my_id in state["last_seen"]
+        if known:
+            _touch(state, my_id)
+            if isinstance(req.get("loader_metrics"), dict):
+                state["loader_metrics"][my_id] = req["loader_metrics"]
+    return 200, {"status": "ok", "known": known}
+
+
+def _route_stats() -> tuple[int, dict]:
+    """Entry counts and approximate memory per model."""
+    with LOCK:
+        states = list(STATE["models"].values())
+    models = {}
+    seen: set[int] = set()
+    for state in states:
+        with state["lock"]:
+            # references only; sizes are summed after releasing the lock,
+            # which at thousands of receivers would otherwise block the
+            # model's routes for seconds
+            contents = {k: v for k, v in state.items() if k not in ("lock", "cond", "waiters")}
+            status: dict[str, int] = {}
+            for value in state["transfer_status"].values():
+                status[value] = status.get(value, 0) + 1
+            models[state["key"]] = {
+                "sources": len(state["sources"]),
+                "receivers": sum(len(r) for r in state["receivers"].values()),
+                "assignments": len(state["assignments"]),
+                "transfers": status,
+                "pending_tasks": sum(len(t) for t in state["pending"].values()),
+                "queued_tasks": sum(len(q) for q in state["source_queue"].values()),
+                "finished_receivers": len(state["finished_receivers"]),
+            }
+        models[state["key"]]["approx_bytes"] = _approx_bytes(contents, seen)
+    with LOCK:
+        layouts = len(STATE["layouts"])
+        transfer_ids = len(STATE["transfer_models"])
+    layout_bytes = _approx_bytes(STATE["layouts"], seen)
+    transfer_bytes = _approx_bytes(STATE["transfer_models"], seen)
+    return 200, {
+        "models": models,
+        "layouts": layouts,
+        "layout_bytes": layout_bytes,
+        "transfer_ids": transfer_ids,
+        "transfer_id_bytes": transfer_bytes,
+        "approx_bytes": sum(m["approx_bytes"] for m in models.values())
+        + layout_bytes
+        + transfer_bytes,
+    }
+
+
+def _route_policy(req: dict) -> tuple[int, dict]:
+    priority = req.get("priority")
+    weight = req.get("weight")
+    if weight is not None and float(weight) <= 0:
+        return 400, {"error": "weight must be positive"}
+    state = _get_model_state(_model_key_str(req.get("model_key", {})))
+    with state["lock"]:
+        _set_policy(state, priority, weight)
+        return 200, {"priority": state["priority"], "weight": state["weight"]}
+
+
+def _route_queues() -> tuple[int, dict]:
+    """Per-model queue depth: tasks waiting for release, released transfers
+    in flight, and receivers not yet given a source."""
+    with LOCK:
+        states = list(STATE["models"].values())
+    models = {}
+    for state in states:
+        with state["lock"]:
+            queued = [t for q in state["source_queue"].values() for _, t in q]
+            models[state["key"]] = {
+                "priority": state["priority"],
+                "weight": state["weight"],
+                "queued": len(queued),
+                "queued_bytes": sum(
+                    state["transfer_bytes"].get(t["transfer_id"], 0) for t in queued
+                ),
+                "active": sum(state["source_active"].values()),
+                "unassigned_receivers": sum(
+                    len(r) for r in state["unassigned_receivers"].values()
+                ),
+            }
+    with LOCK:
+        active = STATE["sched"]["active"]
+    return 200, {
+        "active": active,
+        "max_active_transfers": int(CONFIG["max_active_transfers"]),
+        "models": models,
+    }
+
+
+def _route_ready(req: dict) -> tuple[int, dict]:
+    model_key = req.get("model_key", {})
+    my_id = req.get("my_id")
+    role = req.get("role")
+    rank_info = req.get("rank_info", {})
+    if not my_id:
+        return 400, {"error": "missing my_id"}
+    key = _model_key_str(model_key)
+    rank_key = _rank_key(rank_info)
+    state = _get_model_state(key)
+    with state["lock"]:
+        _mark_ready(key, rank_key, my_id, role)
+    return 200, {"status": "ok"}
+
+
+def _route_poll(req: dict) -> tuple[int, dict] | LongPoll:
+    model_key = req.get("model_key", {})
+    my_id = req.get("my_id")
+    if not my_id:
+        return 400, {"error": "missing my_id"}
+
+    key = _model_key_str(model_key)
+    known = set(req.get("layouts_known", []))
+    state = _get_model_state(key)
+
+    # long-poll: wait until tasks are queued for my_id or timeout_ms
+    def check(expired: bool) -> tuple[int, dict] | None:
+        if not state["pending"].get(my_id) and not expired:
+            return None
+        _refresh(state, my_id)
+        tasks = state["pending"].get(my_id, [])
+        state["pending"][my_id] = []
+        if tasks:
+            _journal({"op": "poll", "key": key, "my_id": my_id, "count": len(tasks)})
+        return 200, {"tasks": [_task_to_wire(t, known) for t in tasks]}
+
+    return LongPoll(state, time.monotonic() + _timeout_s(req), check)
+
+
+def _route_complete(req: dict) -> tuple[int, dict]:
+    # "transfer_ids" completes several transfers in one request; "progress"
+    # ({transfer_id: bytes_done}) reports others still running
+    transfer_ids = list(req.get("transfer_ids") or [])
+    if req.get("transfer_id"):
+        transfer_ids.append(req["transfer_id"])
+    progress = req.get("progress") or {}
+    if not transfer_ids and not progress:
+        return 400, {"error": "missing transfer_id"}
+    for transfer_id, bytes_done in progress.items():
+        state = _transfer_model_state(transfer_id)
+        if state is None:
+            continue
+        with state["lock"]:
+            _layer_progress(transfer_id, [], bytes_done)
+    for transfer_id in transfer_ids:
+        state = _transfer_model_state(transfer_id)
+        if state is None:
+            continue
+        with state["lock"]:
+            _complete_transfer(transfer_id)
+    return 200, {"status": "ok"}
+
+
+def _route_progress(req: dict) -> tuple[int, dict]:
+    transfer_id = req.get("transfer_id")
+    if not transfer_id:
+        return 400, {"error": "missing transfer_id"}
+    state = _transfer_model_state(transfer_id)
+    if state is not None:
+        with state["lock"]:
+            _layer_progress(transfer_id, req.get("layers_done", []), req.get("bytes_done"))
+    return 200, {"status": "ok"}
+
+
+def _route_wait(req: dict) -> tuple[int, dict] | LongPoll:
+    model_key = req.get("model_key", {})
+    my_id = req.get("my_id")
+    if not my_id:
+        return 400, {"error": "missing my_id"}
+    key = _model_key_str(model_key)
+    rank_key = _rank_key(req.get("rank_info", {}))
+    # with layers_seen, also return as soon as more layer groups are ready
+    layers_seen = req.get("layers_seen")
+    state = _get_model_state(key)
+
+    # long-poll: wait until all transfers of my_id are done or timeout_ms
+    def check(expired: bool) -> tuple[int, dict] | None:
+        done = _receiver_done(state, my_id)
+        layers_ready, layers_total = _receiver_layers(state, my_id)
+        more_layers = layers_seen is not None and len(layers_ready) > int(layers_seen)
+        if not (done or expired or more_layers):
+            return None
+        _refresh(state, my_id)
+        resp = {
+            "layers_ready": layers_ready,
+            "layers_total": layers_total,
+            **_receiver_bytes(state, my_id),
+        }
+        if not done:
+            return 200, {"status": "wait", **resp}
+        # promoted receivers must start polling /poll for their own tasks
+        serve = my_id in state["serving_sources"].get(rank_key, {})
+        return 200, {"status": "done", "serve": serve, **resp}
+
+    return LongPoll(state, time.monotonic() + _timeout_s(req), check)
+
+
+BATCH_OPS: dict[str, Callable[[dict], tuple[int, dict] | LongPoll]] = {
+    "assign": _route_assign,
+    "register": _route_register_json,
+    "ready": _route_ready,
+    "poll": _route_poll,
+    "complete": _route_complete,
+    "wait": _route_wait,
+    "progress": _route_progress,
+    "heartbeat": _route_heartbeat,
+}
+
+
+def _batch_ops(req: dict) -> tuple[list[dict[str, Any]], LongPoll | None]:
+    """Run req["ops"] in order; returns the results and a trailing LongPoll.
+
+    Stops after the first op answering >= 400. Only the last op may long-poll;
+    an earlier poll or wait answers immediately.
+    """
+    ops = req.get("ops")
+    if not isinstance(ops, list):
+        raise TypeError("missing ops")
+    shared = {k: v for k, v in req.items() if k != "ops"}
+    results: list[dict[str, Any]] = []
+    for i, op in enumerate(ops):
+        route = BATCH_OPS.get(op.get("op"))
+        if route is None:
+            results.append({"code": 400, "result": {"error": f"unknown op {op.get('op')!r}"}})
+            break
+        out = route({**shared, **op})
+        if isinstance(out, LongPoll):
+            if i == len(ops) - 1:
+                return results, out
+            with out.model_state["lock"]:
+                out = out.check(True)
+        code, result = out
+        results.append({"code": code, "result": result})
+        if code >= 400:
+            break
+    return results, None
+
+
+def _route_batch(req: dict) -> tuple[int, dict] | LongPoll:
+    """Run req["ops"] in order and answer {"results": [{"code", "result"}]}.
+
+    Fields next to "ops" (model_key, my_id, rank_info, role, ...) are shared
+    by every op, see _batch_ops.
+    """
+    try:
+        results, poll = _batch_ops(req)
+    except (TypeError, ValueError) as e:
+        return 400, {"error": str(e)}
+    if poll is None:
+        return 200, {"results": results}
+    return _batch_long_poll(poll, results)
+
+
+def _batch_long_poll(poll: LongPoll, results: list[dict[str, Any]]) -> LongPoll:
+    def check(expired: bool) -> tuple[int, dict] | None:
+        out = poll.check(expired)
+        if out is None:
+            return None
+        return 200, {"results": results + [{"code": out[0], "result": out[1]}]}
+
+    return LongPoll(poll.model_state, poll.deadline, check)
+
+
+def _route_multi(req: dict) -> tuple[int, dict] | LongPoll:
+    """Run the /batch bodies of several ranks (a node agent) in one request.
+
+    Answers {"responses": [...]}, one {"code", "body"} per entry of
+    "requests". Entries ending in a long-poll are held until at least one of
+    them can be answered (or entries without a long-poll are present); the
+    others come back as {"pending": true, "body": {"results": [...]}} with
+    the ops run so far, and the caller re-sends just their last op.
+    """
+    entries = req.get("requests")
+    if not isinstance(entries, list):
+        return 400, {"error": "missing requests"}
+    responses: list[dict[str, Any] | None] = [None] * len(entries)
+    polls: dict[int, tuple[LongPoll, list[dict[str, Any]]]] = {}
+    for i, entry in enumerate(entries):
+        try:
+            results, poll = _batch_ops(entry)
+        except (TypeError, ValueError) as e:
+            responses[i] = {"code": 400, "body": {"error": str(e)}}
+            continue
+        if poll is None:
+            responses[i] = {"code": 200, "body": {"results": results}}
+        else:
+            polls[i] = (poll, results)
+    if not polls:
+        return 200, {"responses": responses}
+
+    states = {id(poll.model_state) for poll, _ in polls.values()}
+    first = next(iter(polls.values()))[0]
+    deadline = min(poll.deadline for poll, _ in polls.values())
+
+    def check(expired: bool, lock_each: bool = False) -> tuple[int, dict] | None:
+        now = time.monotonic()
+        out = list(responses)
+        answered = False
+        for i, (poll, results) in polls.items():
+            if lock_each:
+                with poll.model_state["lock"]:
+                    res = poll.check(now >= poll.deadline)
+            else:
+                res = poll.check(now >= poll.deadline)
+            if res is None:
+                out[i] = {"pending": True, "body": {"results": results}}
+                continue
+            answered = True
+            results = results + [{"code": res[0], "result": res[1]}]
+            out[i] = {"code": 200, "body": {"results": results}}
+        if not answered and not expired:
+            return None
+        return 200, {"responses": out}
+
+    if len(polls) < len(entries) or len(states) > 1:
+        # something to answer now, or nothing single to wait on; a check
+        # only holds its own model's lock
+        return check(True, lock_each=True)
+    return LongPoll(first.model_state, deadline, check)
+
+
+POST_ROUTES: dict[str, Callable[[dict], tuple[int, dict] | LongPoll]] = {
+    "/v1/registry/assign": _route_assign,
+    "/v1/registry/ready": _route_ready,
+    "/v1/registry/poll": _route_poll,
+    "/v1/registry/complete": _route_complete,
+    "/v1/registry/wait": _route_wait,
+    "/v1/registry/progress": _route_progress,
+    "/v1/registry/batch": _route_batch,
+    "/v1/registry/multi": _route_multi,
+    "/v1/registry/policy": _route_policy,
+    "/v1/registry/heartbeat": _route_heartbeat,
+}
+
+
+class TextPayload(str):
+    """A response body sent as-is in the Prometheus text format."""
+
+
+# histogram name -> label names, in the order of HISTOGRAMS' label tuples
+HISTOGRAM_LABELS = {
+    "request_seconds": ("route",),
+    "lock_wait_seconds": ("lock",),
+    "transfer_seconds": (),
+    "transfer_bytes": (),
+}
+
+MODEL_GAUGES = (
+    "pending_tasks",
+    "queued_tasks",
+    "active_transfers",
+    "unassigned_receivers",
+    "sources",
+    "receivers",
+)
+
+
+def _render_metrics() -> TextPayload:
+    """GET /metrics: coordinator histograms, per-model queue gauges and the
+    loader metrics pushed with heartbeats."""
+    lines = []
+    for name, label_names in HISTOGRAM_LABELS.items():
+        with _HISTOGRAMS_LOCK:
+            family = dict(HISTOGRAMS.get(name, {}))
+        lines.append(f"# TYPE memfabric_coord_{name} histogram")
+        for values, hist in sorted(family.items()):
+            labels = format_labels(dict(zip(label_names, values)))
+            lines.extend(render_histogram(f"memfabric_coord_{name}", labels, hist.snapshot()))
+
+    with LOCK:
+        states = list(STATE["models"].values())
+        sched_active = STATE["sched"]["active"]
+    gauges: dict[str, list[str]] = {name: [] for name in MODEL_GAUGES}
+    # metric name -> type, lines
+    loader: dict[str, tuple[str, list[str]]] = {}
+    for state in states:
+        with state["lock"]:
+            values = {
+                "pending_tasks": sum(len(t) for t in state["pending"].values()),
+                "queued_tasks": sum(len(q) for q in state["source_queue"].values()),
+                "active_transfers": sum(state["source_active"].values()),
+                "unassigned_receivers": sum(
+                    len(r) for r in state["unassigned_receivers"].values()
+                ),
+                "sources": len(state["sources"]),
+                "receivers": sum(len(r) for r in state["receivers"].values()),
+            }
+            pushed = list(state["loader_metrics"].items())
+        model = format_labels({"model": state["key"]})
+        for name, value in values.items():
+            gauges[name].append(f"memfabric_coord_{name}{{{model}}} {value}")
+        for my_id, snap in pushed:
+            labels = format_labels({"model": state["key"], "my_id": my_id})
+            try:
+                for name, value in snap.get("counters", {}).items():
+                    metric = f"memfabric_loader_{name}"
+                    loader.setdefault(metric, ("counter", []))[1].append(
+                        f"{metric}{{{labels}}} {float(value):g}"
+                    )
+                for name, hist in snap.get("histograms", {}).items():
+                    metric = f"memfabric_loader_{name}"
+                    loader.setdefault(metric, ("histogram", []))[1].extend(
+                        render_histogram(metric, labels, hist)
+                    )
+            except (AttributeError, KeyError, TypeError, ValueError):
+                # a malformed push only loses that loader's series
+                continue
+    for name, series in gauges.items():
+        lines.append(f"# TYPE memfabric_coord_{name} gauge")
+        lines.extend(series)
+    lines.append("# TYPE memfabric_coord_sched_active_transfers gauge")
+    lines.append(f"memfabric_coord_sched_active_transfers {sched_active}")
+    for metric, (kind, series) in loader.items():
+        lines.append(f"# TYPE {metric} {kind}")
+        lines.extend(series)
+    return TextPayload("\n".join(lines) + "\n")
+
+
+GET_ROUTES = ("/healthz", "/metrics", "/v1/registry/queues", "/v1/registry/stats")
+
+
+def _route_label(path: str) -> str:
+    """Bounded route label for request_seconds: unknown paths share one."""
+    if path in POST_ROUTES or path in GET_ROUTES or path == "/v1/registry/register":
+        return path
+    return "other"
+
+
+def _observe_request(path: str, t0: float) -> None:
+    _histogram("request_seconds", (_route_label(path),), LATENCY_BUCKETS).observe(
+        time.perf_counter() - t0
+    )
+
+
+def _dispatch_get(path: str) -> tuple[int, dict | TextPayload]:
+    if path == "/healthz":
+        return 200, {"status": "ok"}
+    if path == "/metrics":
+        return 200, _render_metrics()
+    if path == "/v1/registry/queues":
+        return _route_queues()
+    if path == "/v1/registry/stats":
+        return _route_stats()
+    return 404, {"error": "not found"}
+
+
+def _dispatch_post(path: str, content_type: str, body: bytes) -> tuple[int, dict] | LongPoll:
+    try:
+        if path == "/v1/registry/register":
+            return _route_register(content_type, body)
+        route = POST_ROUTES.get(path)
+        if route is None:
+            return 404, {"error": "not found"}
+        return route(json.loads(body.decode("utf-8")) if body else {})
+    except json.JSONDecodeError as e:
+        return 400, {"error": f"bad json: {e}"}
+    finally:
+        _schedule()
+        _maybe_snapshot()
+
+
+def _encode_json(payload: dict) -> bytes:
+    return json.dumps(payload, default=_json_default).encode("utf-8")
+
+
+def _encode_body(payload: dict | TextPayload) -> tuple[bytes, str]:
+    if isinstance(payload, TextPayload):
+        return payload.encode("utf-8"), METRICS_CONTENT_TYPE
+    return _encode_json(payload), "application/json"
+
+
+def _long_poll_blocking(poll: LongPoll) -> tuple[int, dict]:
+    with poll.model_state["lock"]:
+        while True:
+            remaining = poll.deadline - time.monotonic()
+            out = poll.check(remaining <= 0)
+            if out is not None:
+                return out
+            poll.model_state["cond"].wait(remaining)
 
 
 class Handler(BaseHTTPRequestHandler):
     server_version = "memfabric-coord/0.1"
 
-    def _send_json(self, status: int, payload: dict):
-        body = json.dumps(payload).encode("utf-8")
+    def _send_json(self, status: int, payload: dict | TextPayload):
+        body, content_type = _encode_body(payload)
         self.send_response(status)
-        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Type", content_type)
         self.send_header("Content-Length", str(len(body)))
         self.end_headers()
         self.wfile.write(body)
 
-    def _read_json(self) -> dict:
+    def _read_body(self) -> bytes:
         length = int(self.headers.get("Content-Length", "0"))
         if length <= 0:
-            return {}
-        data = self.rfile.read(length)
-        return json.loads(data.decode("utf-8"))
+            return b""
+        return self.rfile.read(length)
 
     def do_GET(self):
-        if self.path == "/healthz":
-            self._send_json(200, {"status": "ok"})
-            return
-        self._send_json(404, {"error": "not found"})
+        t0 = time.perf_counter()
+        out = _dispatch_get(self.path)
+        _observe_request(self.path, t0)
+        self._send_json(*out)
 
     def do_POST(self):
-        if self.path == "/v1/registry/assign":
-            self._handle_assign()
-            return
-        if self.path == "/v1/registry/register":
-            self._handle_register()
-            return
-        if self.path == "/v1/registry/ready":
-            self._handle_ready()
-            return
-        if self.path == "/v1/registry/poll":
-            self._handle_poll()
-            return
-        if self.path == "/v1/registry/complete":
-            self._handle_complete()
-            return
-        if self.path == "/v1/registry/wait":
-            self._handle_wait()
-            return
-        self._send_json(404, {"error": "not found"})
-
-    def _handle_assign(self):
-        req = self._read_json()
-        model_key = req.get("model_key", {})
-        my_id = req.get("my_id")
-        rank_info = req.get("rank_info", {})
-        if not my_id:
-            self._send_json(400, {"error": "missing my_id"})
-            return
+        t0 = time.perf_counter()
+        content_type = self.headers.get("Content-Type", "")
+        out = _dispatch_post(self.path, content_type, self._read_body())
+        if isinstance(out, LongPoll):
+            out = _long_poll_blocking(out)
+        _observe_request(self.path, t0)
+        self._send_json(*out)
 
-        key = _model_key_str(model_key)
-        rank_key = _rank_key(rank_info)
-        with LOCK:
-            state = _get_model_state(key)
-            role = state["assignments"].get(my_id)
-            if role is None:
-                assigned = state.get("source_assignments", {}).get(rank_key)
-                if assigned and assigned != my_id:
-                    role = "receiver"
-                else:
-                    role = "source"
-                    state.setdefault("source_assignments", {})[rank_key] = my_id
-                state["assignments"][my_id] = role
-        self._send_json(200, {"role": role})
-
-    def _handle_register(self):
-        req = self._read_json()
-        model_key = req.get("model_key", {})
-        my_id = req.get("my_id")
-        role = req.get("role")
-        rank_info = req.get("rank_info", {})
-        params = req.get("params", [])
-        if not my_id:
-            self._send_json(400, {"error": "missing my_id"})
-            return
 
-        key = _model_key_str(model_key)
-        rank_key = _rank_key(rank_info)
-        params_map = _params_to_map(params)
-        metrics = req.get("metrics", {})
-        with LOCK:
-            state = _get_model_state(key)
-            if role is None:
-                role = state["assignments"].get(my_id, "source")
-            if role == "source":
-                state.setdefault("source_assignments", {})[rank_key] = my_id
-                state["sources"][rank_key] = {
-                    "my_id": my_id,
-                    "rank_info": rank_info,
-                    "params_map": params_map,
-                    "metrics": metrics,
-                    "ts": time.time(),
-                }
-                _maybe_create_tasks(state, rank_key)
-            else:
-                state.setdefault("receivers", {}).setdefault(rank_key, {})[my_id] = {
-                    "my_id": my_id,
-                    "rank_info": rank_info,
-                    "params_map": params_map,
-                    "metrics": metrics,
-                    "ts": time.time(),
-                }
-                _maybe_create_tasks(state, rank_key)
-
-        self._send_json(200, {"status": "ok", "role": role})
-
-    def _handle_ready(self):
-        req = self._read_json()
-        model_key = req.get("model_key", {})
-        my_id = req.get("my_id")
-        role = req.get("role")
-        rank_info = req.get("rank_info", {})
-        if not my_id:
-            self._send_json(400, {"error": "missing my_id"})
-            return
-        key = _model_key_str(model_key)
-        rank_key = _rank_key(rank_info)
-        with LOCK:
-            state = _get_model_state(key)
-            if role is None:
-                role = state["assignments"].get(my_id)
-            if role == "source":
-                state["ready_sources"].add(f"{rank_key}|{my_id}")
+# routes of the asyncio server run on this many threads; most wait on model
+# locks, so more only helps while requests block on fsync or snapshots
+DISPATCH_THREADS = 8
+
+
+# asyncio server: one event loop thread, HTTP/1.1 keep-alive, long-polls park
+# on futures in model_state["waiters"] instead of holding a thread each. The
+# loop only parses requests and does socket I/O: routes take model locks,
+# append to the journal (fsync) and may write a snapshot, so they run in the
+# loop's default executor and one slow request does not stall the others.
+
+async def _long_poll_async(poll: LongPoll) -> tuple[int, dict]:
+    loop = asyncio.get_running_loop()
+    model_state = poll.model_state
+
+    def check(
+        fut: asyncio.Future, stale: asyncio.Future | None
+    ) -> tuple[tuple[int, dict] | None, float]:
+        # check() may journal, and the lock may be held across an fsync
+        with model_state["lock"]:
+            if stale is not None:
+                model_state["waiters"].discard(stale)
+            remaining = poll.deadline - time.monotonic()
+            out = poll.check(remaining <= 0)
+            if out is None:
+                model_state["waiters"].add(fut)
+            return out, remaining
+
+    stale = None
+    while True:
+        fut = loop.create_future()
+        out, remaining = await loop.run_in_executor(None, check, fut, stale)
+        if out is not None:
+            return out
+        try:
+            await asyncio.wait_for(fut, remaining)
+            stale = None
+        except TimeoutError:
+            # dropped from the waiters by the final check
+            stale = fut
+
+
+def _http_response(status: int, payload: dict | TextPayload, keep_alive: bool) -> bytes:
+    body, content_type = _encode_body(payload)
+    head = (
+        f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+        f"Server: {Handler.server_version}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
+
+
+async def _handle_async(
+    method: str, path: str, headers: dict[str, str], body: bytes
+) -> tuple[int, dict | TextPayload]:
+    t0 = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    if method == "POST":
+        out = await loop.run_in_executor(
+            None, _dispatch_post, path, headers.get("content-type", ""), body
+        )
+        if isinstance(out, LongPoll):
+            out = await _long_poll_async(out)
+    elif method == "GET":
+        out = await loop.run_in_executor(None, _dispatch_get, path)
+    else:
+        return 405, {"error": "method not allowed"}
+    _observe_request(path, t0)
+    return out
+
+
+AsyncHandler = Callable[
+    [str, str, dict[str, str], bytes], Awaitable[tuple[int, dict | TextPayload]]
+]
+
+
+async def serve_http(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter, handle: AsyncHandler
+):
+    """Serve HTTP/1.1 keep-alive requests on one connection with handle()."""
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                break
+            lines = head.decode("latin-1").split("\r\n")
+            parts = lines[0].split(" ")
+            if len(parts) != 3:
+                writer.write(_http_response(400, {"error": "bad request line"}, False))
+                break
+            method, path, version = parts
+            headers = {}
+            for line in lines[1:]:
+                name, sep, value = line.partition(":")
+                if sep:
+                    headers[name.strip().lower()] = value.strip()
+            if "chunked" in headers.get("transfer-encoding", "").lower():
+                writer.write(_http_response(411, {"error": "chunked body"}, False))
+                break
+            length = int(headers.get("content-length", "0") or 0)
+            body = await reader.readexactly(length) if length > 0 else b""
+            connection = headers.get("connection", "").lower()
+            if version == "HTTP/1.1":
+                keep_alive = connection != "close"
             else:
-                state["ready_receivers"].add(f"{rank_key}|{my_id}")
-            # only create tasks if both sides are ready
-            if role in ("source", "receiver"):
-                source_ready = any(
-                    key.startswith(f"{rank_key}|") for key in state["ready_sources"]
-                )
-                receiver_ready = any(
-                    key.startswith(f"{rank_key}|")
-                    for key in state["ready_receivers"]
-                )
-                if source_ready and receiver_ready:
-                    _maybe_create_tasks(state, rank_key)
-        self._send_json(200, {"status": "ok"})
-
-    def _handle_poll(self):
-        req = self._read_json()
-        model_key = req.get("model_key", {})
-        my_id = req.get("my_id")
-        if not my_id:
-            self._send_json(400, {"error": "missing my_id"})
-            return
+                keep_alive = connection == "keep-alive"
 
-        key = _model_key_str(model_key)
-        with LOCK:
-            state = _get_model_state(key)
-            tasks = state.get("pending", {}).get(my_id, [])
-            state.get("pending", {})[my_id] = []
-        self._send_json(200, {"tasks": tasks})
-
-    def _handle_complete(self):
-        req = self._read_json()
-        transfer_id = req.get("transfer_id")
-        if not transfer_id:
-            self._send_json(400, {"error": "missing transfer_id"})
-            return
-        with LOCK:
-            for _, state in STATE["models"].items():
-                if transfer_id in state.get("transfer_status", {}):
-                    state["transfer_status"][transfer_id] = "done"
-                    break
-        self._send_json(200, {"status": "ok"})
-
-    def _handle_wait(self):
-        req = self._read_json()
-        model_key = req.get("model_key", {})
-        my_id = req.get("my_id")
-        if not my_id:
-            self._send_json(400, {"error": "missing my_id"})
-            return
-        key = _model_key_str(model_key)
-        with LOCK:
-            state = _get_model_state(key)
-            transfers = state.get("receiver_transfers", {}).get(my_id, [])
-            if not transfers:
-                self._send_json(200, {"status": "wait"})
-                return
-            done = True
-            for tid in transfers:
-                if state.get("transfer_status", {}).get(tid) != "done":
-                    done = False
-                    break
-        self._send_json(200, {"status": "done" if done else "wait"})
+            try:
+                out = await handle(method, path, headers, body)
+            except Exception as e:  # noqa: BLE001 - a 500, like the threaded server
+                traceback.print_exc()
+                out = 500, {"error": str(e)}
+                keep_alive = False
+            writer.write(_http_response(*out, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _serve_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    await serve_http(reader, writer, _handle_async)
+
+
+async def serve_async(host: str, port: int) -> None:
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=DISPATCH_THREADS, thread_name_prefix="coord-dispatch")
+    )
+    server = await asyncio.start_server(_serve_connection, host, port, backlog=4096)
+    async with server:
+        await server.serve_forever()
 
 
 def main():
+    global JOURNAL
     parser = argparse.ArgumentParser(description="MemFabric HTTP Coordinator")
     parser.add_argument("--host", default="0.0.0.0")
     parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--server",
+        choices=["threading", "asyncio"],
+        default="threading",
+        help="threading: one thread per connection; asyncio: one event loop "
+        "with HTTP/1.1 keep-alive, routes run on a thread pool",
+    )
+    parser.add_argument(
+        "--scheduler", choices=["single", "broadcast"], default=CONFIG["scheduler"]
+    )
+    parser.add_argument(
+        "--broadcast-fanout", type=int, default=CONFIG["broadcast_fanout"]
+    )
+    parser.add_argument(
+        "--stripe-sources",
+        type=int,
+        default=CONFIG["stripe_sources"],
+        help="split each receiver across up to N sources of the same rank_key",
+    )
+    parser.add_argument(
+        "--max-cross-rack",
+        type=int,
+        default=CONFIG["max_cross_rack"],
+        help="per model, at most N transfers in flight between racks (0: no cap)",
+    )
+    parser.add_argument(
+        "--source-max-active",
+        type=int,
+        default=CONFIG["source_max_active"],
+        help="release at most N transfers per source at a time (0: no cap)",
+    )
+    parser.add_argument(
+        "--min-stream-gibps",
+        type=float,
+        default=CONFIG["min_stream_gibps"],
+        help="release no more transfers per source than its estimated "
+        "egress GiB/s divided by this (0: off)",
+    )
+    parser.add_argument(
+        "--max-active-transfers",
+        type=int,
+        default=CONFIG["max_active_transfers"],
+        help="release at most N transfers across all models, by model "
+        "priority then weighted fair share of bytes (0: no cap)",
+    )
+    parser.add_argument(
+        "--participant-ttl-s",
+        type=float,
+        default=CONFIG["participant_ttl_s"],
+        help="evict sources/receivers without a request or heartbeat for "
+        "this long, cancelling their unfinished transfers (0: never)",
+    )
+    parser.add_argument(
+        "--done-ttl-s",
+        type=float,
+        default=CONFIG["done_ttl_s"],
+        help="collect the transfers of receivers finished this long ago, "
+        "keeping only their /wait answer (0: never)",
+    )
+    parser.add_argument("--gc-interval-s", type=float, default=30)
+    parser.add_argument(
+        "--state-dir",
+        default=None,
+        help="persist state as snapshot + append-only event log in this "
+        "directory and restore it on startup",
+    )
+    parser.add_argument(
+        "--fsync", choices=Journal.FSYNC_POLICIES, default="interval"
+    )
+    parser.add_argument("--fsync-interval-ms", type=float, default=100)
+    parser.add_argument(
+        "--snapshot-every",
+        type=int,
+        default=10000,
+        help="compact the event log into a snapshot every N events (0: never)",
+    )
     args = parser.parse_args()
+    CONFIG["scheduler"] = args.scheduler
+    CONFIG["broadcast_fanout"] = args.broadcast_fanout
+    CONFIG["stripe_sources"] = args.stripe_sources
+    CONFIG["max_cross_rack"] = args.max_cross_rack
+    CONFIG["source_max_active"] = args.source_max_active
+    CONFIG["min_stream_gibps"] = args.min_stream_gibps
+    CONFIG["max_active_transfers"] = args.max_active_transfers
+    CONFIG["participant_ttl_s"] = args.participant_ttl_s
+    CONFIG["done_ttl_s"] = args.done_ttl_s
 
+    if args.state_dir:
+        journal = Journal(
+            args.state_dir, args.fsync, args.fsync_interval_ms, args.snapshot_every
+        )
+        t0 = time.perf_counter()
+        replayed = journal.load()
+        JOURNAL = journal
+        print(
+            f"restored state from {args.state_dir}: seq {journal.seq}, "
+            f"{replayed} events replayed in {time.perf_counter() - t0:.3f}s"
+        )
+        # fill a budget raised since the last run
+        _schedule()
+
+    if args.participant_ttl_s > 0 or args.done_ttl_s > 0:
+        threading.Thread(target=_gc_loop, args=(args.gc_interval_s,), daemon=True).start()
+
+    print(f"coordinator ({args.server}) listening on {args.host}:{args.port}")
+    if args.server == "asyncio":
+        asyncio.run(serve_async(args.host, args.port))
+        return
     server = ThreadingHTTPServer((args.host, args.port), Handler)
-    print(f"coordinator listening on {args.host}:{args.port}")
     server.serve_forever()
 
 
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# Merge per-rank Chrome traces of the loader / demo (trace_dir, --trace-dir)
+# into one Perfetto timeline aligned by wall clock, and summarize where each
+# rank spent its time
+
+import argparse
+import glob
+import json
+import os
+
+# see memfabric_trace.CATEGORIES; what a rank is bound by if the category
+# dominates its busy time
+BOUND_BY = {
+    "disk": "disk read",
+    "engine": "engine startup",
+    "register": "registration",
+    "control": "control plane",
+    "wait": "waiting on peers",
+    "transfer": "bandwidth",
+}
+GIB = 1 << 30
+
+
+def _union_s(intervals: list[tuple[float, float]]) -> float:
+    """Seconds covered by the union of [start, end) intervals in us."""
+    total = 0.0
+    end = None
+    for a, b in sorted(intervals):
+        if end is None or a > end:
+            total += b - a
+            end = b
+        elif b > end:
+            total += b - end
+            end = b
+    return total / 1e6
+
+
+def _load(paths: list[str]) -> list[tuple[str, dict]]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.json"))))
+        else:
+            files.append(path)
+    traces = []
+    for path in files:
+        with open(path, encoding="utf-8") as f:
+            traces.append((path, json.load(f)))
+    return traces
+
+
+def merge(traces: list[tuple[str, dict]], offsets_us: dict[str, float]) -> tuple[dict, list]:
+    """One trace with a process per input (sources first), timestamps
+    shifted so the earliest event is at 0; plus per-rank summaries."""
+    # sources sort above receivers, then by rank
+    order = sorted(
+        traces,
+        key=lambda t: (
+            t[1].get("otherData", {}).get("role") != "source",
+            t[1].get("otherData", {}).get("rank", 0),
+            t[0],
+        ),
+    )
+    t0 = min(
+        (
+            e["ts"] + offsets_us.get(str(d.get("otherData", {}).get("my_id")), 0.0)
+            for _, d in order
+            for e in d["traceEvents"]
+            if e.get("ph") != "M"
+        ),
+        default=0.0,
+    )
+    events = []
+    summaries = []
+    for pid, (path, data) in enumerate(order, start=1):
+        meta = data.get("otherData", {})
+        shift = offsets_us.get(str(meta.get("my_id")), 0.0) - t0
+        label = " ".join(
+            str(meta[k]) for k in ("role", "my_id") if meta.get(k) is not None
+        ) or os.path.basename(path)
+        events.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": label}})
+        events.append(
+            {"name": "process_sort_index", "ph": "M", "pid": pid, "args": {"sort_index": pid}}
+        )
+        spans: dict[str, list[tuple[float, float]]] = {c: [] for c in BOUND_BY}
+        transfer_bytes = 0
+        first = last = None
+        for e in data["traceEvents"]:
+            if e.get("ph") == "M" and e.get("name") == "process_name":
+                continue
+            e = dict(e, pid=pid)
+            if "ts" in e:
+                e["ts"] += shift
+                end = e["ts"] + e.get("dur", 0.0)
+                first = e["ts"] if first is None else min(first, e["ts"])
+                last = end if last is None else max(last, end)
+                if e.get("ph") == "X" and e.get("cat") in spans:
+                    spans[e["cat"]].append((e["ts"], end))
+                    if e["cat"] == "transfer":
+                        transfer_bytes += int(e.get("args", {}).get("bytes", 0))
+            events.append(e)
+        busy = {c: _union_s(iv) for c, iv in spans.items()}
+        summaries.append(
+            {
+                "label": label,
+                "start_s": (first or 0.0) / 1e6,
+                "end_s": (last or 0.0) / 1e6,
+                "busy": busy,
+                "gib": transfer_bytes / GIB,
+                "gibps": transfer_bytes / GIB / busy["transfer"] if busy["transfer"] else None,
+                "bound": BOUND_BY[max(busy, key=busy.get)] if any(busy.values()) else "-",
+                "dropped": meta.get("dropped", 0),
+            }
+        )
+    merged = {
+        "traceEvents": events,
+        "displayTimeUnit": "ms",
+        "otherData": {"t0_unix_s": t0 / 1e6, "inputs": [p for p, _ in order]},
+    }
+    return merged, summaries
+
+
+def main():
+    p = argparse.ArgumentParser(description="Merge per-rank memfabric traces")
+    p.add_argument("inputs", nargs="+", help="trace files or directories of them")
+    p.add_argument("-o", "--output", default="memfabric-merged.json")
+    p.add_argument(
+        "--offset-ms",
+        action="append",
+        default=[],
+        metavar="MY_ID=MS",
+        help="add MS to every timestamp of MY_ID, for hosts whose clocks are "
+        "known to be off; repeatable",
+    )
+    args = p.parse_args()
+
+    offsets_us = {}
+    for item in args.offset_ms:
+        my_id, _, ms = item.rpartition("=")
+        offsets_us[my_id] = float(ms) * 1000.0
+    traces = _load(args.inputs)
+    if not traces:
+        raise SystemExit("no trace files found")
+    merged, summaries = merge(traces, offsets_us)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(merged, f)
+    print(f"wrote {args.output} ({len(traces)} ranks); open it in ui.perfetto.dev")
+
+    # busy seconds per category; overlapping spans of one category count once
+    cats = list(BOUND_BY)
+    print(
+        f"{'rank':<32} {'start_s':>8} {'end_s':>8} "
+        + " ".join(f"{c:>9}" for c in cats)
+        + f" {'GiB':>7} {'GiB/s':>7}  bound by"
+    )
+    for s in summaries:
+        gibps = f"{s['gibps']:.2f}" if s["gibps"] is not None else "-"
+        print(
+            f"{s['label'][:32]:<32} {s['start_s']:>8.3f} {s['end_s']:>8.3f} "
+            + " ".join(f"{s['busy'][c]:>9.3f}" for c in cats)
+            + f" {s['gib']:>7.2f} {gibps:>7}  {s['bound']}"
+        )
+        if s["dropped"]:
+            print(f"  {s['dropped']} events dropped (trace buffer full)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# Node-local coordinator agent: merges the /v1/registry/* traffic of the ranks
+# on one node into one upstream /v1/registry/multi request per model
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import urllib.parse
+from typing import Any
+
+import coordinator as coord
+
+# single-op routes are forwarded as one-op batches
+SINGLE_OPS = {
+    f"/v1/registry/{op}": op
+    for op in (
+        "assign",
+        "register",
+        "ready",
+        "poll",
+        "complete",
+        "wait",
+        "progress",
+        "heartbeat",
+    )
+}
+LONG_POLL_OPS = ("poll", "wait")
+
+
+class Upstream:
+    """Keep-alive HTTP/1.1 client for the coordinator."""
+
+    def __init__(self, url: str):
+        parts = urllib.parse.urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self._idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self.requests = 0
+
+    async def _request(
+        self, path: str, body: bytes, content_type: str
+    ) -> tuple[int, dict[str, Any]]:
+        for attempt in range(2):
+            reused = bool(self._idle)
+            if reused:
+                reader, writer = self._idle.pop()
+            else:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            head = (
+                f"POST {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n"
+            )
+            try:
+                writer.write(head.encode("latin-1") + body)
+                raw = await reader.readuntil(b"\r\n\r\n")
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                # stale keep-alive connection: retry once on a fresh one
+                if reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            lines = raw.decode("latin-1").split("\r\n")
+            headers = {}
+            for line in lines[1:]:
+                name, sep, value = line.partition(":")
+                if sep:
+                    headers[name.strip().lower()] = value.strip()
+            try:
+                data = await reader.readexactly(int(headers.get("content-length", "0")))
+            except BaseException:
+                writer.close()
+                raise
+            closed = lines[0].startswith("HTTP/1.0") or headers.get("connection") == "close"
+            if closed:
+                writer.close()
+            else:
+                self._idle.append((reader, writer))
+            return int(lines[0].split(" ")[1]), json.loads(data) if data else {}
+        raise ConnectionError("unreachable")
+
+    async def post(
+        self,
+        path: str,
+        body: bytes,
+        content_type: str = "application/json",
+        timeout_s: float = 5,
+    ) -> tuple[int, dict[str, Any]]:
+        self.requests += 1
+        return await asyncio.wait_for(self._request(path, body, content_type), timeout_s)
+
+
+class _Waiter:
+    """One client request waiting to be sent (or re-sent) upstream."""
+
+    __slots__ = ("deadline", "fut", "ops", "results", "shared")
+
+    def __init__(self, req: dict[str, Any], fut: asyncio.Future):
+        self.shared = {k: v for k, v in req.items() if k != "ops"}
+        self.ops = list(req.get("ops", []))
+        self.results: list[dict[str, Any]] = []
+        self.deadline = None
+        last = self.ops[-1] if self.ops else {}
+        if last.get("op") in LONG_POLL_OPS:
+            timeout_ms = max(0, min(int(last.get("timeout_ms", 0)), coord.MAX_LONG_POLL_MS))
+            self.deadline = time.monotonic() + timeout_ms / 1000.0
+        self.fut = fut
+
+    def to_request(self) -> dict[str, Any]:
+        ops = self.ops
+        if self.deadline is not None:
+            remaining_ms = int(max(0.0, self.deadline - time.monotonic()) * 1000)
+            ops = ops[:-1] + [dict(ops[-1], timeout_ms=remaining_ms)]
+        return dict(self.shared, ops=ops)
+
+
+class Agent:
+    """Merge the ranks' requests per model_key into /v1/registry/multi calls.
+
+    Requests arriving within window_ms are sent together; long-polls whose
+    answer is not ready come back pending and join the next round.
+    """
+
+    def __init__(self, upstream: Upstream, window_ms: float = 5.0):
+        self.upstream = upstream
+        self.window_s = window_ms / 1000.0
+        self._queues: dict[str, list[_Waiter]] = {}
+        self.client_requests = 0
+
+    async def handle(
+        self, method: str, path: str, headers: dict[str, str], body: bytes
+    ) -> tuple[int, dict]:
+        if method == "GET" and path == "/healthz":
+            return 200, {"status": "ok"}
+        if method != "POST":
+            return 405, {"error": "method not allowed"}
+        self.client_requests += 1
+        content_type = headers.get("content-type", "application/json")
+        if content_type.startswith(coord.COMPACT_CONTENT_TYPE) or (
+            path != "/v1/registry/batch" and path not in SINGLE_OPS
+        ):
+            # compact registrations and unknown routes pass through unmerged
+            return await self.upstream.post(path, body, content_type)
+        req = json.loads(body.decode("utf-8")) if body else {}
+        if path == "/v1/registry/batch":
+            return await self.submit(req)
+        code, resp = await self.submit({"ops": [dict(req, op=SINGLE_OPS[path])]})
+        if code != 200:
+            return code, resp
+        result = resp["results"][0]
+        return result["code"], result["result"]
+
+    async def submit(self, req: dict[str, Any]) -> tuple[int, dict]:
+        """Queue one /batch body and return its (code, response)."""
+        if not isinstance(req.get("ops"), list) or not req["ops"]:
+            return 400, {"error": "missing ops"}
+        fut = asyncio.get_running_loop().create_future()
+        self._enqueue(_Waiter(req, fut))
+        return await fut
+
+    def _enqueue(self, waiter: _Waiter) -> None:
+        # ops may carry their own model_key, but the ranks of a node share one
+        key = coord._model_key_str(
+            waiter.shared.get("model_key") or waiter.ops[0].get("model_key", {})
+        )
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = []
+            asyncio.get_running_loop().call_later(
+                self.window_s, lambda: asyncio.ensure_future(self._flush(key))
+            )
+        queue.append(waiter)
+
+    async def _flush(self, key: str) -> None:
+        waiters = self._queues.pop(key, [])
+        if not waiters:
+            return
+        payload = {"requests": [w.to_request() for w in waiters]}
+        timeout_s = max(
+            (w.deadline - time.monotonic() for w in waiters if w.deadline is not None),
+            default=0.0,
+        )
+        try:
+            code, resp = await self.upstream.post(
+                "/v1/registry/multi",
+                json.dumps(payload).encode("utf-8"),
+                timeout_s=max(timeout_s, 0.0) + 10,
+            )
+        except Exception as e:  # noqa: BLE001 - every waiter must get an answer
+            for w in waiters:
+                if not w.fut.done():
+                    w.fut.set_result((502, {"error": f"upstream: {e}"}))
+            return
+        if code != 200:
+            for w in waiters:
+                w.fut.set_result((code, resp))
+            return
+        for w, entry in zip(waiters, resp["responses"]):
+            body = entry["body"]
+            if entry.get("pending"):
+                # earlier ops already ran upstream; only the long-poll is re-sent
+                w.results.extend(body["results"])
+                w.ops = w.ops[-1:]
+                self._enqueue(w)
+                continue
+            if entry["code"] == 200:
+                body = {"results": w.results + body["results"]}
+            w.fut.set_result((entry["code"], body))
+
+
+async def serve(socket_path: str, upstream_url: str, window_ms: float) -> None:
+    agent = Agent(Upstream(upstream_url), window_ms)
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = await asyncio.start_unix_server(
+        lambda r, w: coord.serve_http(r, w, agent.handle), socket_path
+    )
+    os.chmod(socket_path, 0o666)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MemFabric node-local coordinator agent")
+    parser.add_argument("--socket", default="/run/memfabric/agent.sock")
+    parser.add_argument("--coordinator-url", required=True)
+    parser.add_argument(
+        "--window-ms",
+        type=float,
+        default=5.0,
+        help="how long to gather local requests before sending them upstream",
+    )
+    args = parser.parse_args()
+    print(f"node agent on {args.socket} -> {args.coordinator_url}")
+    asyncio.run(serve(args.socket, args.coordinator_url, args.window_ms))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# Simulator: coordinator requests for a scale-out with and without node agents
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any
+
+import coordinator as coord
+import node_agent
+
+LONG_POLL_MS = 30000
+
+
+class DirectUpstream:
+    """In-process stand-in for the coordinator HTTP server; counts requests."""
+
+    def __init__(self):
+        self.requests = 0
+
+    async def post(
+        self,
+        path: str,
+        body: bytes,
+        content_type: str = "application/json",
+        timeout_s: float = 5,
+    ) -> tuple[int, dict[str, Any]]:
+        self.requests += 1
+        out = coord._dispatch_post(path, content_type, body)
+        if isinstance(out, coord.LongPoll):
+            out = await coord._long_poll_async(out)
+        # round-trip through JSON like the real server
+        code, payload = out
+        return code, json.loads(json.dumps(payload, default=coord._json_default))
+
+
+def reset_state():
+    coord.STATE["models"].clear()
+    coord.STATE["transfer_models"].clear()
+    coord.STATE["layouts"].clear()
+
+
+async def _batch(send, shared: dict[str, Any], ops: list[dict[str, Any]]) -> list[dict]:
+    code, resp = await send(dict(shared, ops=ops))
+    if code != 200:
+        raise RuntimeError(f"batch failed: {code} {resp}")
+    results = resp["results"]
+    if len(results) != len(ops) or any(r["code"] >= 400 for r in results):
+        raise RuntimeError(f"batch op failed: {results}")
+    return [r["result"] for r in results]
+
+
+async def _source(send, shared: dict[str, Any], receivers: int):
+    params = [{"name": "w", "addr": 1 << 20, "bytes": 4096}]
+    await _batch(send, shared, [{"op": "register", "params": params}, {"op": "ready"}])
+    served = 0
+    completed: list[str] = []
+    while served < receivers:
+        ops = [{"op": "complete", "transfer_ids": completed}] if completed else []
+        ops.append({"op": "poll", "timeout_ms": LONG_POLL_MS})
+        tasks = (await _batch(send, shared, ops))[-1]["tasks"]
+        completed = [t["transfer_id"] for t in tasks]
+        served += len(tasks)
+    await _batch(send, shared, [{"op": "complete", "transfer_ids": completed}])
+
+
+async def _receiver(send, shared: dict[str, Any], addr: int):
+    params = [{"name": "w", "addr": addr, "bytes": 4096}]
+    ops = [{"op": "register", "params": params}, {"op": "ready"}]
+    while True:
+        ops.append({"op": "wait", "timeout_ms": LONG_POLL_MS})
+        if (await _batch(send, shared, ops))[-1]["status"] == "done":
+            return
+        ops = []
+
+
+async def simulate(nodes: int, ranks_per_node: int, agent: bool) -> dict[str, float]:
+    """Node 0 holds one source per TP rank; every other node receives."""
+    reset_state()
+    upstream = DirectUpstream()
+    coros = []
+    for node in range(nodes):
+        if agent:
+            send = node_agent.Agent(upstream, window_ms=5).submit
+        else:
+
+            async def send(req, upstream=upstream):
+                return await upstream.post(
+                    "/v1/registry/batch", json.dumps(req).encode("utf-8")
+                )
+
+        for tp in range(ranks_per_node):
+            shared = {
+                "model_key": {"model": "sim-agent", "tp": ranks_per_node},
+                "my_id": f"n{node}r{tp}",
+                "rank_info": {"tp_rank": tp},
+                "role": "source" if node == 0 else "receiver",
+            }
+            if node == 0:
+                coros.append(_source(send, shared, nodes - 1))
+            else:
+                coros.append(_receiver(send, shared, (node << 32) + (tp << 24)))
+    t0 = time.perf_counter()
+    await asyncio.gather(*coros)
+    elapsed = time.perf_counter() - t0
+    return {"requests": upstream.requests, "seconds": elapsed}
+
+
+def main():
+    p = argparse.ArgumentParser(description="Node agent coordinator traffic simulator")
+    p.add_argument("--nodes", type=int, nargs="+", default=[10, 100, 1000])
+    p.add_argument("--ranks-per-node", type=int, default=8)
+    args = p.parse_args()
+
+    print(f"{'nodes':>6} {'ranks':>6} {'direct_req':>11} {'agent_req':>10} {'reduction':>10}")
+    for nodes in args.nodes:
+        direct = asyncio.run(simulate(nodes, args.ranks_per_node, agent=False))
+        merged = asyncio.run(simulate(nodes, args.ranks_per_node, agent=True))
+        print(
+            f"{nodes:>6} {nodes * args.ranks_per_node:>6} {direct['requests']:>11} "
+            f"{merged['requests']:>10} {direct['requests'] / merged['requests']:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
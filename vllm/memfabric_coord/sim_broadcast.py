@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# Simulate replication time to N receivers for the single and broadcast schedulers
+
+import argparse
+import heapq
+
+import coordinator as coord
+
+
+def reset_state():
+    coord.STATE["models"].clear()
+    coord.STATE["transfer_models"].clear()
+
+
+def simulate(receivers: int, scheduler: str, fanout: int = 1) -> float:
+    """Every source writes one task at a time; a transfer takes 1 time unit."""
+    reset_state()
+    coord.CONFIG["scheduler"] = scheduler
+    coord.CONFIG["broadcast_fanout"] = fanout
+    key = coord._model_key_str({"name": "sim", "receivers": receivers})
+    rank_key = coord._rank_key({})
+    params = {"w": {"addr": 0, "bytes": 1}}
+    now = 0.0
+    queues: dict[str, list[str]] = {}
+    busy_until: dict[str, float] = {}
+    events: list[tuple[float, str, str]] = []
+    state = coord._get_model_state(key)
+    with state["lock"]:
+        coord._register(key, rank_key, "src", "source", {}, params, {})
+        coord._mark_ready(key, rank_key, "src", "source")
+        for i in range(receivers):
+            rid = f"r{i}"
+            coord._register(key, rank_key, rid, "receiver", {}, params, {}, True)
+            coord._mark_ready(key, rank_key, rid, "receiver")
+        while True:
+            # sources drain /poll into a local FIFO, then serve it serially
+            for source_id, tasks in state["pending"].items():
+                queues.setdefault(source_id, []).extend(t["transfer_id"] for t in tasks)
+                tasks.clear()
+            for source_id, queue in queues.items():
+                while queue and busy_until.get(source_id, 0.0) <= now:
+                    tid = queue.pop(0)
+                    busy_until[source_id] = now + 1.0
+                    heapq.heappush(events, (now + 1.0, tid, source_id))
+            if not events:
+                break
+            now, tid, _ = heapq.heappop(events)
+            coord._complete_transfer(tid)
+        done = sum(1 for s in state["transfer_status"].values() if s == "done")
+    if done != receivers:
+        raise RuntimeError(f"only {done}/{receivers} receivers finished")
+    return now
+
+
+def main():
+    p = argparse.ArgumentParser(description="Simulate single-source vs broadcast replication")
+    p.add_argument("--receivers", type=int, nargs="+", default=[1, 3, 7, 15, 63, 255])
+    args = p.parse_args()
+
+    print(f"{'receivers':>10} {'single':>8} {'broadcast':>10}")
+    for n in args.receivers:
+        single = simulate(n, "single")
+        broadcast = simulate(n, "broadcast")
+        print(f"{n:>10} {single:>8.0f} {broadcast:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
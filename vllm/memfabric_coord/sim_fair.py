@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# Simulate two models scaling out over one shared fabric: time-to-ready of a
+# small high-priority model next to a large one, with and without the global
+# transfer budget and per-model priority/weight
+
+import argparse
+
+import coordinator as coord
+
+
+def reset_state():
+    coord.STATE["models"].clear()
+    coord.STATE["transfer_models"].clear()
+    coord.STATE["layouts"].clear()
+    coord.STATE["sched"] = {"active": 0, "vtime": 0.0, "finish": {}, "waiting": {}}
+
+
+def _setup(name: str, receivers: int, gib: float, policy: dict) -> tuple[str, dict]:
+    key = coord._model_key_str({"name": name})
+    rank_key = coord._rank_key({})
+    params = {"w": {"addr": 0, "bytes": int(gib * coord.GIB)}}
+    state = coord._get_model_state(key)
+    with state["lock"]:
+        if policy:
+            coord._set_policy(state, policy.get("priority"), policy.get("weight"))
+        coord._register(key, rank_key, "src", "source", {}, params, {})
+        coord._mark_ready(key, rank_key, "src", "source")
+        for i in range(receivers):
+            coord._register(key, rank_key, f"r{i}", "receiver", {}, params, {})
+            coord._mark_ready(key, rank_key, f"r{i}", "receiver")
+    return key, state
+
+
+def simulate(
+    models: list[tuple[str, int, float]],
+    fabric: float,
+    stream_max: float,
+    budget: int,
+    policies: dict[str, dict],
+) -> dict[str, list[float]]:
+    """Every active transfer gets an equal share of `fabric` GiB/s, at most
+    stream_max each; returns ready times per model."""
+    reset_state()
+    coord.CONFIG["scheduler"] = "single"
+    coord.CONFIG["max_active_transfers"] = budget
+    states = {}
+    for name, receivers, gib in models:
+        states[name] = _setup(name, receivers, gib, policies.get(name, {}))[1]
+    now = 0.0
+    active: dict[str, list] = {}  # transfer_id -> [remaining GiB, start, model]
+    ready: dict[str, list[float]] = {name: [] for name in states}
+    while True:
+        coord._schedule()
+        for name, state in states.items():
+            with state["lock"]:
+                for task in state["pending"].pop("src", []):
+                    nbytes = state["transfer_bytes"][task["transfer_id"]]
+                    active[task["transfer_id"]] = [nbytes / coord.GIB, now, name]
+        if not active:
+            break
+        rate = min(stream_max, fabric / len(active))
+        step = min(entry[0] for entry in active.values()) / rate
+        now += step
+        finished = []
+        for tid, entry in active.items():
+            entry[0] -= rate * step
+            if entry[0] <= 1e-9:
+                finished.append(tid)
+        for tid in finished:
+            _, start, name = active.pop(tid)
+            with states[name]["lock"]:
+                coord._complete_transfer(tid, now - start)
+            ready[name].append(now)
+    for name, receivers, _ in models:
+        if len(ready[name]) != receivers:
+            raise RuntimeError(f"{name}: only {len(ready[name])}/{receivers} receivers finished")
+    return ready
+
+
+def main():
+    p = argparse.ArgumentParser(description="Simulate weighted fair scheduling across models")
+    p.add_argument("--large-receivers", type=int, default=32)
+    p.add_argument("--large-gib", type=float, default=16.0)
+    p.add_argument("--small-receivers", type=int, default=16)
+    p.add_argument("--small-gib", type=float, default=8.0)
+    p.add_argument("--fabric-gibps", type=float, default=100.0)
+    p.add_argument("--stream-max-gibps", type=float, default=25.0)
+    p.add_argument("--budget", type=int, default=4, help="max_active_transfers")
+    p.add_argument("--weight", type=float, default=2.0, help="weight of the small model")
+    args = p.parse_args()
+
+    # the large model registers first, as in a scale-out already under way
+    models = [
+        ("large", args.large_receivers, args.large_gib),
+        ("small", args.small_receivers, args.small_gib),
+    ]
+    runs = [
+        ("unlimited", 0, {}),
+        ("budget", args.budget, {}),
+        (f"weight={args.weight:g}", args.budget, {"small": {"weight": args.weight}}),
+        ("priority=1", args.budget, {"small": {"priority": 1}}),
+    ]
+    print(
+        f"large {args.large_receivers} x {args.large_gib:g} GiB, "
+        f"small {args.small_receivers} x {args.small_gib:g} GiB, "
+        f"fabric {args.fabric_gibps:g} GiB/s, stream max {args.stream_max_gibps:g} GiB/s"
+    )
+    print(
+        f"{'policy':>12} {'small_p50_s':>12} {'small_last_s':>13} "
+        f"{'large_p50_s':>12} {'large_last_s':>13}"
+    )
+    for name, budget, policies in runs:
+        r = simulate(models, args.fabric_gibps, args.stream_max_gibps, budget, policies)
+        small, large = sorted(r["small"]), sorted(r["large"])
+        print(
+            f"{name:>12} {small[len(small) // 2]:>12.1f} {small[-1]:>13.1f} "
+            f"{large[len(large) // 2]:>12.1f} {large[-1]:>13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
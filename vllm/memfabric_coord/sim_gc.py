@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# Simulate weeks of autoscaling churn: coordinator entries, memory and
+# request latency with and without TTL eviction
+
+import argparse
+import json
+import threading
+import time
+
+import coordinator as coord
+
+
+class Clock:
+    """Stand-in for the time module with a wall clock the simulation moves."""
+
+    def __init__(self):
+        self.now = time.time()
+
+    def time(self) -> float:
+        return self.now
+
+    def __getattr__(self, name: str):
+        return getattr(time, name)
+
+
+def reset_state():
+    coord.STATE["models"].clear()
+    coord.STATE["transfer_models"].clear()
+    coord.STATE["layouts"].clear()
+    coord.STATE["sched"] = {"active": 0, "vtime": 0.0, "finish": {}, "waiting": {}}
+
+
+def _post(path: str, req: dict) -> dict:
+    out = coord._dispatch_post(path, "application/json", json.dumps(req).encode("utf-8"))
+    if isinstance(out, coord.LongPoll):
+        out = coord._long_poll_blocking(out)
+    code, resp = out
+    if code != 200:
+        raise RuntimeError(f"{path} failed: {code} {resp}")
+    return resp
+
+
+def simulate(rounds: int, receivers: int, params: int, ttl: float, step_s: float) -> dict:
+    """Every round `receivers` new pods register, load from the one long-lived
+    source and go away; the clock moves step_s per round."""
+    reset_state()
+    clock = Clock()
+    coord.time = clock
+    coord.CONFIG["participant_ttl_s"] = ttl
+    coord.CONFIG["done_ttl_s"] = ttl
+    model_key = {"model": "sim-gc", "tp": 1}
+    table = [
+        {"name": f"model.layers.{i}.weight", "addr": i << 20, "bytes": 1 << 20}
+        for i in range(params)
+    ]
+    src = {"model_key": model_key, "my_id": "src", "role": "source"}
+    _post("/v1/registry/batch", dict(src, ops=[{"op": "register", "params": table}, {"op": "ready"}]))
+    register_s = 0.0
+    try:
+        for r in range(rounds):
+            t0 = time.perf_counter()
+            for i in range(receivers):
+                _post(
+                    "/v1/registry/batch",
+                    {
+                        "model_key": model_key,
+                        "my_id": f"pod{r}.{i}",
+                        "role": "receiver",
+                        "ops": [{"op": "register", "params": table}, {"op": "ready"}],
+                    },
+                )
+            register_s = (time.perf_counter() - t0) / receivers
+            tasks = _post("/v1/registry/poll", dict(src, timeout_ms=0))["tasks"]
+            _post("/v1/registry/complete", {"transfer_ids": [t["transfer_id"] for t in tasks]})
+            clock.now += step_s
+            coord._gc()
+    finally:
+        coord.time = time
+    t0 = time.perf_counter()
+    stats = coord._route_stats()[1]
+    stats_s = time.perf_counter() - t0
+    # longest a request of the model waits for its lock while /stats runs
+    lock = coord._get_model_state(coord._model_key_str(model_key))["lock"]
+    stats_thread = threading.Thread(target=coord._route_stats)
+    blocked_s = 0.0
+    stats_thread.start()
+    while stats_thread.is_alive():
+        t0 = time.perf_counter()
+        with lock:
+            pass
+        blocked_s = max(blocked_s, time.perf_counter() - t0)
+        time.sleep(0.001)
+    model = next(iter(stats["models"].values()))
+    return {
+        "receivers": model["receivers"],
+        "transfers": sum(model["transfers"].values()),
+        "mb": stats["approx_bytes"] / 1e6,
+        "register_us": register_s * 1e6,
+        "stats_ms": stats_s * 1e3,
+        "blocked_ms": blocked_s * 1e3,
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="Simulate coordinator state growth under churn")
+    p.add_argument("--rounds", type=int, default=500)
+    p.add_argument("--receivers", type=int, default=8, help="new pods per round")
+    p.add_argument("--params", type=int, default=64, help="params per registration")
+    p.add_argument("--step-s", type=float, default=600, help="wall time per round")
+    p.add_argument("--ttl-s", type=float, nargs="+", default=[0, 1800])
+    args = p.parse_args()
+
+    print(
+        f"{args.rounds} rounds x {args.receivers} pods, {args.params} params each, "
+        f"{args.step_s:g}s per round"
+    )
+    print(
+        f"{'ttl_s':>7} {'receivers':>10} {'transfers':>10} {'approx_MB':>10} "
+        f"{'register_us':>12} {'stats_ms':>9} {'blocked_ms':>11}"
+    )
+    for ttl in args.ttl_s:
+        r = simulate(args.rounds, args.receivers, args.params, ttl, args.step_s)
+        print(
+            f"{ttl:>7g} {r['receivers']:>10} {r['transfers']:>10} {r['mb']:>10.1f} "
+            f"{r['register_us']:>12.0f} {r['stats_ms']:>9.1f} {r['blocked_ms']:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+# End-to-end checks of memfabric_http_loader against a coordinator process,
+# with a mock TransferEngine instead of memfabric_hybrid. Needs vLLM with the
+# memfabric loader installed; exits non-zero on the first failed check
+
+import argparse
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+import urllib.error
+import urllib.request
+from typing import Self
+
+from vllm.model_executor.model_loader import memfabric_http_loader as loader
+from vllm.model_executor.model_loader.memfabric_metrics import METRICS
+from vllm.model_executor.model_loader.memfabric_transfer import (
+    TransferExecutor,
+    TransferOp,
+)
+
+COORDINATOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "coordinator.py")
+MODEL_KEY = {"model": "sim-loader", "tp": 1}
+RANK_INFO = {"rank": 0, "local_rank": 0, "tp_rank": 0, "pp_rank": 0, "dp_rank": 0}
+
+
+class MockEngine:
+    """Stand-in for memfabric_hybrid.TransferEngine: every transfer call
+    sleeps (per peer) and succeeds unless the peer is in fail_peers; records
+    the peak number of calls in flight."""
+
+    def __init__(
+        self,
+        delay_s: float = 0.01,
+        peer_delay_s: dict[str, float] | None = None,
+        fail_peers: set[str] | None = None,
+    ):
+        self.delay_s = delay_s
+        self.peer_delay_s = peer_delay_s or {}
+        self.fail_peers = fail_peers or set()
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def register_memory(self, addr: int, size: int) -> int:
+        return 0
+
+    def _transfer(self, peer_id: str, count: int = 1) -> int:
+        with self._lock:
+            self.calls += count
+            self.active += count
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.peer_delay_s.get(peer_id, self.delay_s))
+        finally:
+            with self._lock:
+                self.active -= count
+        return -1 if peer_id in self.fail_peers else 0
+
+    def transfer_sync_write(self, peer_id: str, src: int, dst: int, size: int) -> int:
+        return self._transfer(peer_id)
+
+    def transfer_sync_read(self, peer_id: str, local: int, remote: int, size: int) -> int:
+        return self._transfer(peer_id)
+
+
+class MockBatchEngine(MockEngine):
+    """MockEngine with the batch API; a batch is that many writes in flight."""
+
+    def batch_transfer_sync_write(
+        self, peer_id: str, srcs: list[int], dsts: list[int], sizes: list[int]
+    ) -> int:
+        return self._transfer(peer_id, len(srcs))
+
+
+class LogLines(logging.Handler):
+    """Collects the loader's log messages while attached."""
+
+    def __init__(self):
+        super().__init__()
+        self.lines: list[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.lines.append(record.getMessage())
+
+    def __enter__(self) -> Self:
+        loader.logger.addHandler(self)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        loader.logger.removeHandler(self)
+
+
+def start_coordinator(port: int, *args: str) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, COORDINATOR, "--host", "127.0.0.1", "--port", str(port), *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError(f"coordinator did not start on port {port}")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Coordinator:
+    """coordinator.py subprocess on a free port; restart() keeps the port."""
+
+    def __init__(self, *args: str):
+        self.port = free_port()
+        self.args = args
+        self.proc = start_coordinator(self.port, *args)
+
+    def stop(self) -> None:
+        self.proc.kill()
+        self.proc.wait()
+
+    def restart(self, down_s: float) -> None:
+        self.stop()
+        time.sleep(down_s)
+        self.proc = start_coordinator(self.port, *self.args)
+
+
+def post(port: int, path: str, req: dict) -> tuple[int, dict]:
+    r = urllib.request.Request(
+        f"http://127.0.0.1:{port}{path}",
+        data=json.dumps(req).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(r, timeout=10) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"{}")
+
+
+def get(port: int, path: str) -> dict:
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=10) as resp:
+        return json.loads(resp.read())
+
+
+def table(count: int, base: int, per_layer: bool = True) -> list[dict]:
+    """count 1 MiB params, one per decoder layer or all outside the layers."""
+    return [
+        {"name": f"model.layers.{i}.weight" if per_layer else f"model.embed.{i}.weight",
+         "dtype": "bf16", "shape": [1 << 19], "bytes": 1 << 20, "addr": base + (i << 20)}
+        for i in range(count)
+    ]
+
+
+def make_loader(port: int, my_id: str, **extra) -> loader.MemfabricHttpLoader:
+    load_config = types.SimpleNamespace(
+        model_loader_extra_config=dict(
+            extra, coordinator_url=f"http://127.0.0.1:{port}", my_id=my_id, node_ip="127.0.0.1"
+        )
+    )
+    return loader.MemfabricHttpLoader(load_config)
+
+
+def register(ld: loader.MemfabricHttpLoader, role: str, params: list[dict]) -> dict:
+    extra = ld._get_extra()
+    return ld._register_to_coordinator(
+        role=role,
+        vllm_config=None,
+        model_config=None,
+        my_id=extra["my_id"],
+        npu_id=0,
+        params=params,
+    )
+
+
+def add_receiver(port: int, my_id: str, params: list[dict]) -> None:
+    code, resp = post(
+        port,
+        "/v1/registry/batch",
+        {
+            "model_key": MODEL_KEY,
+            "my_id": my_id,
+            "role": "receiver",
+            "rank_info": RANK_INFO,
+            "ops": [{"op": "register", "params": params}, {"op": "ready"}],
+        },
+    )
+    if code != 200:
+        raise RuntimeError(f"register {my_id} failed: {code} {resp}")
+
+
+def wait_done(port: int, my_ids: list[str], start: float, timeout_s: float) -> dict[str, float]:
+    """Seconds from start (perf_counter) until each receiver's /wait reports
+    done."""
+    done: dict[str, float] = {}
+    while len(done) < len(my_ids) and time.perf_counter() - start < timeout_s:
+        for my_id in my_ids:
+            if my_id in done:
+                continue
+            _, resp = post(
+                port,
+                "/v1/registry/wait",
+                {"model_key": MODEL_KEY, "my_id": my_id, "rank_info": RANK_INFO, "timeout_ms": 0},
+            )
+            if resp.get("status") == "done":
+                done[my_id] = time.perf_counter() - start
+        time.sleep(0.02)
+    return done
+
+
+def serve(port: int, engine: MockEngine, params: list[dict], **extra) -> threading.Event:
+    """Register a source loader and start its serving thread; the returned
+    heartbeat event is set when it stops."""
+    ld = make_loader(port, "src", **dict({"heartbeat_interval_s": 0, "long_poll_ms": 1000}, **extra))
+    register(ld, "source", params)
+    heartbeat = ld._start_heartbeat(
+        vllm_config=None, model_config=None, my_id="src", role="source"
+    )
+    ld._start_serving(
+        engine,
+        vllm_config=None,
+        model_config=None,
+        my_id="src",
+        local_params={p["name"]: p for p in params},
+        heartbeat=heartbeat,
+    )
+    return heartbeat
+
+
+def check(ok: bool, what: str) -> None:
+    if not ok:
+        raise SystemExit(f"FAIL {what}")
+    print(f"ok   {what}")
+
+
+def check_compact_layout(coord: Coordinator) -> None:
+    """A compact registration stores its layout, so the next rank of the
+    same layout registers with addresses only."""
+    port = coord.port
+    params = table(8, 1 << 32)
+    retries = METRICS.snapshot()["counters"]["registration_retries_total"]
+    register(make_loader(port, "r0", registration_format="compact"), "receiver", params)
+    check(
+        METRICS.snapshot()["counters"]["registration_retries_total"] == retries + 1,
+        "first compact registration resends its table once",
+    )
+    code, resp = post(
+        port,
+        "/v1/registry/register",
+        {
+            "model_key": MODEL_KEY,
+            "my_id": "r1",
+            "role": "receiver",
+            "rank_info": RANK_INFO,
+            "layout_hash": loader.layout_fingerprint(params),
+            "addrs": [p["addr"] + (1 << 40) for p in params],
+        },
+    )
+    check(code == 200, f"address-only registration after a compact one ({code} {resp})")
+    register(make_loader(port, "r2", registration_format="compact"), "receiver", params)
+    check(
+        METRICS.snapshot()["counters"]["registration_retries_total"] == retries + 1,
+        "second compact loader registers by address",
+    )
+
+
+def check_serve_overlap(coord: Coordinator) -> None:
+    """A slow receiver does not hold back the completion of fast ones, and a
+    receiver arriving mid-transfer is served before the slow one is done."""
+    port = coord.port
+    params = table(8, 1 << 32)
+    engine = MockEngine(0.01, {"slow": 0.3})
+    with LogLines() as log:
+        stopped = serve(
+            port, engine, params, max_concurrent_peers=2, poll_interval_s=0.1, poll_timeout_s=4
+        )
+        start = time.perf_counter()
+        add_receiver(port, "slow", table(8, 1 << 36))
+        add_receiver(port, "fast0", table(8, 1 << 37))
+        time.sleep(0.5)
+        add_receiver(port, "fast1", table(8, 1 << 38))
+        done = wait_done(port, ["slow", "fast0", "fast1"], start, 30)
+        stopped_in_time = stopped.wait(10)
+    fan_out = [line for line in log.lines if line.startswith("transfer fan-out")]
+    print("     done after " + " ".join(f"{k}={v:.2f}s" for k, v in done.items()))
+    check(len(done) == 3, "every receiver is served")
+    check(done["fast0"] < done["slow"], "fast receiver completes before the slow one polled with it")
+    check(done["fast1"] < done["slow"], "receiver arriving mid-transfer is served right away")
+    check(engine.peak <= 2, f"at most max_concurrent_peers transfers at a time (peak {engine.peak})")
+    check(
+        len(fan_out) == 1 and "peers=3 bytes=25165824 " in fan_out[0],
+        f"aggregate egress logged once the fan-out drains ({fan_out})",
+    )
+    check(stopped_in_time, "source stops serving after poll_timeout_s")
+
+
+def check_serve_error(coord: Coordinator) -> None:
+    """A failed transfer stops the serving thread and its heartbeat, after
+    completing what landed, and TTL eviction then frees the receivers."""
+    port = coord.port
+    params = table(8, 1 << 32)
+    engine = MockEngine(0.05, fail_peers={"bad"})
+    stopped = serve(
+        port,
+        engine,
+        params,
+        max_concurrent_peers=2,
+        poll_interval_s=0.1,
+        heartbeat_interval_s=0.5,
+    )
+    start = time.perf_counter()
+    add_receiver(port, "good", table(8, 1 << 36))
+    add_receiver(port, "bad", table(8, 1 << 37))
+    check(stopped.wait(10), "serving and heartbeat stop after a failed transfer")
+    done = wait_done(port, ["good"], start, 10)
+    check("good" in done, "transfer in flight next to the failed one is completed")
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        models = get(port, "/v1/registry/stats")["models"]
+        sources = sum(m["sources"] for m in models.values())
+        if sources == 0:
+            break
+        time.sleep(0.2)
+    check(sources == 0, "silent source is evicted after participant_ttl_s")
+
+
+def check_restart(coord: Coordinator) -> None:
+    """Source and receiver loaders ride out a coordinator restart in the
+    middle of a transfer (state kept with --state-dir)."""
+    port = coord.port
+    params = table(8, 1 << 32)
+    engine = MockEngine(0.2)
+    stopped = serve(port, engine, params, heartbeat_interval_s=0.5, coordinator_retry_s=20)
+    ld = make_loader(port, "rcv", long_poll_ms=1000, coordinator_retry_s=20)
+    register(ld, "receiver", table(8, 1 << 36))
+    result: dict = {}
+
+    def _wait():
+        try:
+            result.update(ld._wait_done(vllm_config=None, model_config=None, my_id="rcv", timeout_s=60))
+        except (OSError, RuntimeError) as e:
+            result["error"] = repr(e)
+
+    waiter = threading.Thread(target=_wait)
+    waiter.start()
+    time.sleep(0.5)
+    retries = METRICS.snapshot()["counters"]["coordinator_retries_total"]
+    coord.restart(2.0)
+    waiter.join(60)
+    check(result.get("status") == "done", f"waiting receiver sees its load finish ({result})")
+    check(
+        METRICS.snapshot()["counters"]["coordinator_retries_total"] > retries,
+        "requests during the restart were retried",
+    )
+    check(not stopped.is_set(), "source keeps serving across the restart")
+
+
+def check_progress(coord: Coordinator) -> None:
+    """Layer progress reaches the receiver's /wait while the transfer runs,
+    and is sent by a thread other than the ones copying."""
+    port = coord.port
+    callers = set()
+    http_post = loader._http_post
+
+    def _recording_post(*args, **kwargs):
+        callers.add(threading.current_thread().name)
+        return http_post(*args, **kwargs)
+
+    loader._http_post = _recording_post
+    try:
+        stopped = serve(port, MockEngine(0.05), table(8, 1 << 32), poll_timeout_s=2)
+        add_receiver(port, "rcv", table(8, 1 << 36))
+        partial = 0
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            _, resp = post(
+                port,
+                "/v1/registry/wait",
+                {"model_key": MODEL_KEY, "my_id": "rcv", "rank_info": RANK_INFO, "timeout_ms": 0},
+            )
+            if resp.get("status") == "done":
+                break
+            partial = max(partial, len(resp.get("layers_ready", [])))
+            time.sleep(0.02)
+        stopped.wait(10)
+    finally:
+        loader._http_post = http_post
+    check(resp.get("status") == "done", "receiver is served")
+    check(0 < partial < 8, f"layer groups show up before the transfer is done ({partial} of 8)")
+    copying = sorted(name for name in callers if name.startswith("memfabric-peer"))
+    check(not copying, f"no coordinator calls from transfer threads {copying}")
+
+
+def check_inflight(coord: Coordinator) -> None:
+    """TransferExecutor keeps exactly max_inflight writes outstanding, with
+    and without the batch API, and so does a source loader's transfer."""
+    port = coord.port
+    ops = [TransferOp(i << 20, i << 20, 1 << 20, f"op{i}") for i in range(32)]
+    for engine_cls in (MockEngine, MockBatchEngine):
+        for max_inflight in (1, 2, 4, 8):
+            engine = engine_cls(0.01)
+            executor = TransferExecutor(engine, max_inflight)
+            try:
+                errors = executor.write("peer", ops)
+            finally:
+                executor.close()
+            check(
+                not errors and engine.calls == len(ops) and engine.peak == max_inflight,
+                f"{engine_cls.__name__} max_inflight={max_inflight} peak={engine.peak}",
+            )
+    engine = MockEngine(0.01)
+    stopped = serve(
+        port,
+        engine,
+        table(32, 1 << 32, per_layer=False),
+        max_inflight=4,
+        transfer_coalesce=False,
+        poll_timeout_s=1,
+    )
+    add_receiver(port, "rcv", table(32, 1 << 36, per_layer=False))
+    done = wait_done(port, ["rcv"], time.perf_counter(), 10)
+    stopped.wait(10)
+    check("rcv" in done and engine.peak == 4, f"loader transfer max_inflight=4 peak={engine.peak}")
+
+
+CHECKS = {
+    "compact": check_compact_layout,
+    "serve": check_serve_overlap,
+    "serve_error": check_serve_error,
+    "restart": check_restart,
+    "progress": check_progress,
+    "inflight": check_inflight,
+}
+
+COORDINATOR_ARGS = {
+    # relies on TTL eviction
+    "serve_error": ("--participant-ttl-s", "2", "--gc-interval-s", "0.5"),
+    "restart": ("--state-dir", tempfile.mkdtemp(prefix="sim-loader-")),
+}
+
+
+def main():
+    p = argparse.ArgumentParser(description="Loader <-> coordinator end-to-end checks")
+    p.add_argument("--checks", nargs="+", choices=list(CHECKS), default=list(CHECKS))
+    args = p.parse_args()
+
+    # one rank per process here; the sim has no torch.distributed or vLLM config
+    loader._get_rank_info = lambda: dict(RANK_INFO)
+    loader._build_model_key = lambda vllm_config, model_config: dict(MODEL_KEY)
+    for name in args.checks:
+        coord = Coordinator(*COORDINATOR_ARGS.get(name, ()))
+        try:
+            CHECKS[name](coord)
+        finally:
+            coord.stop()
+
+
+if __name__ == "__main__":
+    main()
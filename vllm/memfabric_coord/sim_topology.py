@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# Simulate a scale-out over racks: cross-rack bytes and replication time with
+# and without topology-aware pairing
+
+import argparse
+import heapq
+
+import coordinator as coord
+
+
+def reset_state():
+    coord.STATE["models"].clear()
+    coord.STATE["transfer_models"].clear()
+    coord.STATE["layouts"].clear()
+
+
+def _topology(rack: int, node: int, labels: bool) -> dict[str, str]:
+    if not labels:
+        return {}
+    return {"node_ip": f"10.{rack}.0.{node}", "rack": f"rack{rack}", "switch": "leaf0"}
+
+
+def simulate(
+    racks: int,
+    nodes_per_rack: int,
+    scheduler: str,
+    labels: bool,
+    max_cross_rack: int,
+    gib: float,
+    cross_rack_cost: float,
+) -> dict[str, float]:
+    """One source on rack 0 node 0, one receiver on every other node.
+
+    Receivers register interleaved across racks; every source writes one task
+    at a time; a transfer takes 1 time unit within a rack and
+    cross_rack_cost units across racks.
+    """
+    reset_state()
+    coord.CONFIG["scheduler"] = scheduler
+    coord.CONFIG["broadcast_fanout"] = 1
+    coord.CONFIG["max_cross_rack"] = max_cross_rack
+    key = coord._model_key_str({"name": "sim-topology"})
+    rank_key = coord._rank_key({})
+    nbytes = int(gib * (1 << 30))
+    params = {"w": {"addr": 0, "bytes": nbytes}}
+    state = coord._get_model_state(key)
+    order = [(r, n) for n in range(nodes_per_rack) for r in range(racks) if (r, n) != (0, 0)]
+    now = 0.0
+    busy_until: dict[str, float] = {}
+    queues: dict[str, list[str]] = {}
+    events: list[tuple[float, str]] = []
+    cross_bytes = 0
+    cross_transfers = 0
+    with state["lock"]:
+        coord._register(
+            key, rank_key, "src", "source", {}, params, {}, topology=_topology(0, 0, labels)
+        )
+        coord._mark_ready(key, rank_key, "src", "source")
+        for rack, node in order:
+            rid = f"r{rack}.{node}"
+            coord._register(
+                key,
+                rank_key,
+                rid,
+                "receiver",
+                {},
+                params,
+                {},
+                True,
+                topology=_topology(rack, node, labels),
+            )
+            coord._mark_ready(key, rank_key, rid, "receiver")
+        while True:
+            for source_id, tasks in state["pending"].items():
+                queues.setdefault(source_id, []).extend(t["transfer_id"] for t in tasks)
+                tasks.clear()
+            for source_id, queue in queues.items():
+                while queue and busy_until.get(source_id, 0.0) <= now:
+                    tid = queue.pop(0)
+                    # judge placement by the real racks, labels or not
+                    _, src, rid = state["transfer_peers"][tid]
+                    src_rack = 0 if src == "src" else int(src[1:].split(".")[0])
+                    cost = 1.0
+                    if src_rack != int(rid[1:].split(".")[0]):
+                        cross_bytes += nbytes
+                        cross_transfers += 1
+                        cost = cross_rack_cost
+                    busy_until[source_id] = now + cost
+                    heapq.heappush(events, (now + cost, tid))
+            if not events:
+                break
+            now, tid = heapq.heappop(events)
+            coord._complete_transfer(tid)
+        done = sum(1 for s in state["transfer_status"].values() if s == "done")
+    if done != len(order):
+        raise RuntimeError(f"only {done}/{len(order)} receivers finished")
+    return {
+        "time": now,
+        "cross_transfers": cross_transfers,
+        "cross_gib": cross_bytes / (1 << 30),
+        "total_gib": len(order) * nbytes / (1 << 30),
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="Simulate topology-aware source/receiver pairing")
+    p.add_argument("--racks", type=int, default=8)
+    p.add_argument("--nodes-per-rack", type=int, default=16)
+    p.add_argument("--gib", type=float, default=16.0, help="bytes per receiver (one rank)")
+    p.add_argument("--max-cross-rack", type=int, nargs="+", default=[0, 4])
+    p.add_argument(
+        "--cross-rack-cost",
+        type=float,
+        default=1.0,
+        help="time of a cross-rack transfer relative to one within a rack",
+    )
+    args = p.parse_args()
+
+    runs = [("single", "single", False, 0), ("broadcast", "broadcast", False, 0)]
+    runs += [
+        (f"topo cap={cap or '-'}", "broadcast", True, cap) for cap in args.max_cross_rack
+    ]
+    print(
+        f"{args.racks} racks x {args.nodes_per_rack} nodes, "
+        f"{args.gib:g} GiB per receiver, cross-rack cost {args.cross_rack_cost:g}"
+    )
+    print(f"{'scheduler':>14} {'time':>7} {'cross_xfers':>12} {'cross_GiB':>10} {'cross_%':>8}")
+    for name, scheduler, labels, cap in runs:
+        r = simulate(
+            args.racks,
+            args.nodes_per_rack,
+            scheduler,
+            labels,
+            cap,
+            args.gib,
+            args.cross_rack_cost,
+        )
+        print(
+            f"{name:>14} {r['time']:>7.1f} {r['cross_transfers']:>12} "
+            f"{r['cross_gib']:>10.0f} {100.0 * r['cross_gib'] / r['total_gib']:>7.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
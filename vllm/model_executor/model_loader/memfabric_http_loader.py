@@ -1,11 +1,15 @@
 # SPDX-License-Identifier: Apache-2.0
 # SPDX-FileCopyrightText: Copyright contributors to the vLLM project
+import http.client
 import json
 import os
 import socket
 import threading
 import time
-import urllib.request
+import urllib.error
+import urllib.parse
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from typing import Any
 
 import torch
@@ -16,23 +20,187 @@ from vllm.config.load import LoadConfig
 from vllm.logger import init_logger
 from vllm.model_executor.model_loader.base_loader import BaseModelLoader
 from vllm.model_executor.model_loader.default_loader import DefaultModelLoader
+from vllm.model_executor.model_loader.memfabric_metrics import (
+    METRICS,
+    format_labels,
+    start_exporter,
+)
+from vllm.model_executor.model_loader.memfabric_trace import TRACE, enable_from_config
+from vllm.model_executor.model_loader.memfabric_transfer import (
+    COMPACT_CONTENT_TYPE,
+    LayoutPlanCache,
+    TransferExecutor,
+    coalesce_ops,
+    covering_regions,
+    encode_params_compact,
+    group_ops_by_layer,
+    layout_fingerprint,
+    match_params,
+    match_reads,
+    params_from_wire,
+    split_by_layer,
+    wait_for_store,
+)
 
 logger = init_logger(__name__)
 
 
-def _http_post_json(url: str, payload: dict[str, Any], timeout_s: int = 5) -> dict:
-    data = json.dumps(payload).encode("utf-8")
-    req = urllib.request.Request(
-        url,
-        data=data,
-        headers={"Content-Type": "application/json"},
-        method="POST",
+# idle keep-alive connections to the coordinator, per (scheme, host, port)
+_CONN_LOCK = threading.Lock()
+_IDLE_CONNS: dict[tuple[str, str, int | None], list[http.client.HTTPConnection]] = {}
+_MAX_IDLE_CONNS = 16
+
+# what a failed coordinator request raises: connection errors, HTTPError for
+# >= 400, a malformed or short answer; background reporters log and go on
+_COORDINATOR_ERRORS = (OSError, http.client.HTTPException, RuntimeError, ValueError)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self._path = path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self._path)
+        self.sock = sock
+
+
+def _coordinator_url(extra: dict[str, Any]) -> str:
+    # with agent_socket, registry calls go through the node agent
+    # (memfabric_coord/node_agent.py) that merges the node's ranks
+    if extra.get("agent_socket"):
+        return "http+unix://" + urllib.parse.quote(str(extra["agent_socket"]), safe="")
+    coord = extra.get("coordinator_url")
+    if not coord:
+        raise ValueError("model_loader_extra_config.coordinator_url is required")
+    return str(coord)
+
+
+def _take_conn(
+    key: tuple[str, str, int | None], timeout_s: float
+) -> tuple[http.client.HTTPConnection, bool]:
+    with _CONN_LOCK:
+        idle = _IDLE_CONNS.get(key)
+        conn = idle.pop() if idle else None
+    if conn is None:
+        scheme, host, port = key
+        if scheme == "http+unix":
+            return _UnixHTTPConnection(host, timeout_s), False
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(host, port, timeout=timeout_s), False
+    conn.timeout = timeout_s
+    if conn.sock is not None:
+        conn.sock.settimeout(timeout_s)
+    return conn, True
+
+
+def _put_conn(key: tuple[str, str, int | None], conn: http.client.HTTPConnection) -> None:
+    with _CONN_LOCK:
+        idle = _IDLE_CONNS.setdefault(key, [])
+        if len(idle) < _MAX_IDLE_CONNS:
+            idle.append(conn)
+            return
+    conn.close()
+
+
+def _http_post(
+    url: str,
+    data: bytes,
+    content_type: str,
+    timeout_s: int = 5,
+    long_poll: bool = False,
+    span_name: str | None = None,
+    retry_s: float = 0,
+) -> dict:
+    """POST over a pooled keep-alive connection; raises HTTPError on >= 400.
+
+    Connection errors and 5xx answers (the coordinator restarting, a proxy
+    in front of it) are retried with backoff for up to retry_s seconds; a
+    stale idle connection is always retried once right away. The round trip
+    is recorded in METRICS unless the request may long-poll, and traced as
+    span_name (default: the last path segment).
+    """
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme == "http+unix":
+        key = (parts.scheme, urllib.parse.unquote(parts.netloc), None)
+    else:
+        key = (parts.scheme, parts.hostname or "", parts.port)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    METRICS.inc("coordinator_requests_total")
+    start = time.perf_counter()
+    deadline = time.monotonic() + retry_s
+    delay = 0.1
+    span = TRACE.span(
+        span_name or path.rsplit("/", 1)[-1], "wait" if long_poll else "control"
     )
-    with urllib.request.urlopen(req, timeout=timeout_s) as resp:
-        resp_data = resp.read().decode("utf-8")
+    with span as args:
+        while True:
+            conn, reused = _take_conn(key, timeout_s)
+            try:
+                conn.request(
+                    "POST", path, body=data, headers={"Content-Type": content_type}
+                )
+                resp = conn.getresponse()
+                resp_data = resp.read()
+            except (http.client.HTTPException, ConnectionError) as e:
+                conn.close()
+                # the coordinator may have closed an idle connection
+                if reused:
+                    METRICS.inc("coordinator_retries_total")
+                    continue
+                if time.monotonic() + delay > deadline:
+                    raise
+                logger.warning("coordinator %s failed, retrying in %.1fs: %s", path, delay, e)
+            except BaseException:
+                conn.close()
+                raise
+            else:
+                _put_conn(key, conn)
+                if resp.status < 500 or time.monotonic() + delay > deadline:
+                    break
+                logger.warning(
+                    "coordinator %s answered %d, retrying in %.1fs", path, resp.status, delay
+                )
+            METRICS.inc("coordinator_retries_total")
+            time.sleep(delay)
+            delay = min(delay * 2, 2.0)
+        args["status"] = resp.status
+    if not long_poll:
+        METRICS.observe("coordinator_rtt_seconds", time.perf_counter() - start)
+    if resp.status >= 400:
+        raise urllib.error.HTTPError(
+            url, resp.status, f"{resp.reason}: {resp_data[:200]!r}", resp.headers, None
+        )
     if not resp_data:
         return {}
-    return json.loads(resp_data)
+    return json.loads(resp_data.decode("utf-8"))
+
+
+def _http_post_json(
+    url: str,
+    payload: dict[str, Any],
+    timeout_s: int = 5,
+    long_poll: bool = False,
+    span_name: str | None = None,
+    retry_s: float = 0,
+) -> dict:
+    data = json.dumps(payload).encode("utf-8")
+    return _http_post(url, data, "application/json", timeout_s, long_poll, span_name, retry_s)
+
+
+def _retry_s(extra: dict[str, Any]) -> float:
+    # how long registry calls ride out an unreachable coordinator, e.g. a
+    # restart with --state-dir
+    return float(extra.get("coordinator_retry_s", 60))
+
+
+def _long_poll_http_timeout(long_poll_ms: int) -> int:
+    # the coordinator holds long-poll requests for up to timeout_ms
+    return max(long_poll_ms, 0) // 1000 + 10
 
 
 def _resolve_node_ip(extra: dict[str, Any]) -> str:
@@ -47,6 +215,17 @@ def _resolve_node_ip(extra: dict[str, Any]) -> str:
         return "127.0.0.1"
 
 
+def _resolve_topology(extra: dict[str, Any]) -> dict[str, str]:
+    # rack/switch labels for topology-aware pairing; pods usually share one
+    # extra config, so the env vars (set per node) are the common source
+    topology = {}
+    for label, env in (("rack", "VLLM_NODE_RACK"), ("switch", "VLLM_NODE_SWITCH")):
+        value = extra.get(label) or os.environ.get(env)
+        if value:
+            topology[label] = str(value)
+    return topology
+
+
 def _get_rank_info() -> dict[str, int]:
     rank = 0
     local_rank = 0
@@ -143,9 +322,57 @@ def _params_metadata(model: nn.Module) -> list[dict[str, Any]]:
     return params
 
 
-def _register_memory(engine: Any, params: list[dict[str, Any]]):
-    for p in params:
-        engine.register_memory(int(p["addr"]), int(p["bytes"]))
+def _transfer_mode(extra: dict[str, Any]) -> str:
+    mode = str(extra.get("mode", "push")).lower()
+    if mode not in ("push", "pull"):
+        raise ValueError("model_loader_extra_config.mode must be push or pull")
+    return mode
+
+
+def _register_memory(
+    engine: Any, params: list[dict[str, Any]], extra: dict[str, Any]
+) -> dict[str, Any]:
+    start = time.perf_counter()
+    if extra.get("register_regions", True):
+        regions = covering_regions(params, int(extra.get("register_align_bytes", 0)))
+    else:
+        regions = [(int(p["addr"]), int(p["bytes"])) for p in params]
+    with TRACE.span("register_memory", "register", regions=len(regions)):
+        for addr, size in regions:
+            with TRACE.span("register_region", "register", bytes=size):
+                ret = engine.register_memory(addr, size)
+            if ret not in (None, 0):
+                raise RuntimeError(f"register_memory failed ret={ret} addr={hex(addr)}")
+    register_ms = (time.perf_counter() - start) * 1000.0
+    METRICS.observe("register_memory_seconds", register_ms / 1000.0)
+    metrics = {
+        "register_calls": len(regions),
+        "register_params": len(params),
+        "register_bytes": sum(size for _, size in regions),
+        "register_ms": register_ms,
+    }
+    logger.info(
+        "memfabric registered regions=%d params=%d bytes=%d ms=%.1f",
+        len(regions),
+        len(params),
+        metrics["register_bytes"],
+        register_ms,
+    )
+    return metrics
+
+
+def _log_fan_out(peers: int, nbytes: int, elapsed: float) -> None:
+    """Log the aggregate egress of transfers to several peers that ran
+    concurrently; shows when the source NIC saturates."""
+    if peers <= 1:
+        return
+    logger.info(
+        "transfer fan-out peers=%d bytes=%d ms=%.1f egress=%.2f GiB/s",
+        peers,
+        nbytes,
+        elapsed * 1000.0,
+        nbytes / (1 << 30) / max(elapsed, 1e-6),
+    )
 
 
 def _initialize_engine(extra: dict[str, Any], my_id: str, npu_id: int, role: str):
@@ -164,23 +391,126 @@ def _initialize_engine(extra: dict[str, Any], my_id: str, npu_id: int, role: str
         raise ValueError("model_loader_extra_config.store_url is required")
     set_log_level(int(extra.get("log_level", 1)))
     set_conf_store_tls(False, "")
-    create_config_store(store_url)
-    time.sleep(1)
+    with TRACE.span("create_config_store", "engine"):
+        create_config_store(store_url)
+    with TRACE.span("wait_for_store", "engine"):
+        waited = wait_for_store(store_url, float(extra.get("store_ready_timeout_s", 60)))
+    logger.info("memfabric config store ready ms=%.1f", waited * 1000.0)
 
     engine = TransferEngine()
     op_type = TransferEngine.TransDataOpType.DEVICE_RDMA
-    ret = engine.initialize(store_url, my_id, role, int(npu_id), op_type)
+    with TRACE.span("engine.initialize", "engine"):
+        ret = engine.initialize(store_url, my_id, role, int(npu_id), op_type)
     if ret != 0:
         raise RuntimeError(f"TransferEngine initialize failed ret={ret}")
     return engine
 
 
+class _ProgressReporter:
+    """Sends layer progress of running transfers from a background thread,
+    so transfers never wait on the coordinator. Reports that pile up while a
+    request is out are merged and sent as one batch of progress ops."""
+
+    def __init__(self, send: Callable[[list[dict[str, Any]]], Any]):
+        self._send = send
+        self._lock = threading.Lock()
+        self._pending: dict[str, dict[str, Any]] = {}
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, daemon=True, name="memfabric-progress"
+        )
+        self._thread.start()
+
+    def report(self, task: dict[str, Any], layer_group: int, bytes_done: int) -> None:
+        # lets the receiver's /wait see per-layer and byte progress before
+        # /complete
+        if not task.get("transfer_id"):
+            return
+        with self._lock:
+            op = self._pending.setdefault(
+                task["transfer_id"],
+                {"op": "progress", "transfer_id": task["transfer_id"], "layers_done": []},
+            )
+            op["layers_done"].append(layer_group)
+            op["bytes_done"] = bytes_done
+        self._wake.set()
+
+    def close(self) -> None:
+        """Send what is still queued and stop the thread."""
+        with self._lock:
+            self._closed = True
+        self._wake.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                ops = list(self._pending.values())
+                self._pending.clear()
+                closed = self._closed
+            if ops:
+                try:
+                    self._send(ops)
+                except _COORDINATOR_ERRORS as e:
+                    logger.warning("layer progress report failed: %s", e)
+            if closed:
+                return
+
+
 class MemfabricHttpLoader(BaseModelLoader):
     """Load weights by coordinating memfabric D2D transfers via an HTTP control plane."""
 
     def __init__(self, load_config: LoadConfig):
         super().__init__(load_config)
         self._default_loader = DefaultModelLoader(load_config)
+        # receiver-side layer streaming state, see wait_for_layer
+        self._layer_lock = threading.Lock()
+        self._layer_events: dict[int, threading.Event] = {}
+        self._layer_callbacks: list[Callable[[int], None]] = []
+        self._layers_ready: set[int] = set()
+        self._load_start: float | None = None
+        self._first_layer_ms: float | None = None
+        # source-side plans per receiver layout hash
+        self._plan_cache = LayoutPlanCache()
+
+    def add_layer_ready_callback(self, callback: Callable[[int], None]) -> None:
+        """Call callback(layer_group) as each layer group lands on this receiver.
+
+        layer_group is the decoder layer index, -1 for non-layer params.
+        """
+        with self._layer_lock:
+            self._layer_callbacks.append(callback)
+            ready = sorted(self._layers_ready)
+        for group in ready:
+            callback(group)
+
+    def wait_for_layer(self, layer_group: int, timeout: float | None = None) -> bool:
+        """Block until layer_group has been transferred to this receiver."""
+        with self._layer_lock:
+            event = self._layer_events.setdefault(layer_group, threading.Event())
+        return event.wait(timeout)
+
+    def _mark_layers_ready(self, groups: list[int]) -> None:
+        with self._layer_lock:
+            new = [g for g in groups if g not in self._layers_ready]
+            if not new:
+                return
+            self._layers_ready.update(new)
+            if self._first_layer_ms is None and self._load_start is not None:
+                self._first_layer_ms = (time.perf_counter() - self._load_start) * 1000.0
+                logger.info(
+                    "memfabric first layer group ready ms=%.1f", self._first_layer_ms
+                )
+            for g in new:
+                self._layer_events.setdefault(g, threading.Event()).set()
+                TRACE.instant("layer_ready", "load", group=g)
+            callbacks = list(self._layer_callbacks)
+        for g in sorted(new):
+            for callback in callbacks:
+                callback(g)
 
     def download_model(self, model_config: ModelConfig) -> None:
         # For source side, allow optional download.
@@ -192,6 +522,44 @@ class MemfabricHttpLoader(BaseModelLoader):
             raise ValueError("model_loader_extra_config must be a dict")
         return extra
 
+    def _batch(
+        self,
+        *,
+        vllm_config: VllmConfig,
+        model_config: ModelConfig,
+        my_id: str,
+        role: str,
+        ops: list[dict[str, Any]],
+        timeout_s: int = 5,
+    ) -> list[dict[str, Any]]:
+        """Run ops in one /v1/registry/batch round trip and return their results.
+
+        model_key, my_id, rank_info and role are sent once for all ops. A
+        failing op raises HTTPError with its code, like the single-op routes.
+        """
+        extra = self._get_extra()
+        url = f"{_coordinator_url(extra)}/v1/registry/batch"
+        payload = {
+            "model_key": _build_model_key(vllm_config, model_config),
+            "my_id": my_id,
+            "rank_info": _get_rank_info(),
+            "role": role,
+            "ops": ops,
+        }
+        long_poll = any(op.get("timeout_ms") for op in ops if op["op"] in ("poll", "wait"))
+        span_name = "batch:" + "+".join(op["op"] for op in ops)
+        results = _http_post_json(
+            url, payload, timeout_s, long_poll, span_name, _retry_s(extra)
+        ).get("results", [])
+        for op, result in zip(ops, results):
+            if result["code"] >= 400:
+                raise urllib.error.HTTPError(
+                    url, result["code"], f"{op['op']}: {result['result']}", None, None
+                )
+        if len(results) != len(ops):
+            raise RuntimeError(f"batch answered {len(results)} of {len(ops)} ops")
+        return [r["result"] for r in results]
+
     def _register_to_coordinator(
         self,
         *,
@@ -201,23 +569,102 @@ class MemfabricHttpLoader(BaseModelLoader):
         my_id: str,
         npu_id: int,
         params: list[dict[str, Any]],
+        metrics: dict[str, Any] | None = None,
     ) -> dict:
+        """Register params and report ready, in one round trip where possible."""
         extra = self._get_extra()
-        coord = extra.get("coordinator_url")
-        if not coord:
-            raise ValueError("model_loader_extra_config.coordinator_url is required")
+        coord = _coordinator_url(extra)
         node_ip = _resolve_node_ip(extra)
-        rank_info = _get_rank_info()
-        payload = {
-            "role": role,
-            "model_key": _build_model_key(vllm_config, model_config),
+        register = {
             "node_ip": node_ip,
-            "my_id": my_id,
+            "topology": _resolve_topology(extra),
             "npu_id": npu_id,
-            "rank_info": rank_info,
-            "params": params,
+            "metrics": metrics or {},
+            # lets the broadcast scheduler promote this receiver to a source
+            "can_serve": role == "receiver" and bool(extra.get("serve_after_load", True)),
+            "mode": _transfer_mode(extra),
         }
-        return _http_post_json(f"{coord}/v1/registry/register", payload)
+        # cross-model release order when the coordinator caps active transfers
+        for name in ("priority", "weight"):
+            if extra.get(name) is not None:
+                register[name] = extra[name]
+        ready = {"op": "ready"}
+        register_op = dict(register, op="register")
+        batch = {
+            "vllm_config": vllm_config,
+            "model_config": model_config,
+            "my_id": my_id,
+            "role": role,
+        }
+        if extra.get("layout_cache", True):
+            register_op["layout_hash"] = layout_fingerprint(params)
+            try:
+                # layout already known to the coordinator: addresses suffice
+                addrs = [int(p["addr"]) for p in params]
+                return self._batch(ops=[dict(register_op, addrs=addrs), ready], **batch)[0]
+            except urllib.error.HTTPError as e:
+                if e.code != 409:
+                    raise
+                METRICS.inc("registration_retries_total")
+        if extra.get("registration_format", "json") == "compact":
+            # name table + packed addr/size arrays instead of per-param JSON
+            # register_op minus "op": layout_hash lets later ranks of this
+            # layout register by address only
+            payload = {
+                "role": role,
+                "model_key": _build_model_key(vllm_config, model_config),
+                "my_id": my_id,
+                "rank_info": _get_rank_info(),
+                **{k: v for k, v in register_op.items() if k != "op"},
+            }
+            body = encode_params_compact(payload, params)
+            resp = _http_post(
+                f"{coord}/v1/registry/register",
+                body,
+                COMPACT_CONTENT_TYPE,
+                retry_s=_retry_s(extra),
+            )
+            self._batch(ops=[ready], **batch)
+            return resp
+        return self._batch(ops=[dict(register_op, params=params), ready], **batch)[0]
+
+    def _start_heartbeat(
+        self,
+        *,
+        vllm_config: VllmConfig,
+        model_config: ModelConfig,
+        my_id: str,
+        role: str,
+    ) -> threading.Event:
+        """Keep my_id alive on the coordinator (participant_ttl_s) until the
+        returned event is set; heartbeat_interval_s=0 disables. Heartbeats
+        carry METRICS, and a last one goes out when the event is set."""
+        stop = threading.Event()
+        interval = float(self._get_extra().get("heartbeat_interval_s", 30))
+        if interval <= 0:
+            return stop
+
+        def _run():
+            while True:
+                stopped = stop.wait(interval)
+                try:
+                    resp = self._batch(
+                        vllm_config=vllm_config,
+                        model_config=model_config,
+                        my_id=my_id,
+                        role=role,
+                        ops=[{"op": "heartbeat", "loader_metrics": METRICS.snapshot()}],
+                    )[0]
+                except _COORDINATOR_ERRORS as e:
+                    logger.warning("memfabric heartbeat failed: %s", e)
+                    resp = {}
+                if not resp.get("known", True):
+                    logger.warning("memfabric %s was evicted by the coordinator", my_id)
+                if stopped:
+                    return
+
+        threading.Thread(target=_run, daemon=True, name="memfabric-heartbeat").start()
+        return stop
 
     def _poll_tasks(
         self,
@@ -225,17 +672,59 @@ class MemfabricHttpLoader(BaseModelLoader):
         vllm_config: VllmConfig,
         model_config: ModelConfig,
         my_id: str,
+        role: str = "source",
+        completed: list[str] | None = None,
+        long_poll_ms: int | None = None,
     ) -> list[dict[str, Any]]:
-        extra = self._get_extra()
-        coord = extra.get("coordinator_url")
-        payload = {
-            "role": "source",
-            "model_key": _build_model_key(vllm_config, model_config),
-            "my_id": my_id,
-            "rank_info": _get_rank_info(),
-        }
-        resp = _http_post_json(f"{coord}/v1/registry/poll", payload)
-        return resp.get("tasks", [])
+        """Long-poll for tasks, first completing the transfers in completed.
+
+        long_poll_ms defaults to the extra config's; 0 returns right away.
+        """
+        if long_poll_ms is None:
+            long_poll_ms = int(self._get_extra().get("long_poll_ms", 30000))
+        ops = [{"op": "complete", "transfer_ids": completed}] if completed else []
+        ops.append(
+            {
+                "op": "poll",
+                "timeout_ms": long_poll_ms,
+                # tasks for these receiver layouts only need dst addresses
+                "layouts_known": self._plan_cache.known(),
+            }
+        )
+        results = self._batch(
+            vllm_config=vllm_config,
+            model_config=model_config,
+            my_id=my_id,
+            role=role,
+            ops=ops,
+            timeout_s=_long_poll_http_timeout(long_poll_ms),
+        )
+        return results[-1].get("tasks", [])
+
+    def _query_wait(
+        self,
+        *,
+        vllm_config: VllmConfig,
+        model_config: ModelConfig,
+        my_id: str,
+        long_poll_ms: int,
+        layers_seen: int | None = None,
+        completed: list[str] | None = None,
+    ) -> dict[str, Any]:
+        ops = [{"op": "complete", "transfer_ids": completed}] if completed else []
+        wait = {"op": "wait", "timeout_ms": long_poll_ms}
+        if layers_seen is not None:
+            wait["layers_seen"] = layers_seen
+        ops.append(wait)
+        results = self._batch(
+            vllm_config=vllm_config,
+            model_config=model_config,
+            my_id=my_id,
+            role="receiver",
+            ops=ops,
+            timeout_s=_long_poll_http_timeout(long_poll_ms),
+        )
+        return results[-1]
 
     def _wait_done(
         self,
@@ -244,53 +733,200 @@ class MemfabricHttpLoader(BaseModelLoader):
         model_config: ModelConfig,
         my_id: str,
         timeout_s: int,
-    ) -> None:
+    ) -> dict[str, Any]:
         extra = self._get_extra()
-        coord = extra.get("coordinator_url")
+        long_poll_ms = int(extra.get("long_poll_ms", 30000))
+        log_interval = float(extra.get("progress_log_interval_s", 5))
         start = time.time()
+        logged = start
         while True:
-            payload = {
-                "role": "receiver",
-                "model_key": _build_model_key(vllm_config, model_config),
-                "my_id": my_id,
-                "rank_info": _get_rank_info(),
-            }
-            resp = _http_post_json(f"{coord}/v1/registry/wait", payload, timeout_s=10)
+            resp = self._query_wait(
+                vllm_config=vllm_config,
+                model_config=model_config,
+                my_id=my_id,
+                long_poll_ms=long_poll_ms,
+                layers_seen=len(self._layers_ready),
+            )
+            self._mark_layers_ready(resp.get("layers_ready", []))
             if resp.get("status") == "done":
-                return
+                return resp
+            now = time.time()
+            if log_interval > 0 and now - logged >= log_interval:
+                logged = now
+                self._log_receiver_progress(resp)
             if time.time() - start > timeout_s:
                 raise TimeoutError("wait for transfer done timed out")
-            time.sleep(float(extra.get("poll_interval_s", 2)))
+            if long_poll_ms <= 0:
+                time.sleep(float(extra.get("poll_interval_s", 2)))
+
+    @staticmethod
+    def _log_receiver_progress(resp: dict[str, Any]) -> None:
+        # bytes and rate as reported by the sources; no rate means nothing
+        # sent yet or no report for a while, i.e. not started or stuck
+        total = resp.get("bytes_total") or 0
+        eta = resp.get("eta_s")
+        logger.info(
+            "memfabric receiver progress bytes=%d/%d (%.0f%%) throughput=%s eta=%s",
+            resp.get("bytes_done", 0),
+            total,
+            100.0 * resp.get("bytes_done", 0) / total if total else 0.0,
+            f"{resp['gibps']:.2f} GiB/s" if resp.get("gibps") else "-",
+            f"{eta:.0f}s" if eta is not None else "-",
+        )
+
+    def _transfer_one(
+        self,
+        executor: TransferExecutor,
+        task: dict[str, Any],
+        local_params: dict[str, dict[str, Any]],
+        on_layer_done: Callable[[dict[str, Any], int, int], None] | None = None,
+    ) -> dict[str, Any]:
+        extra = self._get_extra()
+        coalesce = bool(extra.get("transfer_coalesce", True))
+        log_interval = float(extra.get("progress_log_interval_s", 5))
+        chunk_bytes = int(extra.get("transfer_chunk_bytes", 1 << 30))
+        peer_id = task["peer_id"]
+        transfer_id = task.get("transfer_id")
+        is_read = task.get("op") == "read"
+        if is_read:
+            ops = match_reads(local_params, params_from_wire(task.get("src_params", {})))
+        else:
+            dst_wire = task.get("dst_params", {})
+            ops = self._plan_cache.match(local_params, dst_wire.get("__columns__", {}))
+            if ops is None:
+                ops = match_params(local_params, params_from_wire(dst_wire))
+        run = executor.read if is_read else executor.write
+        # layer order lets receivers use early layers while later ones land;
+        # coalescing then only merges params within a layer group
+        if extra.get("layer_order", True):
+            groups = group_ops_by_layer(ops)
+        else:
+            groups = [(None, ops)]
+        nparams = len(ops)
+        total_bytes = sum(op.size for op in ops)
+        calls = 0
+        nbytes = 0
+        errors = []
+        start = time.perf_counter()
+        logged = start
+        span = TRACE.span(
+            "transfer_task", "load", peer=peer_id, transfer_id=transfer_id, bytes=total_bytes
+        )
+        with span:
+            for i, (group, group_ops) in enumerate(groups):
+                if coalesce:
+                    group_ops = coalesce_ops(group_ops, chunk_bytes)
+                errors = run(peer_id, group_ops)
+                calls += len(group_ops)
+                nbytes += sum(op.size for op in group_ops)
+                if errors:
+                    break
+                # the last group is covered by /complete
+                if group is not None and on_layer_done is not None and i < len(groups) - 1:
+                    on_layer_done(task, group, nbytes)
+                now = time.perf_counter()
+                if log_interval > 0 and now - logged >= log_interval and i < len(groups) - 1:
+                    logged = now
+                    logger.info(
+                        "transfer progress peer=%s bytes=%d/%d throughput=%.2f GiB/s",
+                        peer_id,
+                        nbytes,
+                        total_bytes,
+                        nbytes / (1 << 30) / max(now - start, 1e-6),
+                    )
+        elapsed = time.perf_counter() - start
+        METRICS.inc("transfers_total")
+        if errors:
+            METRICS.inc("transfer_errors_total")
+        else:
+            METRICS.inc("transfer_bytes_total", nbytes)
+            METRICS.observe("transfer_seconds", elapsed)
+            METRICS.observe("transfer_bytes", nbytes)
+        logger.debug(
+            "transfer plan peer=%s op=%s params=%d groups=%d calls=%d",
+            peer_id,
+            "read" if is_read else "write",
+            nparams,
+            len(groups),
+            calls,
+        )
+        stats = {
+            "peer_id": peer_id,
+            "transfer_id": transfer_id,
+            "calls": calls,
+            "bytes": nbytes,
+            "ms": elapsed * 1000.0,
+            "errors": errors,
+        }
+        if errors:
+            for err in errors:
+                logger.error(
+                    "transfer failed peer=%s %s name=%s", peer_id, err.error, err.op.name
+                )
+            return stats
+        logger.info(
+            "transfer peer=%s bytes=%d calls=%d ms=%.1f throughput=%.2f GiB/s",
+            peer_id,
+            stats["bytes"],
+            stats["calls"],
+            stats["ms"],
+            stats["bytes"] / (1 << 30) / max(elapsed, 1e-6),
+        )
+        return stats
 
     def _transfer_tasks(
         self,
-        engine: Any,
+        executor: TransferExecutor,
         tasks: list[dict[str, Any]],
         local_params: dict[str, dict[str, Any]],
-    ) -> None:
+        peer_pool: ThreadPoolExecutor | None = None,
+        on_layer_done: Callable[[dict[str, Any], int, int], None] | None = None,
+    ) -> list[dict[str, Any]]:
+        """Run tasks and return per-task stats; the caller completes their
+        transfer_ids with its next /poll or /wait batch."""
+        valid = []
         for task in tasks:
-            peer_id = task.get("peer_id")
-            if not peer_id:
+            if not task.get("peer_id"):
                 logger.warning("task missing peer_id, skip")
                 continue
-            dst_params = task.get("dst_params", {})
-            transfer_id = task.get("transfer_id")
-            for name, meta in local_params.items():
-                if name not in dst_params:
-                    continue
-                dst = dst_params[name]
-                src_addr = int(meta["addr"])
-                dst_addr = int(dst["addr"])
-                size = int(meta["bytes"])
-                ret = engine.transfer_sync_write(peer_id, src_addr, dst_addr, size)
-                if ret != 0:
-                    logger.error("transfer failed ret=%s name=%s", ret, name)
-                    raise RuntimeError(f"transfer failed ret={ret} name={name}")
-            if transfer_id:
+            valid.append(task)
+        start = time.perf_counter()
+        if peer_pool is None or len(valid) <= 1:
+            results = [
+                self._transfer_one(executor, t, local_params, on_layer_done)
+                for t in valid
+            ]
+        else:
+            # different peers are served concurrently, capped by the pool size
+            futures = [
+                peer_pool.submit(
+                    self._transfer_one, executor, t, local_params, on_layer_done
+                )
+                for t in valid
+            ]
+            results = [f.result() for f in futures]
+        _log_fan_out(
+            len(results),
+            sum(r["bytes"] for r in results if not r["errors"]),
+            time.perf_counter() - start,
+        )
+        failed = [r for r in results if r["errors"]]
+        if failed:
+            # transfers that did land are still completed before failing
+            done = [r["transfer_id"] for r in results if r["transfer_id"] and not r["errors"]]
+            if done:
                 extra = self._get_extra()
-                coord = extra.get("coordinator_url")
-                payload = {"transfer_id": transfer_id}
-                _http_post_json(f"{coord}/v1/registry/complete", payload)
+                _http_post_json(
+                    f"{_coordinator_url(extra)}/v1/registry/complete",
+                    {"transfer_ids": done},
+                    retry_s=_retry_s(extra),
+                )
+            first = failed[0]["errors"][0]
+            raise RuntimeError(
+                f"transfer failed ret={first.ret} name={first.op.name} "
+                f"failed_peers={len(failed)}"
+            )
+        return results
 
     def load_weights(self, model: nn.Module, model_config: ModelConfig) -> None:
         extra = self._get_extra()
@@ -308,17 +944,30 @@ class MemfabricHttpLoader(BaseModelLoader):
         npu_id = _get_npu_id(extra)
         params = _params_metadata(model)
         local_params = {p["name"]: p for p in params}
+        if extra.get("params_metadata_path"):
+            # offline input for memfabric_transfer.py plan reports
+            with open(str(extra["params_metadata_path"]), "w", encoding="utf-8") as f:
+                json.dump(params, f)
 
+        enable_from_config(extra, my_id, role, rank_info["rank"])
         memfabric_role = extra.get("memfabric_role")
         if memfabric_role is None:
             memfabric_role = "Prefill" if role == "source" else "Decode"
-        engine = _initialize_engine(extra, my_id, npu_id, memfabric_role)
-        _register_memory(engine, params)
+        with TRACE.span("initialize_engine", "engine"):
+            engine = _initialize_engine(extra, my_id, npu_id, memfabric_role)
+        startup_metrics = _register_memory(engine, params, extra)
         try:
             torch.npu.synchronize()
         except Exception:
             pass
 
+        if extra.get("metrics_port"):
+            # one exporter per rank process, on consecutive ports
+            start_exporter(
+                int(extra["metrics_port"]) + rank_info["local_rank"],
+                format_labels({"my_id": my_id, "role": role}),
+            )
+        start = time.perf_counter()
         self._register_to_coordinator(
             role=role,
             vllm_config=vllm_config,
@@ -326,35 +975,320 @@ class MemfabricHttpLoader(BaseModelLoader):
             my_id=my_id,
             npu_id=npu_id,
             params=params,
+            metrics=startup_metrics,
         )
+        METRICS.observe("coordinator_register_seconds", time.perf_counter() - start)
+        heartbeat = self._start_heartbeat(
+            vllm_config=vllm_config, model_config=model_config, my_id=my_id, role=role
+        )
+        try:
+            self._transfer_weights(
+                engine,
+                role=role,
+                vllm_config=vllm_config,
+                model_config=model_config,
+                my_id=my_id,
+                local_params=local_params,
+                heartbeat=heartbeat,
+            )
+        except BaseException:
+            heartbeat.set()
+            raise
+        finally:
+            # a serving source flushes again when it stops, and at exit
+            TRACE.flush()
 
+    def _transfer_weights(
+        self,
+        engine: Any,
+        *,
+        role: str,
+        vllm_config: VllmConfig,
+        model_config: ModelConfig,
+        my_id: str,
+        local_params: dict[str, dict[str, Any]],
+        heartbeat: threading.Event,
+    ) -> None:
+        """Run this rank's side of the transfer after registration; heartbeat
+        is set once the coordinator no longer needs to hear from it."""
+        extra = self._get_extra()
+        pull = _transfer_mode(extra) == "pull"
         if role == "receiver":
             timeout_s = int(extra.get("poll_timeout_s", 1800))
-            self._wait_done(
+            self._load_start = time.perf_counter()
+            if pull:
+                self._pull_weights(
+                    engine,
+                    vllm_config=vllm_config,
+                    model_config=model_config,
+                    my_id=my_id,
+                    local_params=local_params,
+                    timeout_s=timeout_s,
+                )
+                self._log_receiver_done()
+                # promoted pull receivers are read from and need no poll
+                # thread, only the heartbeat
+                if not extra.get("serve_after_load", True):
+                    heartbeat.set()
+                return
+            resp = self._wait_done(
                 vllm_config=vllm_config,
                 model_config=model_config,
                 my_id=my_id,
                 timeout_s=timeout_s,
             )
+            self._log_receiver_done()
+            if resp.get("serve"):
+                # broadcast scheduler promoted this receiver to a source
+                logger.info("memfabric receiver %s promoted to source", my_id)
+                self._start_serving(
+                    engine,
+                    vllm_config=vllm_config,
+                    model_config=model_config,
+                    my_id=my_id,
+                    local_params=local_params,
+                    heartbeat=heartbeat,
+                )
+            else:
+                heartbeat.set()
             return
 
-        # role == source
-        poll_interval = float(extra.get("poll_interval_s", 2))
-        timeout_s = int(extra.get("poll_timeout_s", 1800))
+        if pull:
+            # receivers read from this source; nothing to poll for
+            logger.info("memfabric source %s registered for pull mode", my_id)
+            return
+        self._start_serving(
+            engine,
+            vllm_config=vllm_config,
+            model_config=model_config,
+            my_id=my_id,
+            local_params=local_params,
+            heartbeat=heartbeat,
+        )
 
-        def _run():
-            start = time.time()
+    def _log_receiver_done(self) -> None:
+        total_ms = (time.perf_counter() - self._load_start) * 1000.0
+        first_ms = self._first_layer_ms if self._first_layer_ms is not None else total_ms
+        logger.info(
+            "memfabric receiver load ms=%.1f first_layer_ms=%.1f layer_groups=%d",
+            total_ms,
+            first_ms,
+            len(self._layers_ready),
+        )
+
+    def _pull_weights(
+        self,
+        engine: Any,
+        *,
+        vllm_config: VllmConfig,
+        model_config: ModelConfig,
+        my_id: str,
+        local_params: dict[str, dict[str, Any]],
+        timeout_s: int,
+    ) -> None:
+        """Receiver side of pull mode: read assigned stripes from their sources."""
+        extra = self._get_extra()
+        executor = TransferExecutor(engine, int(extra.get("max_inflight", 1)), TRACE)
+        start = time.time()
+        try:
             while True:
                 tasks = self._poll_tasks(
-                    vllm_config=vllm_config, model_config=model_config, my_id=my_id
+                    vllm_config=vllm_config,
+                    model_config=model_config,
+                    my_id=my_id,
+                    role="receiver",
                 )
+                completed = []
                 if tasks:
-                    self._transfer_tasks(engine, tasks, local_params)
+                    # a layer group is ready once every stripe holding it is read
+                    outstanding: dict[int, int] = {}
+                    for task in tasks:
+                        for group, _ in split_by_layer(task.get("src_params", {})):
+                            outstanding[group] = outstanding.get(group, 0) + 1
+                    count_lock = threading.Lock()
+
+                    def _on_layer_done(
+                        task: dict[str, Any],
+                        group: int,
+                        _: int,
+                        outstanding: dict[int, int] = outstanding,
+                        count_lock: threading.Lock = count_lock,
+                    ) -> None:
+                        with count_lock:
+                            outstanding[group] -= 1
+                            if outstanding[group] > 0:
+                                return
+                        self._mark_layers_ready([group])
+
+                    # stripes from different sources are read in parallel
+                    workers = int(extra.get("max_concurrent_peers", len(tasks)))
+                    with ThreadPoolExecutor(
+                        max_workers=max(1, workers), thread_name_prefix="memfabric-pull"
+                    ) as pool:
+                        results = self._transfer_tasks(
+                            executor, tasks, local_params, pool, _on_layer_done
+                        )
+                    completed = [r["transfer_id"] for r in results if r["transfer_id"]]
+                resp = self._query_wait(
+                    vllm_config=vllm_config,
+                    model_config=model_config,
+                    my_id=my_id,
+                    long_poll_ms=0,
+                    completed=completed,
+                )
+                self._mark_layers_ready(resp.get("layers_ready", []))
+                if resp.get("status") == "done":
+                    return
                 if time.time() - start > timeout_s:
+                    raise TimeoutError("pull transfer timed out")
+        finally:
+            executor.close()
+
+    def _start_serving(
+        self,
+        engine: Any,
+        *,
+        vllm_config: VllmConfig,
+        model_config: ModelConfig,
+        my_id: str,
+        local_params: dict[str, dict[str, Any]],
+        heartbeat: threading.Event | None = None,
+    ) -> None:
+        extra = self._get_extra()
+        poll_interval = float(extra.get("poll_interval_s", 2))
+        long_poll_ms = int(extra.get("long_poll_ms", 30000))
+        timeout_s = int(extra.get("poll_timeout_s", 1800))
+        executor = TransferExecutor(engine, int(extra.get("max_inflight", 1)), TRACE)
+        # different peers are served concurrently, at most max_peers at a time
+        max_peers = max(1, int(extra.get("max_concurrent_peers", 1)))
+        peer_pool = ThreadPoolExecutor(
+            max_workers=max_peers, thread_name_prefix="memfabric-peer"
+        )
+        progress = _ProgressReporter(
+            lambda ops: self._batch(
+                vllm_config=vllm_config,
+                model_config=model_config,
+                my_id=my_id,
+                role="source",
+                ops=ops,
+            )
+        )
+
+        def _complete(transfer_ids: list[str]) -> None:
+            _http_post_json(
+                f"{_coordinator_url(extra)}/v1/registry/complete",
+                {"transfer_ids": transfer_ids},
+                retry_s=_retry_s(extra),
+            )
+
+        completed: list[str] = []
+        running: dict[Future, dict[str, Any]] = {}
+        # aggregate egress of the current fan-out: from the first submit
+        # while idle until running drains again
+        fan_out = {"start": 0.0, "peers": 0, "bytes": 0}
+
+        def _land(futures: set[Future]) -> int:
+            """Take finished transfers out of running and queue the ones that
+            landed for completion; returns how many failed."""
+            failed = 0
+            for future in futures:
+                task = running.pop(future)
+                fan_out["peers"] += 1
+                try:
+                    stats = future.result()
+                except Exception:
+                    logger.exception("transfer to peer=%s failed", task["peer_id"])
+                    failed += 1
+                    continue
+                if stats["errors"]:
+                    failed += 1
+                    continue
+                fan_out["bytes"] += stats["bytes"]
+                if stats["transfer_id"]:
+                    completed.append(stats["transfer_id"])
+            if not running and fan_out["peers"]:
+                _log_fan_out(
+                    fan_out["peers"], fan_out["bytes"], time.perf_counter() - fan_out["start"]
+                )
+                fan_out.update(peers=0, bytes=0)
+            return failed
+
+        def _serve():
+            start = time.time()
+            while True:
+                expired = time.time() - start > timeout_s
+                if not expired and len(running) < max_peers:
+                    # long-poll only when idle; with transfers running just
+                    # pick up what is queued and go back to waiting on them
+                    tasks = self._poll_tasks(
+                        vllm_config=vllm_config,
+                        model_config=model_config,
+                        my_id=my_id,
+                        completed=completed,
+                        long_poll_ms=0 if running else long_poll_ms,
+                    )
+                    completed.clear()
+                    for task in tasks:
+                        if not task.get("peer_id"):
+                            logger.warning("task missing peer_id, skip")
+                            continue
+                        if not running:
+                            fan_out["start"] = time.perf_counter()
+                        future = peer_pool.submit(
+                            self._transfer_one,
+                            executor,
+                            task,
+                            local_params,
+                            progress.report,
+                        )
+                        running[future] = task
+                if running:
+                    # each transfer is completed with the next poll after it
+                    # lands, not after the slowest peer polled with it
+                    done, _ = wait(
+                        running,
+                        timeout=None if len(running) >= max_peers else poll_interval,
+                        return_when=FIRST_COMPLETED,
+                    )
+                    failed = _land(done)
+                    if failed:
+                        raise RuntimeError(f"{failed} transfer(s) failed")
+                    continue
+                if expired:
                     return
-                time.sleep(poll_interval)
+                if long_poll_ms <= 0:
+                    time.sleep(poll_interval)
+
+        def _run():
+            try:
+                _serve()
+            except Exception:
+                # the coordinator has no way to fail a transfer: finish what is
+                # in flight, complete what landed and stop the heartbeat, so
+                # participant_ttl_s evicts this source and its unfinished
+                # receivers are handed to another one
+                logger.exception(
+                    "memfabric source %s stopped serving, in flight=%d",
+                    my_id,
+                    len(running),
+                )
+                _land(wait(running)[0])
+            finally:
+                if completed:
+                    try:
+                        _complete(completed)
+                    except _COORDINATOR_ERRORS as e:
+                        logger.warning(
+                            "memfabric complete of %d transfers failed: %s", len(completed), e
+                        )
+                executor.close()
+                peer_pool.shutdown()
+                progress.close()
+                if heartbeat is not None:
+                    heartbeat.set()
+                TRACE.flush()
 
-        t = threading.Thread(target=_run, daemon=True)
+        t = threading.Thread(target=_run, daemon=True, name="memfabric-serve")
         t.start()
 
     def load_model(
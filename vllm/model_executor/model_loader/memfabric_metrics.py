@@ -0,0 +1,160 @@
+# SPDX-License-Identifier: Apache-2.0
+# SPDX-FileCopyrightText: Copyright contributors to the vLLM project
+"""Counters and histograms of the memfabric HTTP loader.
+
+Stdlib only, like memfabric_transfer. The loader pushes ``METRICS.snapshot()``
+to the coordinator with its heartbeats, which serves them on its /metrics;
+with ``metrics_port`` set it also serves them itself in the Prometheus text
+format. The coordinator imports Histogram and the text-format helpers from
+here, so both expose the same buckets and label escaping.
+"""
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+# bucket upper bounds (le) in seconds / bytes, also used by the coordinator
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+    10.0, 30.0, 60.0,
+)
+TRANSFER_SECONDS_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+BYTES_BUCKETS = tuple(float(1 << n) for n in range(20, 40, 2))  # 1 MiB .. 256 GiB
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """Prometheus-style histogram: per-bucket counts, sum and count."""
+
+    __slots__ = ("_lock", "buckets", "counts", "sum")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        # counts[i] observations <= buckets[i] and > buckets[i - 1]; the last
+        # entry is +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {"buckets": list(self.buckets), "counts": list(self.counts), "sum": self.sum}
+
+
+def format_labels(values: dict[str, Any]) -> str:
+    """'k="v",...' with values escaped for the text format."""
+    out = []
+    for key, value in values.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        out.append(f'{key}="{value}"')
+    return ",".join(out)
+
+
+def render_histogram(name: str, labels: str, snap: dict[str, Any]) -> list[str]:
+    """Text exposition lines of one histogram snapshot; labels is the
+    'k="v",...' part without braces."""
+    sep = "," if labels else ""
+    lines = []
+    total = 0
+    for le, count in zip([*snap["buckets"], "+Inf"], snap["counts"]):
+        total += count
+        lines.append(f'{name}_bucket{{{labels}{sep}le="{le}"}} {total}')
+    tail = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{tail} {snap['sum']}")
+    lines.append(f"{name}_count{tail} {total}")
+    return lines
+
+
+class LoaderMetrics:
+    """What the loader reports: registration, transfers and the coordinator
+    round trips (long-polls excluded)."""
+
+    COUNTERS = (
+        "transfers_total",
+        "transfer_bytes_total",
+        "transfer_errors_total",
+        "coordinator_requests_total",
+        # coordinator requests retried (stale keep-alive connections,
+        # restarts, 5xx), layouts resent after a 409
+        "coordinator_retries_total",
+        "registration_retries_total",
+    )
+
+    def __init__(self):
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        self.histograms = {
+            "register_memory_seconds": Histogram(LATENCY_BUCKETS),
+            "coordinator_register_seconds": Histogram(LATENCY_BUCKETS),
+            "coordinator_rtt_seconds": Histogram(LATENCY_BUCKETS),
+            "transfer_seconds": Histogram(TRANSFER_SECONDS_BUCKETS),
+            "transfer_bytes": Histogram(BYTES_BUCKETS),
+        }
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] += value
+
+    def observe(self, name: str, value: float) -> None:
+        self.histograms[name].observe(value)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            "counters": counters,
+            "histograms": {name: h.snapshot() for name, h in self.histograms.items()},
+        }
+
+    def render(self, prefix: str = "memfabric_loader_", labels: str = "") -> str:
+        snap = self.snapshot()
+        tail = f"{{{labels}}}" if labels else ""
+        lines = []
+        for name, value in snap["counters"].items():
+            lines.append(f"# TYPE {prefix}{name} counter")
+            lines.append(f"{prefix}{name}{tail} {value}")
+        for name, hist in snap["histograms"].items():
+            lines.append(f"# TYPE {prefix}{name} histogram")
+            lines.extend(render_histogram(prefix + name, labels, hist))
+        return "\n".join(lines) + "\n"
+
+
+METRICS = LoaderMetrics()
+
+_EXPORTER_LOCK = threading.Lock()
+_EXPORTER: ThreadingHTTPServer | None = None
+
+
+def start_exporter(port: int, labels: str = "") -> ThreadingHTTPServer:
+    """Serve METRICS on GET /metrics at port, once per process."""
+    global _EXPORTER
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = METRICS.render(labels=labels).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _EXPORTER_LOCK:
+        if _EXPORTER is None:
+            _EXPORTER = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+            threading.Thread(
+                target=_EXPORTER.serve_forever, daemon=True, name="memfabric-metrics"
+            ).start()
+        return _EXPORTER
@@ -0,0 +1,184 @@
+# SPDX-License-Identifier: Apache-2.0
+# SPDX-FileCopyrightText: Copyright contributors to the vLLM project
+"""Opt-in Chrome trace / Perfetto spans of the memfabric HTTP loader.
+
+Stdlib only, like memfabric_transfer. Off unless the extra config sets
+``trace_dir`` (or VLLM_MEMFABRIC_TRACE_DIR is set); ``TRACE.span`` then
+returns a shared no-op. Enabled, spans collect in memory and
+``TRACE.flush()`` writes one JSON file per rank that ui.perfetto.dev and
+chrome://tracing open. Timestamps are wall-clock microseconds so
+memfabric_coord/merge_traces.py can line up the ranks of several hosts.
+"""
+import atexit
+import json
+import os
+import re
+import socket
+import threading
+import time
+from typing import Any
+
+# span categories, which merge_traces.py sums per rank:
+# engine    TransferEngine / config store startup
+# register  register_memory of the weights
+# control   coordinator round trips that answer right away
+# wait      long-polls: waiting for tasks, peers or the transfer itself
+# transfer  transfer_sync_write/read calls
+# load      per-task spans enclosing the transfer calls
+# disk      safetensors -> NPU (demo only; the source's vLLM load comes first)
+CATEGORIES = ("engine", "register", "control", "wait", "transfer", "load", "disk")
+
+# a source serving for hours must not grow without bound
+MAX_EVENTS = 1_000_000
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> dict[str, Any]:
+        return {}
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """One complete ("X") event; args may be filled in inside the block."""
+
+    __slots__ = ("args", "cat", "name", "start", "tracer")
+
+    def __init__(self, tracer: "Tracer", name: str, cat: str, args: dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self) -> dict[str, Any]:
+        self.start = time.perf_counter()
+        return self.args
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer._add(
+            {
+                "name": self.name,
+                "cat": self.cat,
+                "ph": "X",
+                "ts": self.tracer._ts(self.start),
+                "dur": (end - self.start) * 1e6,
+                "args": self.args,
+            }
+        )
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.path: str | None = None
+        self.meta: dict[str, Any] = {}
+        self.dropped = 0
+        self._events: list[dict[str, Any]] = []
+        self._threads: set[int] = set()
+        self._lock = threading.Lock()
+        self._wall0 = 0.0
+        self._perf0 = 0.0
+
+    def enable(self, path: str, **meta: Any) -> None:
+        """Start recording; flush() writes to path. meta (my_id, role,
+        rank, ...) goes to otherData and names the process."""
+        with self._lock:
+            if self.enabled:
+                return
+            # one wall-clock anchor; durations come from perf_counter
+            self._wall0 = time.time()
+            self._perf0 = time.perf_counter()
+            self.path = path
+            self.meta = dict(meta, host=socket.gethostname(), pid=os.getpid())
+            self._events.append(
+                {
+                    "name": "process_name",
+                    "ph": "M",
+                    "pid": os.getpid(),
+                    "args": {"name": " ".join(f"{k}={v}" for k, v in meta.items())},
+                }
+            )
+            self.enabled = True
+        atexit.register(self.flush)
+
+    def _ts(self, perf: float) -> float:
+        return (self._wall0 + perf - self._perf0) * 1e6
+
+    def _add(self, event: dict[str, Any]) -> None:
+        tid = threading.get_ident()
+        event["pid"] = os.getpid()
+        event["tid"] = tid
+        with self._lock:
+            if len(self._events) >= MAX_EVENTS:
+                self.dropped += 1
+                return
+            if tid not in self._threads:
+                self._threads.add(tid)
+                self._events.append(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": event["pid"],
+                        "tid": tid,
+                        "args": {"name": threading.current_thread().name},
+                    }
+                )
+            self._events.append(event)
+
+    def span(self, name: str, cat: str, **args: Any) -> _Span | _NullSpan:
+        """Context manager timing its block; yields the args dict."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, cat, args)
+
+    def instant(self, name: str, cat: str, **args: Any) -> None:
+        if not self.enabled:
+            return
+        self._add(
+            {
+                "name": name,
+                "cat": cat,
+                "ph": "i",
+                "s": "t",
+                "ts": self._ts(time.perf_counter()),
+                "args": args,
+            }
+        )
+
+    def flush(self) -> None:
+        """Write everything recorded so far; safe to call repeatedly."""
+        if not self.enabled or self.path is None:
+            return
+        with self._lock:
+            events = list(self._events)
+            other = dict(self.meta, wall_clock_anchor=self._wall0, dropped=self.dropped)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {"traceEvents": events, "displayTimeUnit": "ms", "otherData": other}, f
+            )
+        os.replace(tmp, self.path)
+
+
+TRACE = Tracer()
+
+
+def enable_from_config(extra: dict[str, Any], my_id: str, role: str, rank: int) -> None:
+    """Enable TRACE when trace_dir (or VLLM_MEMFABRIC_TRACE_DIR) is set; one
+    file per rank, named after my_id."""
+    trace_dir = extra.get("trace_dir") or os.environ.get("VLLM_MEMFABRIC_TRACE_DIR")
+    if not trace_dir:
+        return
+    os.makedirs(str(trace_dir), exist_ok=True)
+    name = re.sub(r"[^A-Za-z0-9_.-]", "_", my_id)
+    path = os.path.join(str(trace_dir), f"memfabric-{role}-{name}-rank{rank}.json")
+    TRACE.enable(path, my_id=my_id, role=role, rank=rank)
@@ -0,0 +1,486 @@
+# SPDX-License-Identifier: Apache-2.0
+# SPDX-FileCopyrightText: Copyright contributors to the vLLM project
+"""Transfer planning and execution helpers for the memfabric HTTP loader.
+
+Kept free of torch/vllm imports so plans can be computed offline from the
+``_params_metadata`` output of a source and a receiver.
+"""
+import argparse
+import hashlib
+import json
+import re
+import socket
+import struct
+import threading
+import time
+import urllib.parse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, NamedTuple
+
+# decoder layer index in a parameter name; must match coordinator.LAYER_RE
+LAYER_RE = re.compile(r"(?:^|\.)layers\.(\d+)\.")
+
+
+def layer_group(name: str) -> int:
+    """Decoder layer index of a parameter, -1 for non-layer params."""
+    m = LAYER_RE.search(name)
+    return int(m.group(1)) if m else -1
+
+
+def split_by_layer(
+    params: dict[str, dict[str, Any]],
+) -> list[tuple[int, dict[str, dict[str, Any]]]]:
+    """Group params by layer_group, in transfer order (-1 first, then 0..N)."""
+    groups: dict[int, dict[str, dict[str, Any]]] = {}
+    for name, meta in params.items():
+        groups.setdefault(layer_group(name), {})[name] = meta
+    return sorted(groups.items())
+
+
+def layout_fingerprint(params: list[dict[str, Any]]) -> str:
+    """Hash of param names, dtypes, shapes and sizes, without addresses.
+
+    Every rank loading the same shard layout gets the same value, so the
+    coordinator and sources can cache per-layout name tables and plans.
+    """
+    h = hashlib.sha256()
+    for p in params:
+        entry = [p["name"], p.get("dtype"), p.get("shape"), int(p["bytes"])]
+        h.update(json.dumps(entry).encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()[:32]
+
+
+class TransferOp(NamedTuple):
+    src_addr: int
+    dst_addr: int
+    size: int
+    # first parameter covered by this op, for logging
+    name: str
+
+
+def match_params(
+    local_params: dict[str, dict[str, Any]],
+    dst_params: dict[str, dict[str, Any]],
+) -> list[TransferOp]:
+    """One op per parameter present on both sides, in local order.
+
+    A dst entry with an "offset" (multi-source stripes) covers only
+    dst["bytes"] bytes starting at that offset into the parameter.
+    """
+    ops = []
+    for name, meta in local_params.items():
+        dst = dst_params.get(name)
+        if dst is None:
+            continue
+        if "offset" in dst:
+            offset = int(dst["offset"])
+            ops.append(
+                TransferOp(
+                    int(meta["addr"]) + offset,
+                    int(dst["addr"]) + offset,
+                    int(dst["bytes"]),
+                    name,
+                )
+            )
+            continue
+        ops.append(
+            TransferOp(int(meta["addr"]), int(dst["addr"]), int(meta["bytes"]), name)
+        )
+    return ops
+
+
+def match_reads(
+    local_params: dict[str, dict[str, Any]],
+    src_params: dict[str, dict[str, Any]],
+) -> list[TransferOp]:
+    """One read op per parameter of a remote source also present locally.
+
+    src_addr is the remote address and dst_addr the local one; striped
+    entries carry an "offset" exactly as in match_params.
+    """
+    ops = []
+    for name, src in src_params.items():
+        meta = local_params.get(name)
+        if meta is None:
+            continue
+        offset = int(src.get("offset", 0))
+        size = int(src["bytes"]) if "offset" in src else int(meta["bytes"])
+        ops.append(
+            TransferOp(int(src["addr"]) + offset, int(meta["addr"]) + offset, size, name)
+        )
+    return ops
+
+
+def group_ops_by_layer(ops: list[TransferOp]) -> list[tuple[int, list[TransferOp]]]:
+    """Group ops by layer_group of op.name, in transfer order (-1 first)."""
+    groups: dict[int, list[TransferOp]] = {}
+    for op in ops:
+        groups.setdefault(layer_group(op.name), []).append(op)
+    return sorted(groups.items())
+
+
+class LayoutPlanCache:
+    """Name-matched write plans keyed by receiver layout hash.
+
+    Receivers with the same layout only differ in addresses, so matching
+    local params to receiver names is done once per layout and later tasks
+    only substitute the receiver's address vector.
+    """
+
+    def __init__(self):
+        self._plans: dict[str, list[tuple[int, int, int, str]]] = {}
+        self._lock = threading.Lock()
+
+    def known(self) -> list[str]:
+        with self._lock:
+            return list(self._plans)
+
+    def match(
+        self, local_params: dict[str, dict[str, Any]], columns: dict[str, Any]
+    ) -> list[TransferOp] | None:
+        """Ops for columnar dst_params, None if they carry no layout_hash."""
+        layout_hash = columns.get("layout_hash")
+        if not layout_hash:
+            return None
+        with self._lock:
+            plan = self._plans.get(layout_hash)
+        if plan is None:
+            names = columns.get("names")
+            if names is None:
+                raise KeyError(f"layout {layout_hash} is not cached")
+            plan = []
+            for i, name in enumerate(names):
+                meta = local_params.get(name)
+                if meta is not None:
+                    plan.append((i, int(meta["addr"]), int(meta["bytes"]), name))
+            with self._lock:
+                self._plans[layout_hash] = plan
+        addrs = columns["addrs"]
+        return [TransferOp(src, int(addrs[i]), size, name) for i, src, size, name in plan]
+
+
+def coalesce_ops(ops: list[TransferOp], max_chunk_bytes: int = 0) -> list[TransferOp]:
+    """Merge ops contiguous on both sides, then split runs above max_chunk_bytes."""
+    merged: list[TransferOp] = []
+    for op in sorted(ops, key=lambda o: (o.src_addr, o.dst_addr)):
+        if op.size <= 0:
+            continue
+        if merged:
+            last = merged[-1]
+            if (
+                last.src_addr + last.size == op.src_addr
+                and last.dst_addr + last.size == op.dst_addr
+            ):
+                merged[-1] = last._replace(size=last.size + op.size)
+                continue
+        merged.append(op)
+    if max_chunk_bytes <= 0:
+        return merged
+    out = []
+    for op in merged:
+        offset = 0
+        while offset < op.size:
+            size = min(max_chunk_bytes, op.size - offset)
+            out.append(
+                TransferOp(op.src_addr + offset, op.dst_addr + offset, size, op.name)
+            )
+            offset += size
+    return out
+
+
+def plan_transfers(
+    local_params: dict[str, dict[str, Any]],
+    dst_params: dict[str, dict[str, Any]],
+    *,
+    coalesce: bool = True,
+    max_chunk_bytes: int = 0,
+) -> list[TransferOp]:
+    ops = match_params(local_params, dst_params)
+    if not coalesce:
+        return ops
+    return coalesce_ops(ops, max_chunk_bytes)
+
+
+def op_stats(ops: list[TransferOp]) -> dict[str, float]:
+    total = sum(op.size for op in ops)
+    return {
+        "calls": len(ops),
+        "bytes": total,
+        "mean_bytes_per_call": total / len(ops) if ops else 0.0,
+        "min_bytes_per_call": min((op.size for op in ops), default=0),
+        "max_bytes_per_call": max((op.size for op in ops), default=0),
+    }
+
+
+def covering_regions(
+    params: list[dict[str, Any]], align_bytes: int = 0
+) -> list[tuple[int, int]]:
+    """Minimal (addr, bytes) ranges covering all params.
+
+    Overlapping and adjacent allocations are merged. With align_bytes > 0 each
+    range is first widened to allocator block boundaries, so params sharing a
+    block collapse into one range.
+    """
+    spans = []
+    for p in params:
+        start = int(p["addr"])
+        end = start + int(p["bytes"])
+        if end <= start:
+            continue
+        if align_bytes > 0:
+            start -= start % align_bytes
+            end += -end % align_bytes
+        spans.append((start, end))
+    spans.sort()
+    regions: list[list[int]] = []
+    for start, end in spans:
+        if regions and start <= regions[-1][1]:
+            regions[-1][1] = max(regions[-1][1], end)
+        else:
+            regions.append([start, end])
+    return [(start, end - start) for start, end in regions]
+
+
+class TransferError(NamedTuple):
+    op: TransferOp
+    ret: int
+    error: str
+
+
+class TransferExecutor:
+    """Keep up to max_inflight writes (or reads) with a peer outstanding.
+
+    Uses ``engine.batch_transfer_sync_write``/``batch_transfer_sync_read`` when
+    the engine provides them, otherwise a pool of worker threads issuing
+    ``transfer_sync_write``/``transfer_sync_read``. max_inflight=1 issues ops
+    one by one on the calling thread.
+
+    For both directions ``TransferOp.src_addr`` is where the bytes come from
+    and ``dst_addr`` where they land; for reads src_addr is on the peer.
+
+    tracer, if given, is a memfabric_trace.Tracer; every engine call is then
+    recorded as a span.
+    """
+
+    def __init__(self, engine: Any, max_inflight: int = 1, tracer: Any = None):
+        self.engine = engine
+        self.max_inflight = max(1, int(max_inflight))
+        self.tracer = tracer if tracer is not None and tracer.enabled else None
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_inflight, thread_name_prefix="memfabric-xfer"
+                )
+            return self._pool
+
+    def _one(self, kind: str, peer_id: str, op: TransferOp) -> int:
+        if self.tracer is not None:
+            with self.tracer.span(
+                f"transfer_sync_{kind}", "transfer", peer=peer_id, bytes=op.size
+            ) as args:
+                args["ret"] = ret = self._call(kind, peer_id, op)
+            return ret
+        return self._call(kind, peer_id, op)
+
+    def _call(self, kind: str, peer_id: str, op: TransferOp) -> int:
+        if kind == "read":
+            return self.engine.transfer_sync_read(
+                peer_id, op.dst_addr, op.src_addr, op.size
+            )
+        return self.engine.transfer_sync_write(peer_id, op.src_addr, op.dst_addr, op.size)
+
+    def write(self, peer_id: str, ops: list[TransferOp]) -> list[TransferError]:
+        """Write all ops to peer_id and return the ones that failed."""
+        return self._run("write", peer_id, ops)
+
+    def read(self, peer_id: str, ops: list[TransferOp]) -> list[TransferError]:
+        """Read all ops from peer_id and return the ones that failed."""
+        return self._run("read", peer_id, ops)
+
+    def _run(self, kind: str, peer_id: str, ops: list[TransferOp]) -> list[TransferError]:
+        if self.max_inflight == 1:
+            return self._run_serial(kind, peer_id, ops)
+        if hasattr(self.engine, f"batch_transfer_sync_{kind}"):
+            return self._run_batched(kind, peer_id, ops)
+        return self._run_pooled(kind, peer_id, ops)
+
+    def _run_serial(
+        self, kind: str, peer_id: str, ops: list[TransferOp]
+    ) -> list[TransferError]:
+        errors = []
+        for op in ops:
+            ret = self._one(kind, peer_id, op)
+            if ret != 0:
+                errors.append(TransferError(op, ret, f"ret={ret}"))
+                # keep the old fail-fast behaviour for serial transfers
+                break
+        return errors
+
+    def _run_batched(
+        self, kind: str, peer_id: str, ops: list[TransferOp]
+    ) -> list[TransferError]:
+        batch_fn = getattr(self.engine, f"batch_transfer_sync_{kind}")
+        errors = []
+        for i in range(0, len(ops), self.max_inflight):
+            batch = ops[i : i + self.max_inflight]
+            local = [op.dst_addr if kind == "read" else op.src_addr for op in batch]
+            remote = [op.src_addr if kind == "read" else op.dst_addr for op in batch]
+            sizes = [op.size for op in batch]
+            if self.tracer is not None:
+                with self.tracer.span(
+                    f"batch_transfer_sync_{kind}",
+                    "transfer",
+                    peer=peer_id,
+                    bytes=sum(sizes),
+                    calls=len(batch),
+                ) as args:
+                    args["ret"] = ret = batch_fn(peer_id, local, remote, sizes)
+            else:
+                ret = batch_fn(peer_id, local, remote, sizes)
+            if ret != 0:
+                # the batch API reports one status; attribute it to every op
+                errors.extend(TransferError(op, ret, f"batch ret={ret}") for op in batch)
+        return errors
+
+    def _run_pooled(
+        self, kind: str, peer_id: str, ops: list[TransferOp]
+    ) -> list[TransferError]:
+        pool = self._get_pool()
+        errors = []
+        inflight = {}
+
+        def _collect(done):
+            for fut in done:
+                op = inflight.pop(fut)
+                try:
+                    ret = fut.result()
+                except Exception as e:  # noqa: BLE001 - whatever the engine binding raises
+                    errors.append(TransferError(op, -1, repr(e)))
+                    continue
+                if ret != 0:
+                    errors.append(TransferError(op, ret, f"ret={ret}"))
+
+        for op in ops:
+            if len(inflight) >= self.max_inflight:
+                done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                _collect(done)
+            inflight[pool.submit(self._one, kind, peer_id, op)] = op
+        if inflight:
+            done, _ = wait(inflight)
+            _collect(done)
+        return errors
+
+
+def wait_for_store(store_url: str, timeout_s: float) -> float:
+    """Block until the config store at store_url (tcp://host:port) accepts
+    connections and return the seconds waited.
+
+    Replaces a fixed sleep after create_config_store: returns as soon as the
+    store listens, and keeps waiting (with backoff) when it is slow to start
+    or runs on another pod that is not up yet. Shared by the loader, the demo
+    and the memfabric_*.py scripts at the repo root.
+    """
+    parts = urllib.parse.urlsplit(store_url)
+    if not parts.hostname or not parts.port:
+        raise ValueError(f"store_url must be tcp://host:port, got {store_url!r}")
+    host = "127.0.0.1" if parts.hostname == "0.0.0.0" else parts.hostname
+    start = time.monotonic()
+    delay = 0.005
+    while True:
+        try:
+            with socket.create_connection((host, parts.port), timeout=1.0):
+                return time.monotonic() - start
+        except OSError as e:
+            if time.monotonic() - start + delay > timeout_s:
+                raise TimeoutError(
+                    f"config store {store_url} not reachable after {timeout_s:g}s: {e}"
+                ) from e
+            time.sleep(delay)
+            delay = min(delay * 2, 0.2)
+
+
+# compact registration wire format; must match coordinator._decode_compact_register
+COMPACT_CONTENT_TYPE = "application/x-memfabric-params"
+COMPACT_MAGIC = b"MFP1"
+COMPACT_HEADER = struct.Struct("<4sII")
+
+
+def encode_params_compact(req: dict[str, Any], params: list[dict[str, Any]]) -> bytes:
+    """Pack a registration as header JSON + name table + u64 addr/size arrays.
+
+    ``req`` is the registration payload without "params"; only name, addr
+    and bytes of each param are sent.
+    """
+    header = json.dumps(req, separators=(",", ":")).encode("utf-8")
+    names = "\n".join(p["name"] for p in params).encode("utf-8")
+    count = len(params)
+    return b"".join(
+        [
+            COMPACT_HEADER.pack(COMPACT_MAGIC, len(header), count),
+            header,
+            struct.pack("<I", len(names)),
+            names,
+            struct.pack(f"<{count}Q", *(int(p["addr"]) for p in params)),
+            struct.pack(f"<{count}Q", *(int(p["bytes"]) for p in params)),
+        ]
+    )
+
+
+def params_from_wire(obj: dict[str, Any]) -> dict[str, dict[str, Any]]:
+    """Expand task params sent in columnar form by the coordinator."""
+    columns = obj.get("__columns__")
+    if columns is None:
+        return obj
+    return {
+        name: {"addr": addr, "bytes": size}
+        for name, addr, size in zip(columns["names"], columns["addrs"], columns["sizes"])
+    }
+
+
+def _load_params(path: str) -> dict[str, dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("params", [])
+    return {p["name"]: p for p in data if p.get("name")}
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Report transfer call count before/after coalescing"
+    )
+    p.add_argument("--src", required=True, help="source _params_metadata JSON")
+    p.add_argument(
+        "--dst", default=None, help="receiver _params_metadata JSON (defaults to --src)"
+    )
+    p.add_argument("--chunk-bytes", type=int, default=1 << 30)
+    args = p.parse_args()
+
+    local_params = _load_params(args.src)
+    dst_params = _load_params(args.dst) if args.dst else local_params
+    before = op_stats(plan_transfers(local_params, dst_params, coalesce=False))
+    after = op_stats(
+        plan_transfers(local_params, dst_params, max_chunk_bytes=args.chunk_bytes)
+    )
+    for label, s in (("before", before), ("after", after)):
+        print(
+            f"{label}: calls={s['calls']} bytes={s['bytes']} "
+            f"mean_bytes_per_call={s['mean_bytes_per_call']:.0f} "
+            f"min={s['min_bytes_per_call']} max={s['max_bytes_per_call']}"
+        )
+    if after["calls"]:
+        print(f"call_reduction={before['calls'] / after['calls']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()